@@ -1,7 +1,16 @@
 import logging
+import threading
+from azure.core.exceptions import ResourceNotFoundError
 from azure.data.tables import TableServiceClient, UpdateMode
 # import os
 
+# Service clients are cached per connection string for the lifetime of the worker,
+# and each table is provisioned once, so invocations after the first go straight
+# to the table.
+_table_services = {}
+_provisioned = set()
+_lock = threading.Lock()
+
 class AZTableStorage:
 
     table_name = ""
@@ -13,10 +22,16 @@ class AZTableStorage:
         self.conn_str = conn_str
         print(">>>>>>>>table_name>>>>>>>>"+self.table_name)
         print(">>>>>>>>conn_str>>>>>>>>"+self.conn_str)
-        self.table_service = TableServiceClient.from_connection_string(self.conn_str)
+        with _lock:
+            if self.conn_str not in _table_services:
+                _table_services[self.conn_str] = TableServiceClient.from_connection_string(self.conn_str)
+            self.table_service = _table_services[self.conn_str]
 
         # Create the table if it does not already exist
-        self.table_service.create_table_if_not_exists(self.table_name)
+        if (self.conn_str, self.table_name) not in _provisioned:
+            self.table_service.create_table_if_not_exists(self.table_name)
+            with _lock:
+                _provisioned.add((self.conn_str, self.table_name))
 
         self.table_client = self.table_service.get_table_client(self.table_name)
         # logging.info(self.table_name)
@@ -34,6 +49,13 @@ class AZTableStorage:
     def azure_query_entities(self,tbl_client, queryfilter):
         return tbl_client.query_entities(queryfilter)
 
+    def azure_get_entity(self, tbl_client, partition_key, row_key):
+        # Point read of a single row; None when it does not exist.
+        try:
+            return tbl_client.get_entity(partition_key=partition_key, row_key=row_key)
+        except ResourceNotFoundError:
+            return None
+
     # @staticmethod
     # def deserialize():
     #     params = {key: request.form.get(key) for key in request.form.keys()}
@@ -1,11 +1,139 @@
-import json, os
-from pyapacheatlas.core.util import GuidTracker, AtlasException
-from pyapacheatlas.core import PurviewClient, AtlasEntity, TypeCategory, AtlasProcess
-from pyapacheatlas.core.typedef import (EntityTypeDef, AtlasAttributeDef)
+import json
 import logging, re
+from typing import NamedTuple
 
 from .column_parser import get_column_transformations
-from .join_parser import get_join_conditions
+from .render_cache import get_render_cache
+from .catalog_mirror import get_catalog_mirror
+from .entity_batcher import get_entity_batcher
+from .plan_cache import plan_fingerprint, get_plan_cache
+from .known_lineage import get_known_lineage, diff_lineage
+from .join_parser import extract_joins
+from .catalyst import (INSERT_INTO_STATEMENT, CREATE_VIEW_STATEMENT, CREATE_TABLE_AS_SELECT_STATEMENT, CREATE_TABLE,
+                       MERGE_INTO_TABLE, CREATE_VIEW_COMMAND, PROJECT, SUBQUERY_ALIAS, JOIN, LOGICAL_RELATION,
+                       SAVE_INTO_DATA_SOURCE_COMMAND, UNRESOLVED_RELATION, UNRESOLVED_ATTRIBUTE, UNRESOLVED_FUNCTION,
+                       UNRESOLVED_STAR, ALIAS, ATTRIBUTE_REFERENCE, LITERAL, WINDOW_EXPRESSION)
+
+
+# Parts added to the field pattern of a projected column, per class of its expression nodes.
+def _name_token(field):
+    return (field['name'],)
+
+
+def _name_parts_token(field):
+    return (field['nameParts'],)
+
+
+def _literal_token(field):
+    if field['value'] is not None:
+        return ("lit(" + field['value'] + ")",)
+    return ("lit(null)",)
+
+
+def _window_token(field):
+    return ("Row_number()", "Partition", "Group")
+
+
+def _dense_rank_token(field):
+    if field['name']['funcName'] == "DENSE_RANK":
+        return ("DENSE_RANK", "", "", "", "")
+    return ()
+
+
+def _star_token(field):
+    print("*")
+    return ()
+
+
+def _qualified_attribute_token(field):
+    if field['qualifier']:
+        qualifier = field['qualifier'].replace('[', '').replace(']', '')
+        return ("[" + qualifier + "," + field['name'] + "]",)
+    return (field['name'],)
+
+
+INSERT_FIELD_TOKENS = {ALIAS: _name_token, UNRESOLVED_ATTRIBUTE: _name_parts_token, LITERAL: _literal_token,
+                       WINDOW_EXPRESSION: _window_token}
+VIEW_COMMAND_FIELD_TOKENS = {ALIAS: _name_token, ATTRIBUTE_REFERENCE: _name_token}
+VIEW_FIELD_TOKENS = {ALIAS: _name_token, UNRESOLVED_ATTRIBUTE: _name_parts_token, UNRESOLVED_FUNCTION: _dense_rank_token,
+                     LITERAL: _literal_token, UNRESOLVED_STAR: _star_token, WINDOW_EXPRESSION: _window_token}
+DS_CREATE_FIELD_TOKENS = {ALIAS: _name_token, ATTRIBUTE_REFERENCE: _qualified_attribute_token}
+
+# Kinds of FieldRecord. Only columns, aliases, literals and derived columns carry column lineage.
+COLUMN = "column"
+ALIAS_FIELD = "alias"
+LITERAL_FIELD = "literal"
+DERIVED = "derived"
+EXPRESSION = "expression"
+
+
+class FieldRecord(NamedTuple):
+    """A projected column of a plan.
+
+    Attributes:
+        output_name (str): The name of the column in the output.
+        source_qualifier (str): The alias or table qualifying the source column, or None.
+        source_column (str): The input column the output column comes from, or the literal it is set to.
+        kind (str): COLUMN for a column selected as is, ALIAS_FIELD for a renamed column,
+            LITERAL_FIELD for a literal, DERIVED for an expression over several fields, and
+            EXPRESSION for anything else (windows, DENSE_RANK, stars), which has no column lineage.
+    """
+    output_name: str
+    source_qualifier: str
+    source_column: str
+    kind: str
+
+
+def _column_clean(val):
+    return val.replace('[', '').replace(']', '').split(",")
+
+
+def _column_record(name_parts):
+    # A column referenced as is, from its name parts such as "[alias, column]".
+    val_list = _column_clean(name_parts)
+    if len(val_list) > 1:
+        return FieldRecord(val_list[1].strip(), val_list[0], val_list[1].strip(), COLUMN)
+    return FieldRecord(val_list[0], None, val_list[0], COLUMN)
+
+
+def _field_record(parts):
+    # Classifies a projected column by the parts its fields produced: the source
+    # alone, the output name and its source, or the output name followed by
+    # several sources of which the first is kept.
+    if len(parts) == 1:
+        return _column_record(parts[0])
+    if len(parts) == 2:
+        if "lit" in parts[1]:
+            return FieldRecord(parts[0], None, parts[1], LITERAL_FIELD)
+        val_list = _column_clean(parts[1])
+        if len(val_list) > 1:
+            return FieldRecord(parts[0], val_list[0], val_list[1].strip(), ALIAS_FIELD)
+        return FieldRecord(parts[0], None, val_list[0].strip(), ALIAS_FIELD)
+    if len(parts) == 3:
+        val_list = _column_clean(parts[1])
+        if len(val_list) > 1:
+            return FieldRecord(parts[0].strip(), val_list[0], val_list[1].strip(), DERIVED)
+        return FieldRecord(parts[0].strip(), None, val_list[0].strip(), DERIVED)
+    return FieldRecord(parts[0] if parts else "", None, None, EXPRESSION)
+
+
+# Attributes of PurviewTransform making up the lineage returned by transform_to_purview, besides the run identity.
+CACHED_OUTPUT = ("input_tables", "output_table_schm", "_input_cols", "_output_cols", "deltatable",
+                 "intermediate_tbl_views", "globaltempviews", "hardcodecol", "joinList")
+
+
+class NothingToLineage(Exception):
+    """Raised when an event describes no lineage to build, e.g. a MERGE that only updates rows.
+
+    The event is recorded as skipped rather than failed; the reason is the exception message.
+    """
+
+
+class PushFailed(Exception):
+    """Raised when the lineage of an event was built but could not be uploaded to Purview.
+
+    The event is recorded as failed with the upload error, and is processed again when redelivered.
+    """
 
 
 class PurviewTransform:
@@ -33,6 +161,10 @@ class PurviewTransform:
         self.output_table = ""
         self.output_table_schm = ""
         self.joinList = []
+        self.join_records = []
+        self._join_nodes = []
+        self._view_join_nodes = []
+        self._root = None
         self._table_and_columns = {}
         self.inp_qualified_Name = ""
         self.out_qualified_Name = ""
@@ -64,12 +196,28 @@ class PurviewTransform:
 
         self.match = 0
         self.unmatch = 0
+        # Which source the lineage was built from: "columnLineage", "logicalPlan" or "noPlan"
+        self.parse_path = ""
+        # Why the event has no lineage, when NothingToLineage is raised
+        self.skip_reason = ""
+        # Guids assigned to the uploaded entities, per upload
+        self.upload_results = []
+        # Whether pushing the plan lineage to Purview failed, in which case the output is not cached
+        self.push_failed = False
 
         logging.info("logger started")
-        self.gt = GuidTracker()
+        self._gt = None
 
         logging.info("finished init")
 
+    @property
+    def gt(self):
+        # pyapacheatlas is imported when the first entity is built, not when the function is loaded.
+        if self._gt is None:
+            from pyapacheatlas.core.util import GuidTracker
+            self._gt = GuidTracker()
+        return self._gt
+
     def get_tbl_nm(self, inp_tblname, type='out'):
         if inp_tblname.count(",") > 0:
             outtblnm = inp_tblname.split(",")[1].strip(" ").replace('[', '').replace(']', '')
@@ -101,302 +249,202 @@ class PurviewTransform:
         return outtblnm
 
     def subquery_alias(self, plan):
-        if plan['class'] == 'org.apache.spark.sql.catalyst.plans.logical.SubqueryAlias':
+        if plan['class'] == SUBQUERY_ALIAS:
             if plan['identifier']['name'] != '__auto_generated_subquery_name':
                 self._aliases.append(plan['identifier']['name'])
 
     def unresolved_relation(self, plan):
-        if plan['class'] == 'org.apache.spark.sql.catalyst.analysis.UnresolvedRelation':
+        if plan['class'] == UNRESOLVED_RELATION:
             tblnm = self.get_tbl_nm(str(plan['multipartIdentifier']), "inp")
             self._tables.append(tblnm)
 
-    def get_fields_pattern(self, sqlcmd, plan):
-
-        if sqlcmd == "INSERT":
-            if plan['class'] == 'org.apache.spark.sql.catalyst.plans.logical.Project':
-                if self.setproject == 0:
-                    for project in plan['projectList']:
-                        # print("Project Entered")
-                        _fields = ""
-                        for field in project:
-                            if field['class'] == "org.apache.spark.sql.catalyst.expressions.Alias":
-                                _fields += field['name'] + "|"
-                            if field['class'] == "org.apache.spark.sql.catalyst.analysis.UnresolvedAttribute":
-                                _fields += field['nameParts'] + "|"
-                            if field['class'] == "org.apache.spark.sql.catalyst.expressions.Literal":
-                                if field['value'] is not None:
-                                    _fields += "lit(" + field['value'] + ")" + "|"
-                                else:
-                                    _fields += "lit(null)" + "|"
-                            if field['class'] == "org.apache.spark.sql.catalyst.expressions.WindowExpression":
-                                _fields += "Row_number()" + "|" + "Partition" + "|" + "Group" + "|"
-                        self._output_fields.append(_fields)
-                    self.hardcodecol = get_column_transformations(plan['projectList'])
-                    self.setproject = 1
-
-            self.subquery_alias(plan)
-            self.unresolved_relation(plan)
-
-        if sqlcmd == "CreateViewCommand":
-            for child in plan['child']:
-                if child['class'] == 'org.apache.spark.sql.catalyst.plans.logical.Project':
-                    if self.setproject == 0:
-                        for project in child['projectList']:
-                            # print(project)
-                            _fields = ""
-                            for field in project:
-                                if field['class'] == "org.apache.spark.sql.catalyst.expressions.Alias":
-                                    _fields += field['name'] + "|"
-                                if field['class'] == "org.apache.spark.sql.catalyst.expressions.AttributeReference":
-                                    _fields += field['name'] + "|"
-                            self._output_fields.append(_fields)
-                        self.hardcodecol = get_column_transformations(child['projectList'])
-                        self.setproject = 1
-                self.subquery_alias(child)
-                self.unresolved_relation(child)
-                if not self._tables:
-                    self._tables.append(self.nb_name + "_dataframe")
-                    self.dataframe = "Y"
-
-        if sqlcmd == "CREATEVIEW":
-            for child in plan['child']:
-                if child['class'] == 'org.apache.spark.sql.catalyst.plans.logical.Project':
-                    if self.setproject == 0:
-                        for project in child['projectList']:
-                            _fields = ""
-                            for field in project:
-                                if field['class'] == "org.apache.spark.sql.catalyst.expressions.Alias":
-                                    _fields += field['name'] + "|"
-                                if field['class'] == "org.apache.spark.sql.catalyst.analysis.UnresolvedAttribute":
-                                    _fields += field['nameParts'] + "|"
-                                if field['class'] == "org.apache.spark.sql.catalyst.analysis.UnresolvedFunction":
-                                    if field['name']['funcName'] == "DENSE_RANK":
-                                        _fields += "DENSE_RANK||||" + "|"
-                                if field['class'] == "org.apache.spark.sql.catalyst.expressions.Literal":
-                                    if field['value'] is not None:
-                                        _fields += "lit(" + field['value'] + ")" + "|"
-                                    else:
-                                        _fields += "lit(null)" + "|"
-                                if field['class'] == 'org.apache.spark.sql.catalyst.analysis.UnresolvedStar':
-                                    print("*")
-                                if field['class'] == "org.apache.spark.sql.catalyst.expressions.WindowExpression":
-                                    _fields += "Row_number()" + "|" + "Partition" + "|" + "Group" + "|"
-                            self._output_fields.append(_fields)
-                        self.hardcodecol = get_column_transformations(child['projectList'])
-                        self.setproject = 1
-
-                self.subquery_alias(child)
-                self.unresolved_relation(child)
-
-        if sqlcmd == "DS_CREATETABLE":
-            _output_proj = []
-            if plan['class'] == 'org.apache.spark.sql.catalyst.plans.logical.SubqueryAlias':
-                self.ds_create_i += 1
-                self.a.append(self.ds_create_i)
-                # print(plan['identifier']['name'])
-                self.tbl.append(plan['identifier']['name'])
-
-            if plan['class'] == 'org.apache.spark.sql.execution.datasources.LogicalRelation':
-                self.ds_create_i += 1
-
-            if plan['class'] == 'org.apache.spark.sql.catalyst.plans.logical.Project':
-                self.ds_create_i += 1
-                if self.setproject == 0:
-                    for project in plan['projectList']:
-                        _fields = ""
-                        for field in project:
-                            if field['class'] == "org.apache.spark.sql.catalyst.expressions.Alias":
-                                _fields += field['name'] + "|"
-                            if field['class'] == "org.apache.spark.sql.catalyst.expressions.AttributeReference":
-                                if field['qualifier']:
-                                    qualifier = field['qualifier'].replace('[', '').replace(']', '')
-                                    _fields += "[" + qualifier + "," + field['name'] + "]" + "|"
-                                else:
-                                    _fields += field['name'] + "|"
-                        self._output_fields.append(_fields)
-                    self.hardcodecol = get_column_transformations(child['projectList'])
-                    self.setproject = 1
-
-        if sqlcmd == "Project":
+    @staticmethod
+    def _project_fields(project_list, field_tokens):
+        # One FieldRecord per projected column, built from the parts produced by its fields.
+        records = []
+        for project in project_list:
+            parts = []
+            for field in project:
+                token = field_tokens.get(field['class'])
+                if token:
+                    parts += token(field)
+            records.append(_field_record(parts))
+        return records
+
+    def _insert_fields(self, plan):
+        if plan['class'] == PROJECT and self.setproject == 0:
+            self._output_fields += self._project_fields(plan['projectList'], INSERT_FIELD_TOKENS)
+            self.hardcodecol = get_column_transformations(plan['projectList'])
+            self.setproject = 1
+
+        self.subquery_alias(plan)
+        self.unresolved_relation(plan)
+
+    def _view_child_fields(self, plan, field_tokens, dataframe_fallback=False):
+        for child in plan['child']:
+            if child['class'] == PROJECT and self.setproject == 0:
+                self._output_fields += self._project_fields(child['projectList'], field_tokens)
+                self.hardcodecol = get_column_transformations(child['projectList'])
+                self.setproject = 1
+            elif child['class'] == JOIN and plan is self._root:
+                self._view_join_nodes.append(child)
+            self.subquery_alias(child)
+            self.unresolved_relation(child)
+            if dataframe_fallback and not self._tables:
+                self._tables.append(self.nb_name + "_dataframe")
+                self.dataframe = "Y"
+
+    def _create_view_command_fields(self, plan):
+        self._view_child_fields(plan, VIEW_COMMAND_FIELD_TOKENS, dataframe_fallback=True)
+
+    def _create_view_fields(self, plan):
+        self._view_child_fields(plan, VIEW_FIELD_TOKENS)
+
+    def _ds_create_table_fields(self, plan):
+        cls = plan['class']
+        if cls == SUBQUERY_ALIAS:
+            self.ds_create_i += 1
+            self.a.append(self.ds_create_i)
+            self.tbl.append(plan['identifier']['name'])
+        elif cls == LOGICAL_RELATION:
+            self.ds_create_i += 1
+        elif cls == PROJECT:
+            self.ds_create_i += 1
             if self.setproject == 0:
-                for project in plan['projectList']:
-                    _fields = ""
-                    for field in project:
-                        if field['class'] == "org.apache.spark.sql.catalyst.expressions.Alias":
-                            _fields += field['name'] + "|"
-                        if field['class'] == "org.apache.spark.sql.catalyst.expressions.AttributeReference":
-                            _fields += field['name'] + "|"
-                    self._output_fields.append(_fields)
+                self._output_fields += self._project_fields(plan['projectList'], DS_CREATE_FIELD_TOKENS)
+                self.hardcodecol = get_column_transformations(plan['projectList'])
                 self.setproject = 1
-            self._tables.append(self.nb_name + "_dataframe")
-
-        if sqlcmd == "MERGE":
-
-            for key, values in plan.items():
-                if key == "matchedActions":
-                    if values:
-                        if 'InsertAction' in values[0][0]['class']:
-                            for field in values[0]:
-                                if field['class'] == "org.apache.spark.sql.catalyst.analysis.UnresolvedAttribute":
-                                    self._output_fields.append(field['nameParts'])
-                        else:
-                            self.match = 1
+
+    def _dataframe_project_fields(self, plan):
+        if self.setproject == 0:
+            self._output_fields += self._project_fields(plan['projectList'], VIEW_COMMAND_FIELD_TOKENS)
+            self.setproject = 1
+        self._tables.append(self.nb_name + "_dataframe")
+
+    def _merge_fields(self, plan):
+        for key, values in plan.items():
+            if key == "matchedActions":
+                if values:
+                    if 'InsertAction' in values[0][0]['class']:
+                        for field in values[0]:
+                            if field['class'] == UNRESOLVED_ATTRIBUTE:
+                                self._output_fields.append(_column_record(field['nameParts']))
                     else:
                         self.match = 1
-                if key == "notMatchedActions":
-                    if values:
-                        if 'InsertAction' in values[0][0]['class']:
-                            for field in values[0]:
-                                if field['class'] == "org.apache.spark.sql.catalyst.analysis.UnresolvedAttribute":
-                                    self._output_fields.append(field['nameParts'])
-                        else:
-                            self.unmatch = 1
+                else:
+                    self.match = 1
+            if key == "notMatchedActions":
+                if values:
+                    if 'InsertAction' in values[0][0]['class']:
+                        for field in values[0]:
+                            if field['class'] == UNRESOLVED_ATTRIBUTE:
+                                self._output_fields.append(_column_record(field['nameParts']))
                     else:
                         self.unmatch = 1
+                else:
+                    self.unmatch = 1
 
-            if self.match == 1 and self.unmatch == 1:
-                os._exit(0)
-
-            self.subquery_alias(plan)
-            self.unresolved_relation(plan)
-
-    def get_parse_plan(self, output_plan):
-
-        for plan in output_plan:
-            _alias_tables = ""
-            if plan['class'] == 'org.apache.spark.sql.catalyst.plans.logical.InsertIntoStatement':
-                for tbl in plan['table']:
-                    self.output_table = self.get_tbl_nm(tbl['multipartIdentifier'])
-                    self.sqlcommand = "INSERT"
-
-            if plan['class'] == 'org.apache.spark.sql.catalyst.plans.logical.CreateViewStatement':
-                # print("hi")
-                self.output_table = self.get_tbl_nm(plan['viewName'])
-                self.sqlcommand = "CREATEVIEW"
-
-            if plan['class'] == "org.apache.spark.sql.catalyst.plans.logical.CreateTableAsSelectStatement":
-                self.output_table = self.get_tbl_nm(plan['tableName'])
-                self.sqlcommand = "INSERT"
+        if self.match == 1 and self.unmatch == 1:
+            self.skip_reason = "MERGE without insert actions"
+            raise NothingToLineage(self.skip_reason)
 
-            if plan['class'] == 'org.apache.spark.sql.execution.datasources.CreateTable':
-                self.output_table = self.get_tbl_nm(plan['tableDesc']['identifier']['table'])
-                self.sqlcommand = "DS_CREATETABLE"
+        self.subquery_alias(plan)
+        self.unresolved_relation(plan)
 
-            if plan['class'] == 'org.apache.spark.sql.catalyst.plans.logical.MergeIntoTable':
-                self.sqlcommand = "MERGE"
+    # Handler collecting the fields, aliases and relations of a node, per SQL command.
+    _FIELD_HANDLERS = {
+        "INSERT": _insert_fields,
+        "CreateViewCommand": _create_view_command_fields,
+        "CREATEVIEW": _create_view_fields,
+        "DS_CREATETABLE": _ds_create_table_fields,
+        "Project": _dataframe_project_fields,
+        "MERGE": _merge_fields,
+    }
 
-            if plan['class'] == 'org.apache.spark.sql.execution.command.CreateViewCommand':
-                self.output_table = self.get_tbl_nm(plan['name']['table'])
-                # print(plan['name']['table'])
-                self.sqlcommand = "CreateViewCommand"
+    def get_fields_pattern(self, sqlcmd, plan):
+        handler = self._FIELD_HANDLERS.get(sqlcmd)
+        if handler:
+            handler(self, plan)
+
+    def _insert_into_statement(self, plan):
+        for tbl in plan['table']:
+            self.output_table = self.get_tbl_nm(tbl['multipartIdentifier'])
+            self.sqlcommand = "INSERT"
+
+    def _create_view_statement(self, plan):
+        self.output_table = self.get_tbl_nm(plan['viewName'])
+        self.sqlcommand = "CREATEVIEW"
+
+    def _create_table_as_select(self, plan):
+        self.output_table = self.get_tbl_nm(plan['tableName'])
+        self.sqlcommand = "INSERT"
+
+    def _create_table(self, plan):
+        self.output_table = self.get_tbl_nm(plan['tableDesc']['identifier']['table'])
+        self.sqlcommand = "DS_CREATETABLE"
+
+    def _merge_into_table(self, plan):
+        self.sqlcommand = "MERGE"
+
+    def _create_view_command(self, plan):
+        self.output_table = self.get_tbl_nm(plan['name']['table'])
+        self.sqlcommand = "CreateViewCommand"
+
+    def _join(self, plan):
+        self._join_nodes.append(plan)
+
+    # Handler of the nodes that define the output table and SQL command, or hold join conditions.
+    _NODE_HANDLERS = {
+        INSERT_INTO_STATEMENT: _insert_into_statement,
+        CREATE_VIEW_STATEMENT: _create_view_statement,
+        CREATE_TABLE_AS_SELECT_STATEMENT: _create_table_as_select,
+        CREATE_TABLE: _create_table,
+        MERGE_INTO_TABLE: _merge_into_table,
+        CREATE_VIEW_COMMAND: _create_view_command,
+        JOIN: _join,
+    }
 
+    def get_parse_plan(self, output_plan):
+        # Single pass over the plan: each node is dispatched on its class name to the handler
+        # setting the output table, then to the field handler of the current SQL command.
+        # Join nodes are collected on the way for extract_joins.
+        self._root = output_plan[0] if output_plan else None
+        node_handlers = self._NODE_HANDLERS
+        for plan in output_plan:
+            handler = node_handlers.get(plan['class'])
+            if handler:
+                handler(self, plan)
             self.get_fields_pattern(self.sqlcommand, plan)
 
         return True
 
-    def _column_alias_map(self, val_list, alias=""):
-        if alias == 'NoAlias':
-            if 'NoAlias' in self._col_alias_map.keys():
-                self._col_alias_map['NoAlias'].append(val_list[0].strip())
-            else:
-                # create a new array in this slot
-                self._col_alias_map['NoAlias'] = [val_list[0].strip()]
-        else:
-            if val_list[0] in self._col_alias_map:
-                self._col_alias_map[val_list[0]].append(val_list[1].strip())
-            else:
-                # create a new array in this slot
-                self._col_alias_map[val_list[0]] = [val_list[1].strip()]
-
-    @staticmethod
-    def _column_clean(val):
-        return val.replace('[', '').replace(']', '').split(",")
+    def _column_alias_map(self, qualifier, column):
+        # Columns taken from each alias; unqualified columns are kept under 'NoAlias'.
+        self._col_alias_map.setdefault(qualifier if qualifier is not None else 'NoAlias', []).append(column)
 
     def get_inp_out_fields(self, _output_fields, sqlcommand):
         print("Raw Source Fields ")
         print(_output_fields)
         if sqlcommand == "MERGE":
-            # abc = {}
-            # for i in range(len(_output_fields)):
-            #     if _output_fields.count(_output_fields[i]) > 1:
-            #         if _output_fields[i] not in abc:
-            #             abc.update({_output_fields[i]: i})
-            # print(abc)
-            # for key, value in abc.items():
-            #     _output_fields.pop(value)
-
-            odd_i = []
-            even_i = []
-            for i in range(0, len(_output_fields)):
-                if i % 2:
-                    even_i.append(_output_fields[i])
-                else:
-                    odd_i.append(_output_fields[i])
-
-            for i in odd_i:
-                val_list = self._column_clean(i)
-                if len(val_list) > 1:
-                    self._output_cols.append(val_list[1].strip())
-                else:
-                    self._output_cols.append(val_list[0].strip())
-                # self._output_cols.append(i.replace('[', '').replace(']', ''))
-            for i in even_i:
-                val_list = self._column_clean(i)
-                if len(val_list) > 1:
-                    self._input_cols.append(val_list[1].strip())
-                    self._column_alias_map(val_list)
-                else:
-                    self._input_cols.append(val_list[0].strip())
-                    self._column_alias_map(val_list, "NoAlias")
+            # The merge actions list the target column of each assignment, then its source.
+            for field in _output_fields[0::2]:
+                self._output_cols.append(field.source_column.strip())
+            for field in _output_fields[1::2]:
+                self._input_cols.append(field.source_column.strip())
+                self._column_alias_map(field.source_qualifier, field.source_column.strip())
 
             self.output_table = self._tables[0]
             self._tables.pop(0)
             self.output_table_schm = self.input_tables[0]
             self.input_tables.pop(0)
         else:
-            for val in _output_fields:
-                if val.count("|") == 1:
-                    val_list = self._column_clean(val.replace('|', ''))
-                    if len(val_list) > 1:
-                        self._input_cols.append(val_list[1].strip())
-                        self._output_cols.append(val_list[1].strip())
-                        self._column_alias_map(val_list)
-                    else:
-                        # self._col_alias_map.update({'NoAlias':val_list[0].strip()})
-                        self._input_cols.append(val_list[0])
-                        self._output_cols.append(val_list[0])
-                        self._column_alias_map(val_list, 'NoAlias')
-
-                if val.count("|") == 2:
-                    val_split = val.split("|")[1]
-                    if val_split.__contains__("lit"):
-                        self._input_cols.append(val_split)
-                        # self.hardcodecol.append(val_split + " as " + val.split("|")[0])
-                    else:
-                        # print(val_split)
-                        val_list = self._column_clean(val_split)
-                        # print(val_list)
-                        if len(val_list) > 1:
-                            self._input_cols.append(val_list[1].strip())
-                            self._column_alias_map(val_list)
-                        else:
-                            self._input_cols.append(val_list[0].strip())
-                            self._column_alias_map(val_list, 'NoAlias')
-
-                    self._output_cols.append(val.split("|")[0])
-
-                if val.count("|") == 3:
-                    val_split = val.split("|")[1]
-                    val_list = self._column_clean(val_split)
-                    if len(val_list) > 1:
-                        self._input_cols.append(val_list[1].strip())
-                    else:
-                        self._input_cols.append(val_list[0].strip())
-                    self._output_cols.append(val.split("|")[0].strip())
-                    # self._column_alias_map(val_list)
-
-                # if val.count("|") > 3:
-                #     self.hardcodecol.append("Derived Logic like CASE/CONCAT/DENSE_RANK  " + val.split("|")[0])
+            for field in _output_fields:
+                if field.kind == EXPRESSION:
+                    continue
+                self._input_cols.append(field.source_column)
+                self._output_cols.append(field.output_name)
+                if field.kind in (COLUMN, ALIAS_FIELD):
+                    self._column_alias_map(field.source_qualifier, field.source_column.strip())
 
         print("Input and Output and HardCode and Column_Alias Mapping")
         print(self._input_cols)
@@ -423,27 +471,12 @@ class PurviewTransform:
 
     def get_alias_table_cols(self):
 
+        # Columns of an unknown alias (or of no alias) are attributed to the first table of the plan.
+        default_table = next(iter(self._alias_tablenames.values()), None)
         for key, value in self._col_alias_map.items():
-            if key in self._alias_tablenames:
-                if type(value) is list:
-                    for col in value:
-                        colname = col
-                        tablename = self._alias_tablenames.get(key)
-                        self._table_and_columns.update({colname: tablename})
-                else:
-                    colname = value[0]
-                    tablename = self._alias_tablenames.get(key)
-                    self._table_and_columns.update({colname: tablename})
-            else:
-                if type(value) is list:
-                    for col in value:
-                        colname = col
-                        tablename = list(self._alias_tablenames.values())[0]
-                        self._table_and_columns.update({colname: tablename})
-                else:
-                    colname = value[0]
-                    tablename = list(self._alias_tablenames.values())[0]
-                    self._table_and_columns.update({colname: tablename})
+            tablename = self._alias_tablenames.get(key, default_table)
+            for colname in value:
+                self._table_and_columns[colname] = tablename
 
         print("Alias Tables and Columns Mapping")
         print(self._alias_tablenames)
@@ -452,27 +485,19 @@ class PurviewTransform:
         return True
 
     def search_purview_entity(self, entityname):
-
+        # Resolved against the local mirror of the catalog rather than a search per table.
         print(entityname)
-        search = self.client.discovery.search_entities(entityname)
+        mirror = get_catalog_mirror()
+        mirror.ensure_fresh(lambda search_filter: self.client.discovery.search_entities(
+            "*", limit=1000, search_filter=search_filter))
         qname, name, guid, entitytype = "", "", "", ""
-        for entity in search:
-            # re.search(r"^cooked*\W?", entity['qualifiedName'])
-            # print(entity)
-            try:
-                if (entity["entityType"] == "azure_datalake_gen2_path" or str(
-                        entity["entityType"]).lower() == "dataset") and \
-                        str(entity['name']).lower().strip() == entityname.lower() and re.search(
-                    r"^" + self.cluster_name + "://", entity['qualifiedName']):
-                    qname = entity['qualifiedName']
-                    name = entity['name']
-                    guid = entity['id']
-                    entitytype = entity['entityType']
-
-                    # print(entity['qualifiedName'])
-                    # print("ABC    "+qname)
-            except:
-                print("Search Scan results are Coming Differently")
+        for entity in mirror.find(entityname):
+            if (entity.type_name == "azure_datalake_gen2_path" or entity.type_name.lower() == "dataset") and \
+                    entity.qualified_name.startswith(self.cluster_name + "://"):
+                qname = entity.qualified_name
+                name = entity.name
+                guid = entity.guid
+                entitytype = entity.type_name
 
         return qname, name, guid, entitytype
 
@@ -483,18 +508,19 @@ class PurviewTransform:
                 self._alias_tablenames.update({self.tbl[j]: self.tbl[j + 1]})
 
     def purview_plan_push(self, qualifiedName, runid):
+        from pyapacheatlas.core import AtlasEntity, AtlasProcess
 
         print(self._tables)
         print(self.table_and_schema_count)
 
-        purv_inpqname, purv_inpname, purv_inpguid, purv_inpentitytype = "", "", "", ""
         purv_outqname, purv_outname, purv_outguid, purv_outentitytype = "", "", "", ""
 
         for inp in self._tables:
+            purv_inpqname, purv_inpname, purv_inpguid, purv_inpentitytype = "", "", "", ""
             # Need to convert it into a Function
             if inp in self.table_and_schema_count and self.table_and_schema_count[inp] > 0:
                 print(inp + "  hiii " + str(self.table_and_schema_count[inp]))
-                # purv_inpqname, purv_inpname, purv_inpguid, purv_inpentitytype = self.search_purview_entity(inp.lower())
+                purv_inpqname, purv_inpname, purv_inpguid, purv_inpentitytype = self.search_purview_entity(inp.lower())
 
             # print(purv_inpqname)
             if purv_inpqname:
@@ -521,7 +547,7 @@ class PurviewTransform:
 
         if self.sqlcommand == "INSERT" or self.sqlcommand == "MERGE":
             print("INSERT Occured Hence Output Table will be Searched")
-            # purv_outqname, purv_outname, purv_outguid, purv_outentitytype = self.search_purview_entity(self.output_table)
+            purv_outqname, purv_outname, purv_outguid, purv_outentitytype = self.search_purview_entity(self.output_table)
 
         if purv_outqname:
             self.out_qualified_Name = purv_outqname
@@ -556,6 +582,12 @@ class PurviewTransform:
         print(self._column_mapping)
         # print(self.hardcodecol)
         # print(self.joinList)
+        attributes = {"columnMapping": json.dumps(self._column_mapping),
+                      "hardCoded_Columns": self.hardcodecol,
+                      "Delta_Tables": self.deltatable,
+                      "Global_Temp_Views_or_Tables": self.globaltempviews,
+                      "Intermediate_Views_or_Tables": self.intermediate_tbl_views,
+                      "JoinConditions": self.joinList}
         process = AtlasProcess(
             name=qualifiedName + "_" + self.output_table + "_process",
             typeName="HRServicesInsights_OneHRSI",
@@ -563,20 +595,61 @@ class PurviewTransform:
             inputs=self._inputs,
             outputs=[OutputTable],
             guid=self.gt.get_guid(),
-            attributes={"columnMapping": json.dumps(self._column_mapping),
-                        "hardCoded_Columns": self.hardcodecol,
-                        "Delta_Tables": self.deltatable,
-                        "Global_Temp_Views_or_Tables": self.globaltempviews,
-                        "Intermediate_Views_or_Tables": self.intermediate_tbl_views,
-                        "JoinConditions": self.joinList}
+            # AtlasProcess adds its name, qualifiedName, inputs and outputs to the dict it is given.
+            attributes=dict(attributes)
         )
         if self._inputs and OutputTable:
             try:
-                results = self.client.upload_entities([process, OutputTable] + self._inputs)
-            except:
-                print("No ColumnMapping or Input or Output Tables Available")
+                self.push_lineage(process, attributes, OutputTable, self._inputs)
+            except Exception as e:
+                # The upload is shared with other events (see entity_batcher); its error is the event's.
+                self.push_failed = True
+                raise PushFailed(f"Lineage upload of {process.qualifiedName} failed: {e}") from e
+
+    def push_lineage(self, process, attributes, output, inputs):
+        # Only what changed since the last run of the process is pushed (see known_lineage).
+        known = get_known_lineage()
+        lineage = {"edges": [["input", entity.typeName, entity.qualifiedName] for entity in inputs] +
+                            [["output", output.typeName, output.qualifiedName]],
+                   "attributes": json.loads(json.dumps(attributes))}
+        previous = known.get(self.nb_name, process.qualifiedName) if known is not None else None
+
+        results = None
+        guid = previous.get("guid") if previous else None
+        if previous is None:
+            results = self.upload_entities([process, output] + inputs)
+        else:
+            added, removed, changed = diff_lineage(previous, lineage)
+            if added or removed or (changed and not guid):
+                # The process is uploaded with its new inputs and output, which
+                # drops the removed edges; only the DataSets it did not have are uploaded with it.
+                new = set(edge[2] for edge in added)
+                logging.info(f"Lineage of {process.qualifiedName}: {len(added)} edge(s) added, {len(removed)} removed")
+                results = self.upload_entities([process] + [entity for entity in [output] + inputs
+                                                            if entity.qualifiedName in new])
+            elif changed:
+                logging.info(f"Lineage of {process.qualifiedName}: attributes {', '.join(changed)} updated")
+                for name, value in changed.items():
+                    results = self.client.partial_update_entity(guid=guid, attributes={name: value})
+            else:
+                # Nothing is pushed, so the known lineage keeps the age of its last push and still expires.
+                logging.info(f"Lineage of {process.qualifiedName} unchanged since the last run")
+                return results
+        if results and "guidAssignments" in results:
+            assigned = results["guidAssignments"].get(str(process.guid))
+            guid = assigned if assigned is not None and not str(assigned).startswith("-") else guid
+        if known is not None:
+            known.put(self.nb_name, process.qualifiedName, dict(lineage, guid=guid))
+        return results
+
+    def upload_entities(self, entities):
+        # Uploaded together with the entities of the worker's other events (see entity_batcher).
+        results = get_entity_batcher(self.client).submit(entities).result()
+        self.upload_results.append(results)
+        return results
 
     def purview_dataset_push(self, inp_qname, inp_name, out_qname, out_name, process_qname, name):
+        from pyapacheatlas.core import AtlasEntity, AtlasProcess
         print("Came")
         a = AtlasEntity(
             name=inp_name,
@@ -600,26 +673,81 @@ class PurviewTransform:
             guid=self.gt.get_guid()
         )
 
-        results = self.client.upload_entities(batch=[a, b, process])
+        results = self.upload_entities([a, b, process])
+
+    def get_facet_lineage(self):
+        # Fast path: build the lineage straight from the columnLineage and schema facets
+        # emitted by newer OpenLineage integrations. Returns False, leaving the parser
+        # untouched, unless the facets describe every column of a single output table.
+        inputs_array = self.in_data.get('inputs') or []
+        outputs_array = self.in_data.get('outputs') or []
+        if not inputs_array or len(outputs_array) != 1:
+            return False
+        output_facets = outputs_array[0].get('facets') or {}
+        column_lineage = (output_facets.get('columnLineage') or {}).get('fields')
+        if not column_lineage:
+            return False
+        # Integrations may only report the columns they could trace; the plan is parsed
+        # instead when the output schema has columns the facet does not describe.
+        output_schema = output_facets.get('schema')
+        if output_schema and any(col['name'] not in column_lineage for col in output_schema.get('fields', [])):
+            return False
+
+        input_tables = {}
+        input_schemas = {}
+        for inp in inputs_array:
+            key = (inp.get('namespace'), inp['name'])
+            input_tables[key] = inp['name'].split("/")[-1]
+            schema = (inp.get('facets') or {}).get('schema')
+            if schema:
+                input_schemas[key] = set(col['name'] for col in schema.get('fields', []))
+
+        input_cols, output_cols, table_and_columns, hardcodecol = [], [], {}, []
+        for sink, details in column_lineage.items():
+            for source in details.get('inputFields', []):
+                key = (source.get('namespace'), source.get('name'))
+                column = source.get('field')
+                if key not in input_tables or not column:
+                    return False
+                if key in input_schemas and column not in input_schemas[key]:
+                    return False
+                # Columns are attributed to their table by name only, so a name read from two tables is ambiguous.
+                if table_and_columns.get(column, input_tables[key]) != input_tables[key]:
+                    return False
+                input_cols.append(column)
+                output_cols.append(sink)
+                table_and_columns.update({column: input_tables[key]})
+            if details.get('transformationDescription') and details.get('transformationType') != "IDENTITY":
+                hardcodecol.append(details['transformationDescription'] + " AS " + sink)
+        if not output_cols:
+            return False
+
+        self.input_tables = list(dict.fromkeys(input_tables.values()))
+        self._tables = self.input_tables
+        self.output_table = outputs_array[0]['name'].split("/")[-1]
+        self.output_table_schm = self.output_table
+        self._input_cols = input_cols
+        self._output_cols = output_cols
+        self._table_and_columns = table_and_columns
+        self.hardcodecol = hardcodecol
+        return True
 
     def get_project_details(self, output_plan):
         for plan in output_plan:
-            _alias_tables = ""
-            if plan['class'] == "org.apache.spark.sql.catalyst.plans.logical.Project":
+            if plan['class'] == PROJECT:
                 if plan['projectList'][0][0]['qualifier']:
                     # print(plan['projectList'][0][0]['qualifier'])
                     self.output_table = self.get_tbl_nm(plan['projectList'][0][0]['qualifier'])
                     self.sqlcommand = "Project"
                 else:
-                    os._exit(0)
+                    self.skip_reason = "Projection without a qualified source"
+                    raise NothingToLineage(self.skip_reason)
 
             self.get_fields_pattern(self.sqlcommand, plan)
         return True
 
-    def transform_to_purview(self):
-
-        inputs_array = self.in_data['inputs']
-        outputs_array = self.in_data['outputs']
+    def set_run_identity(self):
+        # Notebook, cluster and row key of the event, which differ from run to run even for a cached plan.
         runid = self.in_data['run']['runId']
 
         _name = self.in_data['job']['name'].split(".")[0].split("_")[:-2]
@@ -638,20 +766,64 @@ class PurviewTransform:
             self.cluster_name = "headcountmanagement"
         else:
             self.cluster_name = "external"
+        return runid
+
+    def transform_to_purview(self):
+        # Runs of a scheduled notebook repeat the same plan: its lineage is then
+        # taken from the plan cache instead of being parsed and pushed again.
+        plan_cache = get_plan_cache()
+        if plan_cache is None:
+            return self._transform_to_purview()
+
+        fingerprint = plan_fingerprint(self.in_data)
+        cached = plan_cache.get(fingerprint)
+        if cached is not None:
+            self.set_run_identity()
+            self.parse_path = "planCache"
+            if "skip_reason" in cached:
+                self.skip_reason = cached["skip_reason"]
+                raise NothingToLineage(self.skip_reason)
+            for attribute in CACHED_OUTPUT:
+                setattr(self, attribute, cached[attribute])
+            logging.info(f"Lineage of {self.rowkey} built from {self.parse_path}")
+            return self.output()
+
+        try:
+            output = self._transform_to_purview()
+        except NothingToLineage:
+            plan_cache.put(fingerprint, {"skip_reason": self.skip_reason})
+            raise
+        if not self.push_failed:
+            plan_cache.put(fingerprint, dict((attribute, getattr(self, attribute)) for attribute in CACHED_OUTPUT))
+        return output
+
+    def output(self):
+        return self.cluster_name, self.rowkey, self.input_tables, self.output_table_schm, self._input_cols, self._output_cols, self.deltatable, self.intermediate_tbl_views, self.globaltempviews, self.hardcodecol, self.joinList
+
+    def _transform_to_purview(self):
+
+        inputs_array = self.in_data['inputs']
+        outputs_array = self.in_data['outputs']
+        runid = self.set_run_identity()
 
         # qualifiedName = self.cluster_name + "://" + self.nb_name
         qualifiedName = self.cluster_name
         print(qualifiedName)
         # print(len(self.in_data['run']['facets']))
 
-        if len(self.in_data['run']['facets']) > 1:
+        if self.get_facet_lineage():
+            self.parse_path = "columnLineage"
+            self.purview_plan_push(qualifiedName, runid)
+
+        elif len(self.in_data['run']['facets']) > 1:
+            self.parse_path = "logicalPlan"
 
             _plan = self.in_data['run']['facets']['spark.logicalPlan']['plan']
             print(runid + "  " + self.nb_name)
 
             classname = self.in_data['run']['facets']['spark.logicalPlan']['plan'][0]['class']
 
-            if classname == "org.apache.spark.sql.execution.datasources.SaveIntoDataSourceCommand":
+            if classname == SAVE_INTO_DATA_SOURCE_COMMAND:
                 for inp in self.in_data['inputs']:
                     table = inp['name'].split("/")[-1]
                     self.input_tables.append(table)
@@ -674,7 +846,7 @@ class PurviewTransform:
                 print(self._table_and_columns)
 
             else:
-                if classname == "org.apache.spark.sql.catalyst.plans.logical.Project":
+                if classname == PROJECT:
                     self.get_project_details(_plan)
                 else:
                     self.get_parse_plan(_plan)
@@ -700,9 +872,10 @@ class PurviewTransform:
                     self.get_alias_table_cols()
 
                 if self.sqlcommand in ("CreateViewCommand", "CREATEVIEW"):
-                    self.joinList = get_join_conditions(_plan[0]['child'], self._alias_tablenames)
+                    self.join_records = extract_joins(self._view_join_nodes, self._alias_tablenames)
                 elif self.sqlcommand == "INSERT":
-                    self.joinList = get_join_conditions(_plan, self._alias_tablenames)
+                    self.join_records = extract_joins(self._join_nodes, self._alias_tablenames)
+                self.joinList = [join.describe() for join in self.join_records]
 
                 if self.dataframe == "Y":
                     inp_qname = self.out_qualified_Name
@@ -726,6 +899,7 @@ class PurviewTransform:
             self.purview_plan_push(qualifiedName, runid)
 
         else:
+            self.parse_path = "noPlan"
             print("Facets doesnt have any Plan")
             inp_qname, inp_name = "", ""
             if inputs_array:
@@ -738,6 +912,11 @@ class PurviewTransform:
                 self.purview_dataset_push(inp_qname.lower(), inp_name, out_qname.lower(), out_name, out_name,
                                           "FiletoDataframe")
             else:
-                os._exit(0)
-
-        return self.cluster_name, self.rowkey, self.input_tables, self.output_table_schm, self._input_cols, self._output_cols, self.deltatable, self.intermediate_tbl_views, self.globaltempviews, self.hardcodecol, self.joinList
+                self.skip_reason = "No plan and no input datasets"
+                raise NothingToLineage(self.skip_reason)
+
+        logging.info(f"Lineage of {self.rowkey} built from {self.parse_path}")
+        render_cache = get_render_cache()
+        if render_cache is not None:
+            logging.info(f"Render cache after {self.rowkey}: {render_cache.stats()}")
+        return self.output()
@@ -1,25 +1,13 @@
 import logging
 
 import azure.functions as func
-import json
 from .Data import AZTableStorage
 from azure.data.tables import TableClient
 import os, traceback, sys
 
-from .Synapse_JsonParser import PurviewTransform
-from pyapacheatlas.auth import ServicePrincipalAuthentication
-from pyapacheatlas.core import PurviewClient
-
-oauth = ServicePrincipalAuthentication(
-    tenant_id=<<tenant_id>>,
-    client_id=<<client_id>>,
-    client_secret=<<client_secret>>
-)
-
-client = PurviewClient(
-    account_name=<<purview instance>>,
-    authentication=oauth
-)
+from .Synapse_JsonParser import PurviewTransform, NothingToLineage, PushFailed
+from .purview import get_purview_client
+from .event_loader import load_event
 
 def main(myblob: func.InputStream):
 
@@ -34,8 +22,6 @@ def main(myblob: func.InputStream):
 
     # cluster_name, nb_name, input_tables,output_table, _input_cols, _output_cols,deltatable, intermediate_tbl_views,globaltempviews, hardcodecol, joinList = "","","","","","","","","","",""
     
-    pt = PurviewTransform(client, json.load(myblob))
-
     azStorage =  AZTableStorage()
 
     event_client = azStorage.createClient(os.getenv('TableName'),os.getenv('datalineagesynapsestrpoc_STORAGE'))
@@ -44,47 +30,43 @@ def main(myblob: func.InputStream):
 
     streamName = "HRSI"
 
-    name_filter = "PartitionKey eq '%s' and RowKey eq '%s' and (Status eq 'Unprocessed' or Status eq 'Parsing Failed')" % (streamName, fileName)
-    # # table_client = TableClient.from_connection_string(conn_str=os.getenv('datalineagesynapsestrpoc_STORAGE'), table_name=os.getenv('TableName'))
-   
-    entities = azStorage.azure_query_entities(event_client, name_filter)
-    
-    # lineage_metadata = azStorage.create_lineage_entity("HRSI",fileName,"","","","","","","","")
-    # event_metadata = azStorage.create_event_entity("HRSI",fileName,"Unprocessed",3,myblob.name,False,"SUCCESS")
-    
-    # azStorage.insert_entity(event_client, event_metadata)
-    # azStorage.insert_entity(lineage_client, lineage_metadata)
-
-    
-    # cluster_name, nb_name, input_tables,output_table, _input_cols, _output_cols,deltatable, intermediate_tbl_views,globaltempviews, hardcodecol, joinList = pt.transform_to_purview()
-    # lineage_metadata = azStorage.create_lineage_entity(cluster_name, nb_name, input_tables,
-    #                                                 output_table, _input_cols, _output_cols,
-    #                                                 deltatable, intermediate_tbl_views,
-    #                                                 globaltempviews, hardcodecol, joinList)
-    # azStorage.azure_upsert_entity(lineage_client, lineage_metadata)
-
-    for entity in entities:
-        print('RowKey:' + entity['RowKey'])
-        try:
-            cluster_name, nb_name, input_tables,output_table, _input_cols, _output_cols,deltatable, intermediate_tbl_views,globaltempviews, hardcodecol, joinList = pt.transform_to_purview()
-            if input_tables and output_table:
-                lineage_metadata = azStorage.create_lineage_entity(cluster_name, nb_name, input_tables,
-                                                            output_table, _input_cols, _output_cols,
-                                                            deltatable, intermediate_tbl_views,
-                                                            globaltempviews, hardcodecol, joinList)
-                azStorage.azure_upsert_entity(lineage_client, lineage_metadata)
-            print("Execution Completed")
-            metadata = azStorage.create_event_entity("HRSI",fileName,"Processed",3,myblob.name,False,"SUCCESS")
-        except BaseException as e:
-            print("Exception Caused in Parsing  " + str(e))
-            exc_type, exc_value, exc_traceback = sys.exc_info()
-            err_msg = traceback.format_exception(exc_type, exc_value,exc_traceback)[-2:]
-            # for i in traceback.format_exception(exc_type, exc_value,exc_traceback):
-            #     print(i)
-            metadata = azStorage.create_event_entity("HRSI",fileName,"Parsing Failed",3,myblob.name,False,err_msg)
-
-
-        try:
-            azStorage.azure_upsert_entity(event_client, metadata)
-        except:
-            logging.info("There is no ROWKEY (alias FileName) in the EventMetadata Table for Update")
+    # Point read of the event row; the blob is only parsed while its event is still to be processed.
+    entity = azStorage.azure_get_entity(event_client, streamName, fileName)
+    if entity is None or entity.get('Status') not in ('Unprocessed', 'Parsing Failed', 'Push Failed'):
+        logging.info(f"No unprocessed event for {fileName} in the EventMetadata Table")
+        return
+
+    pt = PurviewTransform(get_purview_client(), load_event(myblob))
+
+    print('RowKey:' + entity['RowKey'])
+    try:
+        cluster_name, nb_name, input_tables,output_table, _input_cols, _output_cols,deltatable, intermediate_tbl_views,globaltempviews, hardcodecol, joinList = pt.transform_to_purview()
+        if input_tables and output_table:
+            lineage_metadata = azStorage.create_lineage_entity(cluster_name, nb_name, input_tables,
+                                                        output_table, _input_cols, _output_cols,
+                                                        deltatable, intermediate_tbl_views,
+                                                        globaltempviews, hardcodecol, joinList)
+            azStorage.azure_upsert_entity(lineage_client, lineage_metadata)
+        print("Execution Completed")
+        metadata = azStorage.create_event_entity("HRSI",fileName,"Processed",3,myblob.name,False,"SUCCESS")
+    except NothingToLineage as e:
+        # Nothing to push to Purview; recorded so the event is not picked up again.
+        logging.info(f"Skipped {fileName}: {e}")
+        metadata = azStorage.create_event_entity("HRSI",fileName,"Skipped",3,myblob.name,False,str(e))
+    except PushFailed as e:
+        # Parsed, but the batched upload carrying its entities failed.
+        logging.error(f"Push of {fileName} failed: {e}")
+        metadata = azStorage.create_event_entity("HRSI",fileName,"Push Failed",3,myblob.name,False,str(e))
+    except BaseException as e:
+        print("Exception Caused in Parsing  " + str(e))
+        exc_type, exc_value, exc_traceback = sys.exc_info()
+        err_msg = traceback.format_exception(exc_type, exc_value,exc_traceback)[-2:]
+        # for i in traceback.format_exception(exc_type, exc_value,exc_traceback):
+        #     print(i)
+        metadata = azStorage.create_event_entity("HRSI",fileName,"Parsing Failed",3,myblob.name,False,err_msg)
+
+
+    try:
+        azStorage.azure_upsert_entity(event_client, metadata)
+    except:
+        logging.info("There is no ROWKEY (alias FileName) in the EventMetadata Table for Update")
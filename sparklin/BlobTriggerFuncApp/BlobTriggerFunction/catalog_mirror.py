@@ -0,0 +1,218 @@
+# Local mirror of the Purview catalog, for resolving entities without a search call.
+#
+# Looking an entity up with the Purview search API costs a paged request per
+# entity and event. CatalogMirror keeps the name, type, qualifiedName and guid of
+# the catalog's entities in an indexed SQLite file instead: Synapse_JsonParser
+# looks tables up by name, and json_parser looks the ends of its edges up by
+# qualifiedName to reference them with the type Purview knows them by. It is
+# refreshed incrementally, by searching for the entities updated since the
+# previous refresh, and rebuilt in full now and then to drop the entities deleted
+# from Purview, which searches do not return. Refreshes run from the
+# CatalogMirrorFunction timer and, when the mirror is older than its TTL, from
+# the first lookup that finds it stale.
+#
+# Each function app is deployed on its own, so both carry this module. The copy
+# in BlobTriggerFuncApp/BlobTriggerFunction is the canonical one; the copy in
+# JsonParserFuncApp/JsonParserFunction differs only by DEFAULT_TYPE_NAMES, which
+# JsonParserFuncApp/test/test_catalog_mirror.py checks.
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import NamedTuple
+
+# Searches for updated entities go back this far before the previous refresh,
+# in case Purview indexed some of them after it ran.
+WATERMARK_OVERLAP_MS = 5 * 60 * 1000
+# Wait before retrying a refresh that failed.
+RETRY_AFTER_S = 60
+# Entity types mirrored when CATALOG_MIRROR_TYPES is not set; empty for all types.
+DEFAULT_TYPE_NAMES = "azure_datalake_gen2_path,DataSet"
+
+_catalog_mirror = None
+_catalog_mirror_lock = threading.Lock()
+
+
+class CatalogEntry(NamedTuple):
+    """An entity of the Purview catalog.
+
+    Attributes:
+        guid (str): The guid of the entity.
+        name (str): Its name.
+        type_name (str): Its type, e.g. azure_datalake_gen2_path or fabric_lakehouse.
+        qualified_name (str): Its qualifiedName.
+    """
+    guid: str
+    name: str
+    type_name: str
+    qualified_name: str
+
+
+class CatalogMirror:
+    """The entities of the Purview catalog, mirrored in a SQLite file and indexed by name and qualifiedName."""
+
+    def __init__(self, path, ttl=900, full_refresh=86400, type_names=None):
+        """Open the mirror, creating its file if needed.
+
+        Args:
+            path (str): Path of the SQLite file.
+            ttl (int): Age, in seconds, after which a lookup refreshes the mirror first.
+            full_refresh (int): Age, in seconds, after which a refresh rebuilds the mirror.
+            type_names (list): Entity types mirrored; all types when empty.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.full_refresh = full_refresh
+        self.type_names = list(type_names or [])
+        self._next_attempt = 0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._connection:
+            # Several worker processes of an instance can share the file.
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS entities (qualified_name TEXT PRIMARY KEY, guid TEXT, name TEXT, "
+                "name_key TEXT, type_name TEXT, generation INTEGER)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS entities_name_key ON entities (name_key)")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS refreshes (id INTEGER PRIMARY KEY CHECK (id = 0), watermark INTEGER, "
+                "refreshed_at REAL, rebuilt_at REAL, generation INTEGER)")
+            self._connection.execute(
+                "INSERT OR IGNORE INTO refreshes VALUES (0, NULL, NULL, NULL, 0)")
+
+    def _state(self):
+        with self._lock:
+            return self._connection.execute(
+                "SELECT watermark, refreshed_at, rebuilt_at, generation FROM refreshes WHERE id = 0").fetchone()
+
+    def is_stale(self) -> bool:
+        """Return whether the mirror was never refreshed or is older than its TTL."""
+        refreshed_at = self._state()[1]
+        return refreshed_at is None or time.time() - refreshed_at > self.ttl
+
+    def search_filter(self, updated_after: int = None) -> dict:
+        """Return the Purview search filter selecting the mirrored entities.
+
+        Args:
+            updated_after (int): Only select the entities updated after this time, in ms since the epoch.
+
+        Returns:
+            dict: The filter, or None to select every entity.
+        """
+        conditions = []
+        if self.type_names:
+            conditions.append({"or": [{"entityType": type_name} for type_name in self.type_names]})
+        if updated_after is not None:
+            conditions.append({"updateTime": {"operator": "gt", "timeThreshold": updated_after}})
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"and": conditions}
+
+    def refresh(self, search, full: bool = False) -> int:
+        """Copy the entities updated since the previous refresh from Purview.
+
+        Args:
+            search (function): Called with a search filter (see search_filter), it
+                returns the matching Purview search results (dicts holding id,
+                name, entityType and qualifiedName), across all pages.
+            full (bool): Whether to copy every entity and drop those not found,
+                which is also done when the mirror is empty or its last rebuild
+                is older than full_refresh.
+
+        Returns:
+            int: Number of entities copied.
+        """
+        watermark, refreshed_at, rebuilt_at, generation = self._state()
+        started = time.time()
+        full = full or watermark is None or rebuilt_at is None or started - rebuilt_at > self.full_refresh
+        generation += 1
+        updated_after = None if full else watermark - WATERMARK_OVERLAP_MS
+
+        rows = []
+        for result in search(self.search_filter(updated_after)):
+            try:
+                rows.append((result["qualifiedName"], result["id"], result["name"], str(result["name"]).lower().strip(),
+                             result["entityType"], generation))
+            except KeyError:
+                logging.warning(f"[catalog_mirror.py] Unexpected Purview search result skipped: {result}")
+
+        with self._lock, self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO entities VALUES (?, ?, ?, ?, ?, ?)", rows)
+            if full:
+                self._connection.execute("DELETE FROM entities WHERE generation < ?", (generation,))
+            self._connection.execute(
+                "UPDATE refreshes SET watermark = ?, refreshed_at = ?, rebuilt_at = ?, generation = ? WHERE id = 0",
+                (int(started * 1000), time.time(), started if full else rebuilt_at, generation))
+        logging.info(f"[catalog_mirror.py] Catalog mirror {'rebuilt' if full else 'refreshed'}: {len(rows)} entities copied")
+        return len(rows)
+
+    def ensure_fresh(self, search) -> None:
+        """Refresh the mirror if it is stale, at most once at a time per worker.
+
+        A failed refresh is logged and retried after RETRY_AFTER_S; lookups
+        meanwhile use the entities already mirrored.
+
+        Args:
+            search (function): See refresh.
+        """
+        if not self.is_stale() or time.time() < self._next_attempt:
+            return
+        with self._refresh_lock:
+            if not self.is_stale() or time.time() < self._next_attempt:
+                return
+            try:
+                self.refresh(search)
+            except Exception as e:
+                self._next_attempt = time.time() + RETRY_AFTER_S
+                logging.warning(f"[catalog_mirror.py] Catalog mirror refresh failed, retrying in {RETRY_AFTER_S} s: {e}")
+
+    def find(self, name: str) -> list:
+        """Return the entities with a name, compared case-insensitively.
+
+        Args:
+            name (str): The entity name, e.g. a table name.
+
+        Returns:
+            list: CatalogEntry per entity, most recently copied last.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT guid, name, type_name, qualified_name FROM entities WHERE name_key = ? ORDER BY rowid",
+                (name.lower().strip(),)).fetchall()
+        return [CatalogEntry(*row) for row in rows]
+
+    def get(self, qualified_name: str) -> CatalogEntry:
+        """Return the entity with a qualifiedName, or None."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT guid, name, type_name, qualified_name FROM entities WHERE qualified_name = ?",
+                (qualified_name,)).fetchone()
+        return CatalogEntry(*row) if row else None
+
+
+def get_catalog_mirror() -> CatalogMirror:
+    """Return the worker's catalog mirror, opening it on first use.
+
+    Environment Variables Optional:
+        - CATALOG_MIRROR_PATH: SQLite file of the mirror (default: purview_catalog.sqlite in the temp directory)
+        - CATALOG_MIRROR_TTL: Age in seconds after which a lookup refreshes the mirror (default: 900)
+        - CATALOG_MIRROR_FULL_REFRESH: Age in seconds after which a refresh rebuilds the mirror (default: 86400)
+        - CATALOG_MIRROR_TYPES: Comma-separated entity types mirrored (default: DEFAULT_TYPE_NAMES)
+
+    Returns:
+        CatalogMirror: The shared mirror.
+    """
+    global _catalog_mirror
+    if _catalog_mirror is None:
+        with _catalog_mirror_lock:
+            if _catalog_mirror is None:
+                type_names = os.environ.get("CATALOG_MIRROR_TYPES", DEFAULT_TYPE_NAMES)
+                _catalog_mirror = CatalogMirror(
+                    os.environ.get("CATALOG_MIRROR_PATH", os.path.join(tempfile.gettempdir(), "purview_catalog.sqlite")),
+                    int(os.environ.get("CATALOG_MIRROR_TTL", "900")),
+                    int(os.environ.get("CATALOG_MIRROR_FULL_REFRESH", "86400")),
+                    [type_name.strip() for type_name in type_names.split(",") if type_name.strip()])
+    return _catalog_mirror
@@ -0,0 +1,47 @@
+# Class names of the Spark Catalyst nodes found in the OpenLineage spark.logicalPlan facet.
+# The names are interned once here so the parsers compare and look them up through
+# these shared constants instead of repeating the full class strings.
+import sys
+
+_LOGICAL = "org.apache.spark.sql.catalyst.plans.logical."
+_ANALYSIS = "org.apache.spark.sql.catalyst.analysis."
+_EXPRESSIONS = "org.apache.spark.sql.catalyst.expressions."
+_DATASOURCES = "org.apache.spark.sql.execution.datasources."
+_COMMAND = "org.apache.spark.sql.execution.command."
+
+# Logical plan nodes
+INSERT_INTO_STATEMENT = sys.intern(_LOGICAL + "InsertIntoStatement")
+CREATE_VIEW_STATEMENT = sys.intern(_LOGICAL + "CreateViewStatement")
+CREATE_TABLE_AS_SELECT_STATEMENT = sys.intern(_LOGICAL + "CreateTableAsSelectStatement")
+MERGE_INTO_TABLE = sys.intern(_LOGICAL + "MergeIntoTable")
+PROJECT = sys.intern(_LOGICAL + "Project")
+SUBQUERY_ALIAS = sys.intern(_LOGICAL + "SubqueryAlias")
+JOIN = sys.intern(_LOGICAL + "Join")
+CREATE_TABLE = sys.intern(_DATASOURCES + "CreateTable")
+LOGICAL_RELATION = sys.intern(_DATASOURCES + "LogicalRelation")
+SAVE_INTO_DATA_SOURCE_COMMAND = sys.intern(_DATASOURCES + "SaveIntoDataSourceCommand")
+CREATE_VIEW_COMMAND = sys.intern(_COMMAND + "CreateViewCommand")
+
+# Analysis nodes
+UNRESOLVED_RELATION = sys.intern(_ANALYSIS + "UnresolvedRelation")
+UNRESOLVED_ATTRIBUTE = sys.intern(_ANALYSIS + "UnresolvedAttribute")
+UNRESOLVED_FUNCTION = sys.intern(_ANALYSIS + "UnresolvedFunction")
+UNRESOLVED_ALIAS = sys.intern(_ANALYSIS + "UnresolvedAlias")
+UNRESOLVED_STAR = sys.intern(_ANALYSIS + "UnresolvedStar")
+ANALYSIS_LITERAL = sys.intern(_ANALYSIS + "Literal")
+
+# Expressions
+ALIAS = sys.intern(_EXPRESSIONS + "Alias")
+ATTRIBUTE_REFERENCE = sys.intern(_EXPRESSIONS + "AttributeReference")
+LITERAL = sys.intern(_EXPRESSIONS + "Literal")
+CAST = sys.intern(_EXPRESSIONS + "Cast")
+CASE_WHEN = sys.intern(_EXPRESSIONS + "CaseWhen")
+AND = sys.intern(_EXPRESSIONS + "And")
+OR = sys.intern(_EXPRESSIONS + "Or")
+EQUAL_TO = sys.intern(_EXPRESSIONS + "EqualTo")
+WINDOW_EXPRESSION = sys.intern(_EXPRESSIONS + "WindowExpression")
+WINDOW_SPEC_DEFINITION = sys.intern(_EXPRESSIONS + "WindowSpecDefinition")
+SORT_ORDER = sys.intern(_EXPRESSIONS + "SortOrder")
+UNSPECIFIED_FRAME = sys.intern(_EXPRESSIONS + "UnspecifiedFrame")
+UNSPECIFIED_FRAME_OBJECT = sys.intern(_EXPRESSIONS + "UnspecifiedFrame$")
+DESCENDING_OBJECT = sys.intern(_EXPRESSIONS + "Descending$")
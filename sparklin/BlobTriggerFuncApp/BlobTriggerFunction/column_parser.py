@@ -1,170 +1,197 @@
 # import json
 # from collections.abc import Mapping
+from .catalyst import ALIAS, UNRESOLVED_ALIAS
+from .expression_store import (ExpressionStore, value, attribute, UNRESOLVED_FUNCTION_ID,
+                               UNRESOLVED_ALIAS_ID, CAST_ID, CASE_WHEN_ID, WINDOW_EXPRESSION_ID,
+                               WINDOW_SPEC_DEFINITION_ID, SORT_ORDER_ID, UNSPECIFIED_FRAME_ID,
+                               UNSPECIFIED_FRAME_OBJECT_ID)
+from .render_cache import get_render_cache
 
+# The renderers below walk an ExpressionStore (see expression_store.py) by index:
+# row.cls / row.children replace the "class" / "num-children" lookups on the dicts.
+# They are generators driven by _render, so arbitrarily deep expressions render
+# without recursion, and each one builds its output in a list joined once.
+# Sub-expressions repeated across columns and plans are rendered once per worker
+# through the render cache (see render_cache.py).
 
-def unresolvedAttribute(string):
-    a = string.strip('[]').split(',')
-    return (".".join(i.strip() for i in a))
 
+def _render(row, renderer, index):
+    """Run a renderer and its nested renderer calls on an explicit stack.
 
-def literal(rec):
-    elem = ""
-    if rec["dataType"] == "string":
-        elem = "'" + rec["value"] + "'"
-    elif rec["dataType"] == "null":
-        elem = "NULL"
-    else:
-        elem = rec["value"]
-    return elem
-
-
-def attribute(rec):
-    str = ""
-    if rec["class"] == "org.apache.spark.sql.catalyst.analysis.UnresolvedAttribute":
-        str = unresolvedAttribute(rec["nameParts"])
-    elif rec["class"] == "org.apache.spark.sql.catalyst.analysis.Literal" or rec[
-        "class"] == "org.apache.spark.sql.catalyst.expressions.Literal":
-        str = literal(rec)
-    elif rec["class"] == "org.apache.spark.sql.catalyst.analysis.UnresolvedStar":
-        str = "*"
-    return str
+    The renderers below yield a (renderer, index) request for every nested
+    expression they need rendered and receive its (string, index) result back,
+    so the nesting depth of an expression grows this list instead of the
+    interpreter stack. Each request is first looked up in the worker's render
+    cache; a rendering is cached only when it ended exactly at the end of its
+    subtree, as it then depends on nothing but the subtree and the node after it.
+    """
+    cache = get_render_cache()
+    stack = []
+    result = None
+    request = (renderer, index)
+    while True:
+        if request is not None:
+            renderer, index = request
+            request = None
+            key = cache.key(row, renderer, index) if cache is not None else None
+            rendered = cache.get(key) if key is not None else None
+            if rendered is not None:
+                result = (rendered, row.end[index])
+            else:
+                stack.append((renderer(row, index), index, key))
+                result = None
+        if not stack:
+            return result
+        call, index, key = stack[-1]
+        try:
+            request = call.send(result)
+        except StopIteration as done:
+            stack.pop()
+            result = done.value
+            if key is not None and result[1] == row.end[index]:
+                cache.put(key, result[0])
 
 
-def WindowSpecDefinition(row, index):
-    str = ""
+def _window_spec_definition(row, index):
+    parts = []
+    size = len(row)
     # print(index)
     curr_index = index + 1
-    if len(row[index]["partitionSpec"]) > 0:
-        children = len(row[index]["partitionSpec"])
+    if value(row.partitions[index]) > 0:
+        children = value(row.partitions[index])
         no_of_children = 0
-        str += "PARTITION BY "
-        while no_of_children < children and curr_index < len(row):
+        parts.append("PARTITION BY ")
+        while no_of_children < children and curr_index < size:
             temp = ""
-            if row[curr_index]["num-children"] > 0:
-                temp, curr_index = function(row, curr_index)
+            if row.children[curr_index] > 0:
+                temp, curr_index = yield _function, curr_index
             else:
-                temp = attribute(row[curr_index])
-            str += temp
+                temp = value(row.text[curr_index])
+            parts.append(temp)
             if no_of_children < children - 1:
-                str += ", "
+                parts.append(", ")
             curr_index += 1
             no_of_children += 1
-    if len(row[index]["orderSpec"]) > 0:
-        str += " ORDER BY "
-        if row[curr_index]["num-children"] == 1:
+    if value(row.orders[index]) > 0:
+        parts.append(" ORDER BY ")
+        if row.children[curr_index] == 1:
             temp = ""
-            if row[curr_index]["direction"]["object"] == "org.apache.spark.sql.catalyst.expressions.Descending$":
+            if value(row.descending[curr_index]):
                 temp = " DESC"
             else:
                 temp = " ASC"
             curr_index += 1
-            children = len(row[index]["orderSpec"])
+            children = value(row.orders[index])
             no_of_children = 0
-            while no_of_children < children and curr_index < len(row):
+            while no_of_children < children and curr_index < size:
                 temp2 = ""
-                if row[curr_index]["class"] == "org.apache.spark.sql.catalyst.expressions.SortOrder":
-                    if row[curr_index]["direction"]["object"] == "org.apache.spark.sql.catalyst.expressions.Descending$":
+                if row.cls[curr_index] == SORT_ORDER_ID:
+                    if value(row.descending[curr_index]):
                         temp = " DESC"
                     else:
                         temp = " ASC"
                     curr_index += 1
                     continue
-                elif row[curr_index]["num-children"] > 0:
-                    temp2, curr_index = function(row, curr_index)
+                elif row.children[curr_index] > 0:
+                    temp2, curr_index = yield _function, curr_index
                 else:
-                    temp2 = attribute(row[curr_index])
-                str += temp2
-                str += temp
+                    temp2 = value(row.text[curr_index])
+                parts.append(temp2)
+                parts.append(temp)
                 if no_of_children < children - 1:
-                    str += ", "
+                    parts.append(", ")
                 curr_index += 1
                 no_of_children += 1
                 # print(curr_index)
 
-    if row[curr_index]["class"] == "org.apache.spark.sql.catalyst.expressions.UnspecifiedFrame$":
+    if row.cls[curr_index] == UNSPECIFIED_FRAME_OBJECT_ID:
         curr_index += 1
         pass
-    return (str, curr_index - 1)
+    return ("".join(parts), curr_index - 1)
 
 
-def windowExpression(row, index):
-    fstr = ""
+def _window_expression(row, index):
+    parts = []
     curr_index = index + 1
-    if row[curr_index]["class"] == "org.apache.spark.sql.catalyst.analysis.UnresolvedFunction":
-        str, curr_index = function(row, curr_index)
-        fstr += str
-        curr_index += 1
-    fstr += " OVER ("
-    if row[curr_index]["class"] == "org.apache.spark.sql.catalyst.expressions.WindowSpecDefinition":
-        str, curr_index = WindowSpecDefinition(row, curr_index)
-        fstr += str
+    if row.cls[curr_index] == UNRESOLVED_FUNCTION_ID:
+        str, curr_index = yield _function, curr_index
+        parts.append(str)
         curr_index += 1
-    fstr += ")"
-    return (fstr, curr_index - 1)
-
-
-def recurse(row, index):
-    children = row[index]["num-children"]
-    no_of_children = 0
-    curr_index = index + 1
-    while no_of_children < children and curr_index < len(row):
-        curr_index = recurse(row, curr_index)
+    parts.append(" OVER (")
+    if row.cls[curr_index] == WINDOW_SPEC_DEFINITION_ID:
+        str, curr_index = yield _window_spec_definition, curr_index
+        parts.append(str)
         curr_index += 1
-        no_of_children += 1
-    return curr_index - 1
+    parts.append(")")
+    return ("".join(parts), curr_index - 1)
 
 
-def function(row, curr_index):
-    funcName,funcStr, index = "", "", ""
-    if row[curr_index]["class"] == "org.apache.spark.sql.catalyst.expressions.CaseWhen":
+def _function(row, curr_index):
+    funcName, index = "", ""
+    cid = row.cls[curr_index]
+    if cid == CASE_WHEN_ID:
         return ("CASE WHEN function", recurse(row, curr_index))
-    elif row[curr_index]["class"] == "org.apache.spark.sql.catalyst.expressions.Cast":
+    elif cid == CAST_ID:
         funcName = "CAST"
     # elif row[curr_index]["class"] == "org.apache.spark.sql.catalyst.expressions.Add":
     #     pass
-    elif row[curr_index]["class"] == "org.apache.spark.sql.catalyst.expressions.UnspecifiedFrame":
-        return (funcStr, index)
-    elif row[curr_index]["class"] == "org.apache.spark.sql.catalyst.analysis.UnresolvedAlias":
+    elif cid == UNSPECIFIED_FRAME_ID:
+        return ("", index)
+    elif cid == UNRESOLVED_ALIAS_ID:
         pass
     else:
-        if "name" in row[curr_index]:
-            funcName = row[curr_index]["name"]["funcName"]
-        else:
-            funcName = row[curr_index]["class"].split(".")[-1]
-    children = row[curr_index]["num-children"]
-    if row[curr_index]["class"] == "org.apache.spark.sql.catalyst.analysis.UnresolvedAlias":
-        funcStr = ""
-    else:
-        funcStr = f"{funcName}("
+        funcName = value(row.name[curr_index])
+    children = row.children[curr_index]
+    size = len(row)
+    parts = []
+    if cid != UNRESOLVED_ALIAS_ID:
+        parts.append(f"{funcName}(")
     index = curr_index + 1
     no_of_children = 0
-    while no_of_children < children and index < len(row):
-        elem = row[index]
+    while no_of_children < children and index < size:
+        elem = row.cls[index]
         str = ""
-        if elem["class"] == "org.apache.spark.sql.catalyst.analysis.UnresolvedFunction":
-            str, index = function(row, index)
-        elif elem["class"] == "org.apache.spark.sql.catalyst.expressions.Cast":
-            str, index = function(row, index)
-        elif elem["class"] == "org.apache.spark.sql.catalyst.expressions.WindowExpression":
-            str, index = windowExpression(row, index)
-        elif elem["num-children"] == 0:
-            str = attribute(elem)
+        if elem == UNRESOLVED_FUNCTION_ID:
+            str, index = yield _function, index
+        elif elem == CAST_ID:
+            str, index = yield _function, index
+        elif elem == WINDOW_EXPRESSION_ID:
+            str, index = yield _window_expression, index
+        elif row.children[index] == 0:
+            str = value(row.text[index])
         else:
-            str, index = function(row, index)
-        funcStr += str
+            str, index = yield _function, index
+        parts.append(str)
         if no_of_children < children - 1:
-            funcStr += ", "
+            parts.append(", ")
         index += 1
         no_of_children += 1
     if funcName == "CAST":
-        dataType = row[curr_index]["dataType"].upper()
-        funcStr += f" AS {dataType}"
+        dataType = value(row.data_type[curr_index])
+        parts.append(f" AS {dataType}")
 
-    if row[curr_index]["class"] == "org.apache.spark.sql.catalyst.analysis.UnresolvedAlias":
+    if cid == UNRESOLVED_ALIAS_ID:
         pass
     else:
-        funcStr += ")"
-    return (funcStr, index - 1)
+        parts.append(")")
+    return ("".join(parts), index - 1)
+
+
+def WindowSpecDefinition(row, index):
+    return _render(row, _window_spec_definition, index)
+
+
+def windowExpression(row, index):
+    return _render(row, _window_expression, index)
+
+
+def recurse(row, index):
+    # Index of the last node of the subtree rooted at index, precomputed by the store.
+    return row.end[index]
+
+
+def function(row, curr_index):
+    return _render(row, _function, curr_index)
 
 
 def get_column_transformations(parseJson):
@@ -174,9 +201,7 @@ def get_column_transformations(parseJson):
         firstElem = line[0]
         alias = ""
         index = 0
-        if firstElem["class"] == "org.apache.spark.sql.catalyst.analysis.UnresolvedAlias":
-            pass
-        if firstElem["class"] == "org.apache.spark.sql.catalyst.expressions.Alias":
+        if firstElem["class"] == ALIAS:
             alias = firstElem["name"]
             index += 1
         elif firstElem["num-children"] == 0:
@@ -185,19 +210,21 @@ def get_column_transformations(parseJson):
         # print("sdc")
         if len(line) > 1:
             # print("Dsc")
+            # Each projected expression is read into its compact form once, then rendered from it.
+            row = ExpressionStore(line)
             funcStr = ""
-            while index < len(line):
-                if line[index]["class"] == "org.apache.spark.sql.catalyst.expressions.WindowExpression":
-                    funcStr, index = windowExpression(line, index)
+            while index < len(row):
+                if row.cls[index] == WINDOW_EXPRESSION_ID:
+                    funcStr, index = windowExpression(row, index)
                 # elif line[index]["num-children"] == 0:
                 #     funcStr = attribute(line[index])
-                elif line[index]["num-children"] > 0:
-                    funcStr, index = function(line, index)
+                elif row.children[index] > 0:
+                    funcStr, index = function(row, index)
                 index += 1
             if funcStr != "":
 
                 # print(index)
-                if firstElem["class"] == "org.apache.spark.sql.catalyst.analysis.UnresolvedAlias":
+                if firstElem["class"] == UNRESOLVED_ALIAS:
                     output += [funcStr]
                     # print(funcStr)
                 else:
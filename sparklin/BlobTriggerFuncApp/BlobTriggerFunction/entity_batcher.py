@@ -0,0 +1,205 @@
+# Cross-event batching of Purview entity uploads.
+#
+# Every event used to upload its own handful of entities, repeating the DataSets
+# that other events of the worker had just uploaded. EntityBatcher collects the
+# entities submitted by concurrent invocations while an upload is in progress,
+# keeps one copy per typeName and qualifiedName, and uploads them in
+# size-bounded bulk requests sent in parallel. Each submission gets back,
+# through a future, the guids assigned to its own entities, or the error of the
+# request that carried them, so every invocation still records the outcome of
+# its own event.
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+_entity_batchers = {}
+_entity_batchers_lock = threading.Lock()
+
+
+def _is_placeholder(guid):
+    # Entities created by the upload carry negative placeholder guids (see GuidTracker).
+    return guid is None or str(guid).startswith("-")
+
+
+def _key(entity):
+    return entity["typeName"], entity["attributes"]["qualifiedName"]
+
+
+class EntityBatcher:
+    """Uploads the entities of concurrent events together, deduplicated by typeName and qualifiedName.
+
+    Uploads are made by a background thread, one batch at a time: a batch holds
+    every entity submitted while the previous one was being uploaded, so an idle
+    worker uploads an event's entities right away and a busy one groups them.
+    """
+
+    def __init__(self, client, window=0.0, batch_size=100, max_workers=4):
+        """Initialize the batcher.
+
+        Args:
+            client (AtlasClient): The client uploading the entities.
+            window (float): Seconds a batch waits for more submissions before it is uploaded.
+            batch_size (int): Maximum number of entities per bulk request.
+            max_workers (int): Maximum number of bulk requests sent in parallel.
+        """
+        self.client = client
+        self.window = window
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self._pending = {}
+        self._submissions = []
+        self._ready = threading.Condition()
+        self._thread = None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+
+    def submit(self, entities):
+        """Queue entities for upload.
+
+        When several submissions hold an entity with the same typeName and
+        qualifiedName, the last one submitted is uploaded.
+
+        Args:
+            entities (list): AtlasEntity, AtlasProcess or entity dicts, as accepted by upload_entities.
+
+        Returns:
+            Future: Resolves to {"guidAssignments": {placeholder guid: guid}} for
+            the submitted entities, or raises the error of a request carrying them.
+        """
+        future = Future()
+        entities = [entity.to_json() if hasattr(entity, "to_json") else entity for entity in entities]
+        with self._ready:
+            for entity in entities:
+                self._pending[_key(entity)] = entity
+            self._submissions.append((future, [(_key(entity), entity.get("guid")) for entity in entities]))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="entity-batcher", daemon=True)
+                self._thread.start()
+            self._ready.notify()
+        return future
+
+    def _run(self):
+        while True:
+            with self._ready:
+                while not self._submissions:
+                    self._ready.wait()
+                if self.window > 0 and len(self._pending) < self.batch_size * self.max_workers:
+                    self._ready.wait(self.window)
+                pending, submissions = self._pending, self._submissions
+                self._pending, self._submissions = {}, []
+            try:
+                self._flush(pending, submissions)
+            except Exception as e:
+                for future, _ in submissions:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _flush(self, pending, submissions):
+        # Placeholder guids are only unique within an event, so they are
+        # reassigned across the batch; real guids are kept.
+        guids = {}
+        for position, (key, entity) in enumerate(pending.items()):
+            guids[key] = -(position + 1) if _is_placeholder(entity.get("guid")) else entity["guid"]
+
+        entities = list(pending.items())
+        if len(entities) <= self.batch_size:
+            phases = [[entities]]
+        else:
+            # Processes refer to their DataSets, which are therefore created first.
+            datasets = [item for item in entities if not self._is_process(item[1])]
+            processes = [item for item in entities if self._is_process(item[1])]
+            phases = [self._chunks(datasets), self._chunks(processes)]
+
+        outcomes = {}
+        for chunks in phases:
+            payloads = [self._payload(chunk, guids) for chunk in chunks]
+            if self._executor is not None and len(payloads) > 1:
+                results = list(self._executor.map(self._upload, payloads))
+            else:
+                results = [self._upload(payload) for payload in payloads]
+            for chunk, result in zip(chunks, results):
+                for key, _ in chunk:
+                    outcomes[key] = result
+
+        for future, submitted in submissions:
+            errors = [outcomes[key] for key, _ in submitted if isinstance(outcomes[key], Exception)]
+            results = dict((key, outcomes[key]) for key, _ in submitted)
+            if errors and len(submissions) > 1:
+                # A failed request may have been spoiled by another event's entities,
+                # so the event's own entities are uploaded again on their own.
+                result = self._upload(self._payload([(key, pending[key]) for key in dict.fromkeys(results)], guids))
+                results = dict((key, result) for key in results)
+                errors = [result] if isinstance(result, Exception) else []
+            if errors:
+                future.set_exception(errors[0])
+                continue
+            assignments = {}
+            for key, guid in submitted:
+                assigned = (results[key].get("guidAssignments") or {}).get(str(guids[key]), guids[key])
+                if guid is not None:
+                    assignments[str(guid)] = assigned
+            future.set_result({"guidAssignments": assignments})
+        logging.info(f"Uploaded {len(pending)} entities for {len(submissions)} submission(s) "
+                     f"in {sum(len(chunks) for chunks in phases)} request(s)")
+
+    @staticmethod
+    def _is_process(entity):
+        return "inputs" in entity["attributes"] or "outputs" in entity["attributes"]
+
+    def _chunks(self, items):
+        return [items[start:start + self.batch_size] for start in range(0, len(items), self.batch_size)]
+
+    @staticmethod
+    def _payload(chunk, guids):
+        keys = set(key for key, _ in chunk)
+
+        def reference(ref):
+            key = (ref.get("typeName"),
+                   ref.get("qualifiedName") or (ref.get("uniqueAttributes") or {}).get("qualifiedName"))
+            if key in keys:
+                return {"typeName": key[0], "guid": guids[key], "qualifiedName": key[1]}
+            if _is_placeholder(ref.get("guid")):
+                # Uploaded by another request: referred to by its qualifiedName.
+                return {"typeName": key[0], "uniqueAttributes": {"qualifiedName": key[1]}}
+            return ref
+
+        payload = []
+        for key, entity in chunk:
+            entity = dict(entity, guid=guids[key], attributes=dict(entity["attributes"]))
+            for direction in ("inputs", "outputs"):
+                if direction in entity["attributes"]:
+                    entity["attributes"][direction] = [reference(ref) for ref in entity["attributes"][direction]]
+            payload.append(entity)
+        return payload
+
+    def _upload(self, payload):
+        try:
+            return self.client.upload_entities(batch=payload)
+        except Exception as e:
+            logging.warning(f"Upload of {len(payload)} entities failed: {e}")
+            return e
+
+
+def get_entity_batcher(client):
+    """Return the worker's entity batcher for a client, creating it on first use.
+
+    Environment Variables Optional:
+        - ENTITY_BATCH_WINDOW_MS: Time a batch waits for more events before it is uploaded (default: 0)
+        - ENTITY_BATCH_SIZE: Maximum number of entities per bulk request (default: 100)
+        - ENTITY_BATCH_CONCURRENCY: Maximum number of bulk requests sent in parallel (default: 4)
+
+    Args:
+        client (AtlasClient): The client uploading the entities.
+
+    Returns:
+        EntityBatcher: The batcher shared by the invocations using this client.
+    """
+    with _entity_batchers_lock:
+        batcher = _entity_batchers.get(id(client))
+        if batcher is None or batcher.client is not client:
+            batcher = EntityBatcher(client,
+                                    int(os.environ.get("ENTITY_BATCH_WINDOW_MS", "0")) / 1000,
+                                    int(os.environ.get("ENTITY_BATCH_SIZE", "100")),
+                                    int(os.environ.get("ENTITY_BATCH_CONCURRENCY", "4")))
+            _entity_batchers[id(client)] = batcher
+        return batcher
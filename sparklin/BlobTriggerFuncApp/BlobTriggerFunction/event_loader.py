@@ -0,0 +1,84 @@
+# Selective loading of an OpenLineage event blob.
+#
+# A Synapse event carries, besides the logical plan, facets such as the Spark
+# properties and environment that PurviewTransform never reads, and can weigh
+# several MB. load_event reads the blob incrementally and only materializes the
+# members transform_to_purview uses; the others are skipped token by token
+# without being built.
+import ijson
+
+# Top-level members kept whole.
+EVENT_MEMBERS = ("job", "inputs", "outputs")
+# Members of "run" kept whole; "facets" is handled separately.
+RUN_MEMBERS = ("runId",)
+# Run facets kept whole. The other facets are kept as empty placeholders, since
+# the parser goes by how many facets an event has to tell whether it has a plan.
+RUN_FACETS = ("spark.logicalPlan",)
+
+_OPENING = ("start_map", "start_array")
+_CLOSING = ("end_map", "end_array")
+
+
+def _build(events):
+    builder = ijson.ObjectBuilder()
+    depth = 0
+    for event, value in events:
+        builder.event(event, value)
+        if event in _OPENING:
+            depth += 1
+        elif event in _CLOSING:
+            depth -= 1
+        if depth == 0:
+            return builder.value
+
+
+def _skip(events):
+    depth = 0
+    for event, value in events:
+        if event in _OPENING:
+            depth += 1
+        elif event in _CLOSING:
+            depth -= 1
+        if depth == 0:
+            return
+
+
+def _members(events, kept, nested=None, placeholders=False):
+    # Reads an object, building the members named in kept and skipping the others,
+    # which are kept as empty dicts with placeholders. nested maps members to the
+    # function that reads them.
+    event, value = next(events)
+    if event != "start_map":
+        # Not an object (e.g. null): built as is.
+        return _build(iter([(event, value)]))
+    members = {}
+    for event, key in events:
+        if event == "end_map":
+            return members
+        if nested and key in nested:
+            members[key] = nested[key](events)
+        elif key in kept:
+            members[key] = _build(events)
+        else:
+            _skip(events)
+            if placeholders:
+                members[key] = {}
+    return members
+
+
+def _run(events):
+    return _members(events, RUN_MEMBERS, {"facets": lambda facets: _members(facets, RUN_FACETS, placeholders=True)})
+
+
+def load_event(stream):
+    """Load the parts of an OpenLineage event blob that PurviewTransform reads.
+
+    Args:
+        stream (file): The blob, opened for binary reading.
+
+    Returns:
+        dict: The event, holding only job, inputs, outputs, run.runId and the
+        spark.logicalPlan run facet; the other run facets are empty dicts.
+    """
+    events = ijson.basic_parse(stream, use_float=True)
+    return _members(events, EVENT_MEMBERS, {"run": _run})
@@ -0,0 +1,286 @@
+# Compact, array-backed form of a flattened Catalyst expression.
+#
+# The spark.logicalPlan facet serializes every expression as a pre-order list of
+# dicts, each holding its class name and "num-children". ExpressionStore reads
+# such a list once into parallel arrays (interned class ids, child counts,
+# subtree end offsets and parent indices) plus the few values the renderers
+# print, so column_parser can walk and skip subtrees by index without going back
+# to the dicts or comparing class name strings.
+import threading
+from functools import lru_cache
+
+from .catalyst import (UNRESOLVED_ATTRIBUTE, UNRESOLVED_FUNCTION, UNRESOLVED_ALIAS, UNRESOLVED_STAR, ANALYSIS_LITERAL,
+                       ALIAS, LITERAL, CAST, CASE_WHEN, WINDOW_EXPRESSION, WINDOW_SPEC_DEFINITION, SORT_ORDER,
+                       UNSPECIFIED_FRAME, UNSPECIFIED_FRAME_OBJECT, DESCENDING_OBJECT)
+
+_class_ids = {}
+_class_names = []
+_short_names = []
+_class_ids_lock = threading.Lock()
+
+
+def class_id(name):
+    """Return the interned id of a class name, assigning a new one on first use."""
+    cid = _class_ids.get(name)
+    if cid is None:
+        with _class_ids_lock:
+            cid = _class_ids.get(name)
+            if cid is None:
+                cid = len(_class_names)
+                _class_names.append(name)
+                _short_names.append(name.split(".")[-1])
+                _class_ids[name] = cid
+    return cid
+
+
+def class_name(cid):
+    """Return the class name of an interned id."""
+    return _class_names[cid]
+
+
+UNRESOLVED_ATTRIBUTE_ID = class_id(UNRESOLVED_ATTRIBUTE)
+UNRESOLVED_FUNCTION_ID = class_id(UNRESOLVED_FUNCTION)
+UNRESOLVED_ALIAS_ID = class_id(UNRESOLVED_ALIAS)
+UNRESOLVED_STAR_ID = class_id(UNRESOLVED_STAR)
+ANALYSIS_LITERAL_ID = class_id(ANALYSIS_LITERAL)
+ALIAS_ID = class_id(ALIAS)
+LITERAL_ID = class_id(LITERAL)
+CAST_ID = class_id(CAST)
+CASE_WHEN_ID = class_id(CASE_WHEN)
+WINDOW_EXPRESSION_ID = class_id(WINDOW_EXPRESSION)
+WINDOW_SPEC_DEFINITION_ID = class_id(WINDOW_SPEC_DEFINITION)
+SORT_ORDER_ID = class_id(SORT_ORDER)
+UNSPECIFIED_FRAME_ID = class_id(UNSPECIFIED_FRAME)
+UNSPECIFIED_FRAME_OBJECT_ID = class_id(UNSPECIFIED_FRAME_OBJECT)
+
+
+class Missing:
+    """Placeholder for a value that could not be read from a node.
+
+    The renderers only read some values on some paths, so a missing or
+    malformed value is kept as the error it raised and raised again when, and
+    only when, a renderer reaches it.
+    """
+
+    __slots__ = ("error",)
+
+    def __init__(self, error):
+        self.error = error
+
+
+
+def value(item):
+    """Return a value read from a node, raising the error recorded for it if it was missing."""
+    if type(item) is Missing:
+        # Placeholders can be shared, so each raise starts a fresh traceback.
+        raise item.error.with_traceback(None)
+    return item
+
+
+def _read(read, node):
+    try:
+        return read(node)
+    except Exception as e:
+        return Missing(e)
+
+
+@lru_cache(maxsize=4096)
+def _column_name(string):
+    a = string.strip('[]').split(',')
+    return (".".join(i.strip() for i in a))
+
+
+def unresolvedAttribute(string):
+    # The same columns are referenced throughout a plan, so their names are parsed once per worker.
+    if type(string) is str:
+        return _column_name(string)
+    return _column_name.__wrapped__(string)
+
+
+def literal(rec):
+    elem = ""
+    if rec["dataType"] == "string":
+        elem = "'" + rec["value"] + "'"
+    elif rec["dataType"] == "null":
+        elem = "NULL"
+    else:
+        elem = rec["value"]
+    return elem
+
+
+def attribute(rec):
+    str = ""
+    if rec["class"] == UNRESOLVED_ATTRIBUTE:
+        str = unresolvedAttribute(rec["nameParts"])
+    elif rec["class"] == ANALYSIS_LITERAL or rec["class"] == LITERAL:
+        str = literal(rec)
+    elif rec["class"] == UNRESOLVED_STAR:
+        str = "*"
+    return str
+
+
+def _text(node):
+    text = attribute(node)
+    if type(text) is not str:
+        # Renderings are concatenated into the output, which a non-string literal value cannot be.
+        raise TypeError(f'can only concatenate str (not "{type(text).__name__}") to str')
+    return text
+
+
+def _func_name(node):
+    if "name" in node:
+        # Rendered through an f-string, so a non-string funcName is kept as its rendering.
+        name = node["name"]["funcName"]
+        return name if type(name) is str else f"{name}"
+    return node["class"].split(".")[-1]
+
+
+def _data_type(node):
+    return node["dataType"].upper()
+
+
+def _is_descending(node):
+    return node["direction"]["object"] == DESCENDING_OBJECT
+
+
+def _partition_count(node):
+    return len(node["partitionSpec"])
+
+
+def _order_count(node):
+    return len(node["orderSpec"])
+
+
+_NO_DATA_TYPE = Missing(KeyError("dataType"))
+_ALIAS_NAME = _read(_func_name, {"name": ""})
+_NO_DIRECTION = Missing(KeyError("direction"))
+
+
+class ExpressionStore:
+    """A flattened Catalyst expression held in parallel arrays.
+
+    Attributes:
+        cls (list): Interned class id of each node.
+        children (list): Number of children of each node.
+        end (list): Index of the last node of each node's subtree, bounded by the list.
+        parent (list): Index of each node's parent, -1 for top-level nodes.
+        text (list): Rendering of each node as a leaf (column, literal or star).
+        name (list): Function name of each node.
+        data_type (list): Target type of each Cast, upper-cased.
+        descending (list): Whether each node's sort direction is descending.
+        partitions (list): Number of partition expressions of each window specification.
+        orders (list): Number of order expressions of each window specification.
+    """
+
+    __slots__ = ("cls", "children", "end", "parent", "text", "name", "data_type", "descending", "partitions", "orders",
+                 "_digests")
+
+    def __init__(self, nodes):
+        """Read a pre-order list of expression nodes.
+
+        Args:
+            nodes (list): The flattened expression, as found in a projectList entry.
+        """
+        size = len(nodes)
+        cls, children = [], []
+        text = [None] * size
+        name = [None] * size
+        data_type = [_NO_DATA_TYPE] * size
+        descending = [_NO_DIRECTION] * size
+        partitions = [None] * size
+        orders = [None] * size
+
+        for i, node in enumerate(nodes):
+            cid = _class_ids.get(node["class"])
+            if cid is None:
+                cid = class_id(node["class"])
+            count = node["num-children"]
+            cls.append(cid)
+            children.append(count)
+            # Values are read eagerly but kept as Missing when absent, so errors surface where the renderers reach them.
+            if count == 0:
+                if cid == UNRESOLVED_ATTRIBUTE_ID and type(node.get("nameParts")) is str:
+                    text[i] = _column_name(node["nameParts"])
+                else:
+                    text[i] = _read(_text, node)
+            if "name" not in node:
+                name[i] = _short_names[cid]
+            elif type(node["name"]) is str:
+                # An Alias, whose name is the output column rather than a function.
+                name[i] = _ALIAS_NAME
+            elif type(node["name"]) is dict and type(node["name"].get("funcName")) is str:
+                name[i] = node["name"]["funcName"]
+            else:
+                name[i] = _read(_func_name, node)
+            if cid == WINDOW_SPEC_DEFINITION_ID:
+                partitions[i] = _read(_partition_count, node)
+                orders[i] = _read(_order_count, node)
+            if "dataType" in node:
+                data_type[i] = node["dataType"].upper() if type(node["dataType"]) is str else _read(_data_type, node)
+            if "direction" in node:
+                descending[i] = _read(_is_descending, node)
+
+        # Subtree ends are filled from the last node backwards, since a node's
+        # children (and their subtrees) all come after it.
+        end = list(range(size))
+        parent = [-1] * size
+        for i in range(size - 1, -1, -1):
+            curr_index = i + 1
+            no_of_children = 0
+            while no_of_children < children[i] and curr_index < size:
+                parent[curr_index] = i
+                curr_index = end[curr_index] + 1
+                no_of_children += 1
+            end[i] = curr_index - 1
+
+        self.cls = cls
+        self.children = children
+        self.end = end
+        self.parent = parent
+        self.text = text
+        self.name = name
+        self.data_type = data_type
+        self.descending = descending
+        self.partitions = partitions
+        self.orders = orders
+        self._digests = None
+
+    def __len__(self):
+        return len(self.cls)
+
+    def digest(self, index):
+        """Return the structural hash of the subtree rooted at a node.
+
+        Two subtrees have the same hash when they hold the same nodes with the
+        same values in the same shape, wherever they appear, so a rendering can
+        be reused for every occurrence of a sub-expression. The hashes of all
+        the subtrees are computed together, on first use.
+
+        Args:
+            index (int): Index of the subtree root.
+
+        Returns:
+            int: The hash.
+        """
+        if self._digests is None:
+            size = len(self)
+            # Every value held for a node is hashable (see _func_name), so the
+            # node's own part of the hash is computed in one pass. Missing values
+            # hash by identity: only the shared placeholders for absent fields
+            # and Alias names match across subtrees.
+            digests = list(map(hash, zip(self.cls, self.children, self.text, self.name, self.data_type,
+                                         self.descending, self.partitions, self.orders)))
+            children, end = self.children, self.end
+            for i in range(size - 1, -1, -1):
+                if children[i] == 0:
+                    continue
+                node = [digests[i]]
+                curr_index = i + 1
+                no_of_children = 0
+                while no_of_children < children[i] and curr_index < size:
+                    node.append(digests[curr_index])
+                    curr_index = end[curr_index] + 1
+                    no_of_children += 1
+                digests[i] = hash(tuple(node))
+            self._digests = digests
+        return self._digests[index]
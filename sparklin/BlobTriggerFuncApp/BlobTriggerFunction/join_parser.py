@@ -1,130 +1,199 @@
-
-def get_join_conditions(output_plan,_alias_tablenames):
-    # print("get joins info")
+import logging
+from typing import NamedTuple
+
+from .catalyst import AND, OR, EQUAL_TO, UNRESOLVED_ATTRIBUTE, UNRESOLVED_FUNCTION, LITERAL
+
+JOIN_TYPE_NAMES = {"LeftOuter": "LOJ", "RightOuter": "ROJ", "Inner": "IJ", "FullOuter": "FOJ"}
+
+
+class JoinSide(NamedTuple):
+    """One side of a join.
+
+    Attributes:
+        table (str): The table behind the alias, or InlineQuery when the alias names a subquery.
+        alias (str): The alias the join condition refers to.
+    """
+    table: str
+    alias: str
+
+
+class JoinRecord(NamedTuple):
+    """A join between two aliased relations of a plan.
+
+    Attributes:
+        left (JoinSide): The relation whose alias appears first in the condition.
+        right (JoinSide): The other relation.
+        type (str): The join type, abbreviated for the common ones (IJ, LOJ, ROJ, FOJ).
+        predicate (str): The part of the join condition relating the two sides.
+    """
+    left: JoinSide
+    right: JoinSide
+    type: str
+    predicate: str
+
+    def describe(self):
+        """Return the join as stored in the JoinConditions attribute, e.g. "Sales s IJ Stores t ON s.id = t.id"."""
+        return self.left.table + " " + self.left.alias + " " + self.type + " " + self.right.table + " " + \
+               self.right.alias + " ON " + self.predicate
+
+
+def _predicate(outputs, conditions):
+    if len(conditions) > 0 and len(outputs) > 1:
+        return " ".join([x for y in zip(outputs, conditions + [0]) for x in y][:-1])
+    return outputs[0]
+
+
+def _alias_pairs(join_aliases, output_aliases):
+    # Splits a condition spanning more than two aliases into one predicate per pair of
+    # aliases compared. A comparison involving a single alias (e.g. a filter on a
+    # column) goes with the pair compared before it, or the first pair.
+    order = {alias: position for position, alias in enumerate(join_aliases)}
+    pairs = []
+    for aliases in output_aliases:
+        distinct = list(dict.fromkeys(aliases))
+        pairs.append(tuple(sorted(distinct[:2], key=order.get)) if len(distinct) > 1 else None)
+    first = next((pair for pair in pairs if pair is not None), None)
+    previous = None
+    for position, pair in enumerate(pairs):
+        if pair is None:
+            pairs[position] = previous or first
+        else:
+            previous = pair
+    return pairs
+
+
+def extract_joins(output_plan, _alias_tablenames):
+    """Extract the joins of a plan in one pass over its Join nodes.
+
+    Args:
+        output_plan (list): The Join nodes of the plan, in plan order.
+        _alias_tablenames (dict): The table name of each alias of the plan.
+
+    Returns:
+        list: JoinRecord per pair of aliases joined. A Join node whose condition
+        compares more than two aliases (a multi-way join) yields one record per
+        pair; one whose condition names fewer than two is logged and skipped.
+    """
+    # Aliases are resolved case-insensitively, through an index built once for the plan.
+    alias_tables = dict((k.lower(), v) for k, v in _alias_tablenames.items())
     overall_conditions = []
     mid_expressions = []
     attr_expressions = []
     attr_functions = []
     attr_output = []
     intermediate_output = []
+    # Aliases referenced by each entry of intermediate_output, and since the last one.
+    output_aliases = []
+    pending_aliases = []
     aliases = []
-    joinList = []
+    joins = []
     count = 0
 
     for child in output_plan:
 
-        finalout = ""
-        if child['class'] == 'org.apache.spark.sql.catalyst.plans.logical.Join':
-            join = (child['joinType']['object'])[:-1]
-            joinname = join.split('.')[-1]
+        join = (child['joinType']['object'])[:-1]
+        joinname = join.split('.')[-1]
+        joinname = JOIN_TYPE_NAMES.get(joinname, joinname)
 
-            if (joinname == "LeftOuter"):
-                joinname = "LOJ"
-            elif (joinname == "RightOuter"):
-                joinname = "ROJ"
-            elif (joinname == "Inner"):
-                joinname = "IJ"
-            elif (joinname == "FullOuter"):
-                joinname = "FOJ"
+        for i in range(len(child['condition'])):
 
-            for i in range(len(child['condition'])):
+            childclass = child['condition'][i]['class']
 
-                childclass = child['condition'][i]['class']
+            if childclass != AND and childclass != OR:
+                if childclass != EQUAL_TO:
+                    if childclass != UNRESOLVED_ATTRIBUTE and childclass != LITERAL:
 
-                if childclass != 'org.apache.spark.sql.catalyst.expressions.And' and childclass != 'org.apache.spark.sql.catalyst.expressions.Or':
-                    if childclass != 'org.apache.spark.sql.catalyst.expressions.EqualTo':
-                        if (
-                                childclass != 'org.apache.spark.sql.catalyst.analysis.UnresolvedAttribute' and childclass != 'org.apache.spark.sql.catalyst.expressions.Literal'):
+                        if childclass == UNRESOLVED_FUNCTION:
+                            attr_functions.append(child['condition'][i]['name']['funcName'])
+                        # this is for expressions on attribute like isnotnull OR CAST
+                        else:
+                            func = childclass.split('.')[-1]
+                            if func == 'Cast':
+                                datatype = child['condition'][i]['dataType']
+                                func = "Cast AS " + datatype
+                            attr_expressions.append(func)
 
-                            if childclass == "org.apache.spark.sql.catalyst.analysis.UnresolvedFunction":
-                                attr_functions.append(child['condition'][i]['name']['funcName'])
-                            # this is for expressions on attribute like isnotnull OR CAST
+                    else:
+                        if childclass == UNRESOLVED_ATTRIBUTE:
+                            if (child['condition'][i])['nameParts'].find(",") > 0:
+                                column = ((child['condition'][i])['nameParts']).split(',')[1][1:-1]
+                                tablealias = ((child['condition'][i])['nameParts']).split(',')[0][1:]
+                                table = tablealias + "." + column
                             else:
-                                func = childclass.split('.')[-1]
-                                if func == 'Cast':
-                                    datatype = child['condition'][i]['dataType']
-                                    func = "Cast AS " + datatype
-                                attr_expressions.append(func)
-
+                                column = ((child['condition'][i])['nameParts'])[0]
+                                tablealias = ""
+                                table = column
+
+                            # apply functions and expressions on attribute
+                            if len(attr_functions) > 0:
+                                for func in attr_functions:
+                                    table = func + "(" + table + ")"
+                                attr_functions.clear()
+
+                            if len(attr_expressions) > 0:
+                                for exp in attr_expressions:
+                                    table = table + " " + exp
+                                attr_expressions.clear()
+
+                            attr_output.append(table)
+                            if tablealias:
+                                aliases.append(tablealias)
+                                pending_aliases.append(tablealias)
                         else:
-                            if childclass == 'org.apache.spark.sql.catalyst.analysis.UnresolvedAttribute':
-                                if (child['condition'][i])['nameParts'].find(",") > 0:
-                                    column = ((child['condition'][i])['nameParts']).split(',')[1][1:-1]
-                                    tablealias = ((child['condition'][i])['nameParts']).split(',')[0][1:]
-                                    table = tablealias + "." + column
-                                else:
-                                    column = ((child['condition'][i])['nameParts'])[0]
-                                    tablealias = ""
-                                    table = column
-
-
-                                # apply functions and expressions on attribute
-                                if len(attr_functions) > 0:
-                                    for func in attr_functions:
-                                        table = func + "(" + table + ")"
-                                    attr_functions.clear()
-
-                                if len(attr_expressions) > 0:
-                                    for exp in attr_expressions:
-                                        table = table + " " + exp
-                                    attr_expressions.clear()
-
-                                attr_output.append(table)
-                                if tablealias:
-                                    aliases.append(tablealias)
-                            else:
-                                literaldatatype = child['condition'][i]['dataType']
-                                value = child['condition'][i]['value']
-                                attr_output.append(value)
-
-                            # if we have mid expression that means we will get two unresoved attributes class
-                            if (len(mid_expressions) >= 1):
-                                count = count + 1
-                                if count == 2:
-                                    intermediate_output.append(
-                                        attr_output[0] + " " + mid_expressions[0] + " " + attr_output[1])
-
-                                    attr_output.clear()
-                                    mid_expressions.clear()
-                                    count = 0
-                            else:
-                                intermediate_output.append(attr_output[0])
+                            value = child['condition'][i]['value']
+                            attr_output.append(value)
+
+                        # if we have mid expression that means we will get two unresoved attributes class
+                        if (len(mid_expressions) >= 1):
+                            count = count + 1
+                            if count == 2:
+                                intermediate_output.append(
+                                    attr_output[0] + " " + mid_expressions[0] + " " + attr_output[1])
+                                output_aliases.append(pending_aliases)
+                                pending_aliases = []
+
                                 attr_output.clear()
-                    else:
-                        if childclass.split('.')[-1] == "EqualTo":
-                            mid_expressions.append("=")
+                                mid_expressions.clear()
+                                count = 0
                         else:
-                            mid_expressions.append(childclass.split('.')[-1])
+                            intermediate_output.append(attr_output[0])
+                            output_aliases.append(pending_aliases)
+                            pending_aliases = []
+                            attr_output.clear()
                 else:
-                    overall_conditions.append(childclass.split('.')[-1])
-
-                if i + 1 == len(child['condition']):
-
-                    finalaliases = list(set(aliases))
-
-                    _alias_tablenames_new = dict((k.lower(), v) for k, v in _alias_tablenames.items())
-                    
-                    if finalaliases[0].lower() in _alias_tablenames_new.keys():
-                        alias1 = _alias_tablenames_new[finalaliases[0].lower()]
-                    else:
-                        alias1 = "InlineQuery"
-                    if finalaliases[1].lower() in _alias_tablenames_new.keys():
-                        alias11 = _alias_tablenames_new[finalaliases[1].lower()]
-                    else:
-                        alias11 = "InlineQuery"
-                    if len(overall_conditions) > 0 and len(intermediate_output) > 1:
-                        finalout = alias1 + " " + finalaliases[0] + " " + joinname + " " + alias11 + " " + \
-                                   finalaliases[1] + " ON " + " ".join(
-                            [x for y in zip(intermediate_output, overall_conditions + [0]) for x in y][:-1])
-                    else:
-                        finalout = alias1 + " " + finalaliases[0] + " " + joinname + " " + alias11 + " " + \
-                                   finalaliases[1] + " ON " + intermediate_output[0]
-
-                    # print(finalout)
-                    joinList.append(finalout)
-
-                    overall_conditions.clear()
-                    intermediate_output.clear()
-                    aliases.clear()
-    return joinList
-    # print("exit joins info")
\ No newline at end of file
+                    mid_expressions.append("=")
+            else:
+                overall_conditions.append(childclass.split('.')[-1])
+
+        if len(child['condition']) > 0:
+            # Aliases in order of first appearance in the condition.
+            finalaliases = list(dict.fromkeys(aliases))
+            if len(finalaliases) < 2 or not intermediate_output:
+                logging.warning(f"Skipping {joinname} join: its condition references {len(finalaliases)} table alias(es)")
+            elif len(finalaliases) == 2:
+                joins.append(JoinRecord(
+                    JoinSide(alias_tables.get(finalaliases[0].lower(), "InlineQuery"), finalaliases[0]),
+                    JoinSide(alias_tables.get(finalaliases[1].lower(), "InlineQuery"), finalaliases[1]),
+                    joinname, _predicate(intermediate_output, overall_conditions)))
+            else:
+                pairs = _alias_pairs(finalaliases, output_aliases)
+                for pair in dict.fromkeys(pair for pair in pairs if pair is not None):
+                    positions = [position for position, p in enumerate(pairs) if p == pair]
+                    # The connective before each comparison kept, as the first one has none.
+                    conditions = [overall_conditions[position - 1] for position in positions[1:]
+                                  if position - 1 < len(overall_conditions)]
+                    joins.append(JoinRecord(
+                        JoinSide(alias_tables.get(pair[0].lower(), "InlineQuery"), pair[0]),
+                        JoinSide(alias_tables.get(pair[1].lower(), "InlineQuery"), pair[1]),
+                        joinname, _predicate([intermediate_output[position] for position in positions], conditions)))
+
+            overall_conditions.clear()
+            intermediate_output.clear()
+            output_aliases.clear()
+            aliases.clear()
+    return joins
+
+
+def get_join_conditions(output_plan, _alias_tablenames):
+    """Describe the joins of a plan, one string per JoinRecord (see JoinRecord.describe)."""
+    return [join.describe() for join in extract_joins(output_plan, _alias_tablenames)]
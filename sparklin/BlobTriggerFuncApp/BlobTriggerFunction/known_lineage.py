@@ -0,0 +1,170 @@
+# Last lineage pushed to Purview, per job and process.
+#
+# purview_plan_push used to upload the process, its inputs and its output on
+# every run of a notebook, although most runs produce the lineage of the run
+# before. KnownLineage keeps, per notebook and process qualifiedName, the edges
+# and attributes last pushed, so that a new run only sends what changed: nothing
+# when the lineage is the same, a partial update when only attributes such as
+# columnMapping or JoinConditions changed, and the process with its new DataSets
+# when its inputs or output changed.
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from azure.core.exceptions import ResourceNotFoundError
+from azure.data.tables import UpdateMode
+
+from .Data import AZTableStorage
+
+# Table Storage limit on a string property, in characters.
+INLINE_LIMIT = 30000
+
+_known_lineage = None
+_known_lineage_lock = threading.Lock()
+
+
+def diff_lineage(previous, current):
+    """Compare the lineage of a process with the lineage last pushed for it.
+
+    Args:
+        previous (dict): The lineage last pushed, as stored by KnownLineage.put.
+        current (dict): The new lineage: 'edges', a list of edges (lists or tuples),
+            and optionally 'attributes', a dict of process attributes.
+
+    Returns:
+        tuple: (added, removed, changed) where added and removed list the edges
+        found only in the new and only in the previous lineage, as tuples, and
+        changed maps the attributes whose value changed to their new value.
+    """
+    previous_edges = [tuple(edge) for edge in previous.get("edges", [])]
+    current_edges = [tuple(edge) for edge in current.get("edges", [])]
+    previous_set, current_set = set(previous_edges), set(current_edges)
+    added = [edge for edge in current_edges if edge not in previous_set]
+    removed = [edge for edge in previous_edges if edge not in current_set]
+    previous_attributes = previous.get("attributes") or {}
+    changed = dict((name, value) for name, value in (current.get("attributes") or {}).items()
+                   if previous_attributes.get(name) != value)
+    return added, removed, changed
+
+
+class KnownLineage:
+    """The lineage last pushed per job and process, in memory and optionally in a table shared by all workers.
+
+    Entries expire after a TTL, so the whole lineage of a process is still
+    pushed now and then, e.g. after it was edited in Purview.
+    """
+
+    def __init__(self, table_client=None, capacity=1024, ttl=86400):
+        """Initialize the store.
+
+        Args:
+            table_client (TableClient): The KnownLineage table, or None to keep the lineages in memory only.
+            capacity (int): Maximum number of processes kept in memory.
+            ttl (int): Age, in seconds, after which a lineage is ignored.
+        """
+        self.table_client = table_client
+        self.capacity = capacity
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _row(job, process):
+        # Qualified names hold characters that table keys do not accept.
+        return (hashlib.sha1(job.encode("utf-8")).hexdigest(),
+                hashlib.sha1(process.encode("utf-8")).hexdigest())
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def get(self, job, process):
+        """Return the lineage last pushed for a process, or None.
+
+        Args:
+            job (str): The notebook the process belongs to.
+            process (str): The qualifiedName of the process.
+
+        Returns:
+            dict: The lineage, as stored by put.
+        """
+        with self._lock:
+            entry = self._entries.get((job, process))
+        if entry is None and self.table_client is not None:
+            partition_key, row_key = self._row(job, process)
+            try:
+                row = self.table_client.get_entity(partition_key=partition_key, row_key=row_key)
+                entry = (row["pushed_at"], json.loads(row["lineage"]))
+                self._remember((job, process), entry)
+            except ResourceNotFoundError:
+                pass
+            except Exception as e:
+                logging.warning(f"Known lineage lookup failed: {e}")
+        if entry is None or time.time() - entry[0] > self.ttl:
+            return None
+        return entry[1]
+
+    def put(self, job, process, lineage):
+        """Record the lineage just pushed for a process.
+
+        The entry expires ttl seconds after this call, so it is only called
+        after something was actually pushed: a run that sent nothing must not
+        keep the lineage from being pushed in full again.
+
+        Args:
+            job (str): The notebook the process belongs to.
+            process (str): The qualifiedName of the process.
+            lineage (dict): JSON-serializable lineage, see diff_lineage.
+        """
+        entry = (time.time(), lineage)
+        self._remember((job, process), entry)
+        if self.table_client is None:
+            return
+        serialized = json.dumps(lineage)
+        if len(serialized) > INLINE_LIMIT:
+            logging.info(f"Known lineage of {process} ({len(serialized)} characters) kept in memory only")
+            return
+        partition_key, row_key = self._row(job, process)
+        try:
+            self.table_client.upsert_entity(mode=UpdateMode.REPLACE, entity={
+                "PartitionKey": partition_key,
+                "RowKey": row_key,
+                "job": job,
+                "process": process,
+                "pushed_at": entry[0],
+                "lineage": serialized
+            })
+        except Exception as e:
+            logging.warning(f"Known lineage write failed: {e}")
+
+
+def get_known_lineage():
+    """Return the worker's known lineage store, creating it on first use.
+
+    Environment Variables Optional:
+        - KNOWN_LINEAGE_TABLE: Table persisting the known lineages, shared by all workers (default: in memory only)
+        - KNOWN_LINEAGE_SIZE: Maximum number of processes kept in memory (default: 1024, 0 disables diffing)
+        - KNOWN_LINEAGE_TTL: Age in seconds after which a lineage is pushed again in full (default: 86400)
+
+    Returns:
+        KnownLineage: The shared store, or None when disabled.
+    """
+    global _known_lineage
+    if _known_lineage is None:
+        with _known_lineage_lock:
+            if _known_lineage is None:
+                capacity = int(os.environ.get("KNOWN_LINEAGE_SIZE", "1024"))
+                table_client = None
+                table_name = os.environ.get("KNOWN_LINEAGE_TABLE")
+                if capacity > 0 and table_name:
+                    table_client = AZTableStorage().createClient(table_name,
+                                                                 os.environ["datalineagesynapsestrpoc_STORAGE"])
+                _known_lineage = KnownLineage(table_client, capacity,
+                                              int(os.environ.get("KNOWN_LINEAGE_TTL", "86400"))) if capacity > 0 else False
+    return _known_lineage or None
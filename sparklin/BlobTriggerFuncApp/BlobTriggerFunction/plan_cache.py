@@ -0,0 +1,175 @@
+# Cache of transform outputs, keyed by a fingerprint of the event's logical plan.
+#
+# Scheduled notebooks send the same plan run after run; only the run id, the
+# expression ids Spark assigns and the dates passed in as parameters change.
+# plan_fingerprint hashes the parts of an event PurviewTransform reads with
+# those values left out, and PlanCache keeps the lineage it produced, so a
+# repeated plan is neither parsed nor pushed to Purview again.
+#
+# Date and timestamp literals are left out of the fingerprint, so the
+# hardcoded columns of a cached plan show the literal values of the run that
+# filled the cache. Other literals are kept, as a changed constant is a changed
+# lineage.
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from azure.core.exceptions import ResourceNotFoundError
+from azure.data.tables import UpdateMode
+
+from .Data import AZTableStorage
+from .catalyst import LITERAL, ANALYSIS_LITERAL
+
+# Values Spark assigns anew on every run.
+RUN_SPECIFIC_KEYS = frozenset(("exprId", "resultId", "jvmId"))
+RUN_SPECIFIC_LITERAL_TYPES = frozenset(("date", "timestamp"))
+# Table Storage limit on a string property, in characters.
+INLINE_LIMIT = 30000
+
+_plan_cache = None
+_plan_cache_lock = threading.Lock()
+
+
+def _normalized(value):
+    if type(value) is dict:
+        if value.get("class") in (LITERAL, ANALYSIS_LITERAL) and value.get("dataType") in RUN_SPECIFIC_LITERAL_TYPES:
+            return dict(value, value=None)
+        return dict((k, _normalized(v)) for k, v in value.items() if k not in RUN_SPECIFIC_KEYS)
+    if type(value) is list:
+        return [_normalized(v) for v in value]
+    return value
+
+
+def _dataset(dataset):
+    facets = dataset.get("facets") or {}
+    return [dataset.get("namespace"), dataset.get("name"), facets.get("schema"), facets.get("columnLineage")]
+
+
+def plan_fingerprint(event):
+    """Return the fingerprint of an event's lineage.
+
+    Two events have the same fingerprint when they have the same job, the same
+    datasets (name, schema and column lineage) and the same logical plan, up to
+    run-specific values (see RUN_SPECIFIC_KEYS and RUN_SPECIFIC_LITERAL_TYPES).
+
+    Args:
+        event (dict): The OpenLineage event.
+
+    Returns:
+        str: The SHA-256 of the normalized event, in hex.
+    """
+    facets = event.get("run", {}).get("facets") or {}
+    normalized = {
+        "job": event.get("job", {}).get("name"),
+        "inputs": [_dataset(dataset) for dataset in event.get("inputs") or []],
+        "outputs": [_dataset(dataset) for dataset in event.get("outputs") or []],
+        # transform_to_purview goes by the number of run facets to tell whether there is a plan.
+        "facets": len(facets),
+        "plan": _normalized((facets.get("spark.logicalPlan") or {}).get("plan"))
+    }
+    serialized = json.dumps(normalized, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+class PlanCache:
+    """Transform outputs by plan fingerprint, in memory and optionally in a table shared by all workers.
+
+    Entries expire after a TTL, so the lineage of a repeated plan is still
+    pushed again now and then, e.g. after its entities were edited in Purview.
+    """
+
+    def __init__(self, table_client=None, capacity=1024, ttl=86400):
+        """Initialize the cache.
+
+        Args:
+            table_client (TableClient): The PlanCache table, or None to keep the cache in memory only.
+            capacity (int): Maximum number of entries kept in memory.
+            ttl (int): Age, in seconds, after which an entry is ignored.
+        """
+        self.table_client = table_client
+        self.capacity = capacity
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, fingerprint, entry):
+        with self._lock:
+            self._entries[fingerprint] = entry
+            self._entries.move_to_end(fingerprint)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def get(self, fingerprint):
+        """Return the transform output cached for a fingerprint, or None.
+
+        Returns:
+            dict: The output, as stored by put.
+        """
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+        if entry is None and self.table_client is not None:
+            try:
+                row = self.table_client.get_entity(partition_key=fingerprint, row_key="plan")
+                entry = (row["cached_at"], json.loads(row["output"]))
+                self._remember(fingerprint, entry)
+            except ResourceNotFoundError:
+                pass
+            except Exception as e:
+                logging.warning(f"Plan cache lookup failed: {e}")
+        if entry is None or time.time() - entry[0] > self.ttl:
+            return None
+        return entry[1]
+
+    def put(self, fingerprint, output):
+        """Cache the transform output of a fingerprint.
+
+        Args:
+            fingerprint (str): See plan_fingerprint.
+            output (dict): JSON-serializable output of the transform.
+        """
+        entry = (time.time(), output)
+        self._remember(fingerprint, entry)
+        if self.table_client is None:
+            return
+        serialized = json.dumps(output)
+        if len(serialized) > INLINE_LIMIT:
+            logging.info(f"Plan cache entry of {len(serialized)} characters kept in memory only")
+            return
+        try:
+            self.table_client.upsert_entity(mode=UpdateMode.REPLACE, entity={
+                "PartitionKey": fingerprint,
+                "RowKey": "plan",
+                "cached_at": entry[0],
+                "output": serialized
+            })
+        except Exception as e:
+            logging.warning(f"Plan cache write failed: {e}")
+
+
+def get_plan_cache():
+    """Return the worker's plan cache, creating it on first use.
+
+    Environment Variables Optional:
+        - PLAN_CACHE_TABLE: Table persisting the cache, shared by all workers (default: in memory only)
+        - PLAN_CACHE_SIZE: Maximum number of entries kept in memory (default: 1024, 0 disables the cache)
+        - PLAN_CACHE_TTL: Age in seconds after which a cached plan is parsed and pushed again (default: 86400)
+
+    Returns:
+        PlanCache: The shared cache, or None when disabled.
+    """
+    global _plan_cache
+    if _plan_cache is None:
+        with _plan_cache_lock:
+            if _plan_cache is None:
+                capacity = int(os.environ.get("PLAN_CACHE_SIZE", "1024"))
+                table_client = None
+                table_name = os.environ.get("PLAN_CACHE_TABLE")
+                if capacity > 0 and table_name:
+                    table_client = AZTableStorage().createClient(table_name,
+                                                                 os.environ["datalineagesynapsestrpoc_STORAGE"])
+                _plan_cache = PlanCache(table_client, capacity,
+                                        int(os.environ.get("PLAN_CACHE_TTL", "86400"))) if capacity > 0 else False
+    return _plan_cache or None
@@ -0,0 +1,42 @@
+# Purview client shared by every invocation of the worker.
+#
+# pyapacheatlas is only imported, and the client only built, when the first event
+# needs it, so loading the function (on every cold start and scale-out) does not
+# pay for them. The client, and with it the access token its authentication
+# caches until expiry, is then reused by the following invocations.
+import os
+import threading
+
+_purview_client = None
+_purview_client_lock = threading.Lock()
+
+
+def get_purview_client():
+    """Return the worker's Purview client, creating it on first use.
+
+    Environment Variables Required:
+        - TENANT_ID: Azure AD tenant of the service principal
+        - CLIENT_ID: Application id of the service principal
+        - CLIENT_SECRET: Secret of the service principal
+        - PURVIEW_ACCOUNT_NAME: Name of the Purview account
+
+    Returns:
+        PurviewClient: The shared client.
+    """
+    global _purview_client
+    if _purview_client is None:
+        with _purview_client_lock:
+            if _purview_client is None:
+                from pyapacheatlas.auth import ServicePrincipalAuthentication
+                from pyapacheatlas.core import PurviewClient
+
+                oauth = ServicePrincipalAuthentication(
+                    tenant_id=os.environ["TENANT_ID"],
+                    client_id=os.environ["CLIENT_ID"],
+                    client_secret=os.environ["CLIENT_SECRET"]
+                )
+                _purview_client = PurviewClient(
+                    account_name=os.environ["PURVIEW_ACCOUNT_NAME"],
+                    authentication=oauth
+                )
+    return _purview_client
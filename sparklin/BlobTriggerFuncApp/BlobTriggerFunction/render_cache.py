@@ -0,0 +1,113 @@
+# Memo of rendered sub-expressions, shared by the projections of all the plans a
+# worker parses.
+#
+# Generated SQL tends to repeat the same sub-expressions (a CAST(... AS DATE), a
+# window specification) across many columns and notebooks. column_parser looks
+# each sub-expression up here by the structural hash of its subtree (see
+# ExpressionStore.digest) before rendering it.
+import os
+import threading
+from collections import OrderedDict
+from .expression_store import _column_name
+
+# Subtrees smaller than this are cheaper to render than to hash and look up.
+MIN_CACHED_NODES = 4
+
+_render_cache = None
+_render_cache_lock = threading.Lock()
+
+
+class RenderCache:
+    """Bounded LRU of rendered sub-expressions, keyed by renderer, subtree hash and size."""
+
+    def __init__(self, capacity=4096, min_nodes=MIN_CACHED_NODES):
+        """Initialize the cache.
+
+        Args:
+            capacity (int): Maximum number of rendered sub-expressions kept.
+            min_nodes (int): Smallest subtree, in nodes, worth caching.
+        """
+        self.capacity = capacity
+        self.min_nodes = min_nodes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, row, renderer, index):
+        """Return the cache key of a renderer call, or None if the call is not worth caching.
+
+        Besides the subtree itself, the key holds the class and child count of the
+        node that follows it: it is the only node outside the subtree a renderer
+        looks at (a window specification checks it for a trailing frame) without
+        going past the subtree end, which is the only case whose result is cached.
+
+        Args:
+            row (ExpressionStore): The expression being rendered.
+            renderer (function): The renderer called on the subtree.
+            index (int): Index of the subtree root.
+
+        Returns:
+            tuple: The key, or None.
+        """
+        end = row.end[index]
+        if end - index + 1 < self.min_nodes:
+            return None
+        following = (row.cls[end + 1], row.children[end + 1]) if end + 1 < len(row) else None
+        return renderer, row.digest(index), end - index, following
+
+    def get(self, key):
+        """Return the rendering stored under a key, or None."""
+        with self._lock:
+            rendered = self._entries.get(key)
+            if rendered is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return rendered
+
+    def put(self, key, rendered):
+        """Store a rendering, evicting the least recently used one if needed."""
+        with self._lock:
+            self._entries[key] = rendered
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """Return the hit count, miss count, hit rate and size of the cache, and the
+        hit rate of the column name memo used for leaves.
+
+        Returns:
+            dict: Counters since the worker started.
+        """
+        columns = _column_name.cache_info()
+        column_lookups = columns.hits + columns.misses
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "column_name_hit_rate": columns.hits / column_lookups if column_lookups else 0.0
+            }
+
+
+def get_render_cache():
+    """Return the worker's render cache, creating it on first use.
+
+    Environment Variables Optional:
+        - RENDER_CACHE_SIZE: Maximum number of rendered sub-expressions kept (default: 4096, 0 disables the cache)
+
+    Returns:
+        RenderCache: The shared cache, or None when disabled.
+    """
+    global _render_cache
+    if _render_cache is None:
+        with _render_cache_lock:
+            if _render_cache is None:
+                capacity = int(os.environ.get("RENDER_CACHE_SIZE", "4096"))
+                _render_cache = RenderCache(capacity) if capacity > 0 else False
+    return _render_cache or None
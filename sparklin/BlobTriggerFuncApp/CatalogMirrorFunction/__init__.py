@@ -0,0 +1,19 @@
+import logging
+import azure.functions as func
+from ..BlobTriggerFunction.catalog_mirror import get_catalog_mirror
+from ..BlobTriggerFunction.purview import get_purview_client
+
+def main(mytimer: func.TimerRequest):
+    """Azure Timer-triggered function that refreshes the worker's catalog mirror.
+
+    The mirror is also refreshed by the first lookup that finds it older than
+    its TTL; refreshing it on a schedule keeps that cost off event processing.
+    JsonParserFuncApp has the same timer, searching with its own Purview client.
+
+    Args:
+        mytimer (func.TimerRequest): The timer that triggered the function.
+    """
+    client = get_purview_client()
+    count = get_catalog_mirror().refresh(
+        lambda search_filter: client.discovery.search_entities("*", limit=1000, search_filter=search_filter))
+    logging.info(f"Catalog mirror refreshed on schedule: {count} entities copied")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The function folders are imported as top-level packages, as the Functions host does.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,168 @@
+import io
+import json
+import threading
+import pytest
+from azure.core.exceptions import ResourceNotFoundError
+import BlobTriggerFunction
+from BlobTriggerFunction import Data, Synapse_JsonParser
+from BlobTriggerFunction.Data import AZTableStorage
+from BlobTriggerFunction.plan_cache import PlanCache, plan_fingerprint
+
+
+class FakeTable:
+    def __init__(self):
+        self.rows = {}
+
+    def get_entity(self, partition_key, row_key):
+        try:
+            return self.rows[(partition_key, row_key)]
+        except KeyError:
+            raise ResourceNotFoundError("Not Found")
+
+    def upsert_entity(self, mode, entity):
+        self.rows[(entity["PartitionKey"], entity["RowKey"])] = entity
+
+
+class FakeTableService:
+    def __init__(self):
+        self.tables = {}
+        self.created = []
+
+    def create_table_if_not_exists(self, table_name):
+        self.created.append(table_name)
+
+    def get_table_client(self, table_name):
+        return self.tables.setdefault(table_name, FakeTable())
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = FakeTableService()
+    connections = []
+    monkeypatch.setattr(Data.TableServiceClient, "from_connection_string",
+                        lambda conn_str: connections.append(conn_str) or service)
+    monkeypatch.setattr(Data, "_table_services", {})
+    monkeypatch.setattr(Data, "_provisioned", set())
+    monkeypatch.setenv("TableName", "EventMetadata")
+    monkeypatch.setenv("StorageTableName", "LineageDetails")
+    monkeypatch.setenv("datalineagesynapsestrpoc_STORAGE", "conn")
+    service.connections = connections
+    return service
+
+
+def test_clients_share_one_service_and_provision_each_table_once(service):
+    for _ in range(3):
+        AZTableStorage().createClient("EventMetadata", "conn")
+        AZTableStorage().createClient("LineageDetails", "conn")
+
+    assert service.connections == ["conn"]
+    assert service.created == ["EventMetadata", "LineageDetails"]
+
+
+def test_get_entity_is_a_point_read(service):
+    table = AZTableStorage().createClient("EventMetadata", "conn")
+    table.rows[("HRSI", "evt1")] = {"PartitionKey": "HRSI", "RowKey": "evt1", "Status": "Unprocessed"}
+
+    assert AZTableStorage().azure_get_entity(table, "HRSI", "evt1")["Status"] == "Unprocessed"
+    assert AZTableStorage().azure_get_entity(table, "HRSI", "evt2") is None
+
+
+class Blob(io.BytesIO):
+    name = "events/evt1.json"
+
+
+class Transform:
+    """Stands in for PurviewTransform, counting the events transformed."""
+    events = []
+
+    def __init__(self, client, event):
+        self.event = event
+
+    def transform_to_purview(self):
+        Transform.events.append(self.event)
+        return "hrsi", "nb_run1", ["orders"], "sales", ["id"], ["id"], [], [], [], [], []
+
+
+@pytest.fixture
+def transform(monkeypatch):
+    Transform.events = []
+    monkeypatch.setattr(BlobTriggerFunction, "PurviewTransform", Transform)
+    monkeypatch.setattr(BlobTriggerFunction, "get_purview_client", lambda: "client")
+    return Transform
+
+
+@pytest.mark.parametrize("status", [None, "Processed", "Skipped"])
+def test_events_already_handled_are_not_parsed(status, service, transform):
+    if status:
+        service.get_table_client("EventMetadata").rows[("HRSI", "evt1")] = {"RowKey": "evt1", "Status": status}
+
+    BlobTriggerFunction.main(Blob(b"not even json"))
+
+    assert transform.events == []
+    assert service.get_table_client("LineageDetails").rows == {}
+
+
+@pytest.mark.parametrize("status", ["Unprocessed", "Parsing Failed", "Push Failed"])
+def test_pending_events_are_transformed_once(status, service, transform):
+    events = service.get_table_client("EventMetadata")
+    events.rows[("HRSI", "evt1")] = {"RowKey": "evt1", "Status": status}
+    event = {"run": {"runId": "run1", "facets": {}}, "job": {"name": "nb"}, "inputs": [], "outputs": []}
+
+    BlobTriggerFunction.main(Blob(json.dumps(event).encode()))
+
+    assert transform.events == [event]
+    assert events.rows[("HRSI", "evt1")]["Status"] == "Processed"
+    assert service.get_table_client("LineageDetails").rows[("hrsi", "nb_run1")]["output_table"] == "sales"
+
+
+class RejectingClient:
+    """Fails every bulk upload, recording the processes each one carried."""
+
+    def __init__(self):
+        self.requests = []
+
+    def upload_entities(self, batch):
+        self.requests.append(sorted(entity["attributes"]["qualifiedName"] for entity in batch
+                                    if entity["typeName"] == "HRServicesInsights_OneHRSI"))
+        raise ValueError("Purview rejected the request")
+
+
+def notebook_event(notebook):
+    column_lineage = {"id": {"inputFields": [{"namespace": "abfss://lake", "name": "/silver/orders", "field": "id"}]}}
+    return {"run": {"runId": "run1", "facets": {"spark_version": {}}}, "job": {"name": f"hrsi_{notebook}_insert_1"},
+            "inputs": [{"namespace": "abfss://lake", "name": "/silver/orders", "facets": {}}],
+            "outputs": [{"namespace": "abfss://lake", "name": f"/gold/{notebook}",
+                         "facets": {"columnLineage": {"fields": column_lineage}}}]}
+
+
+def test_failed_shared_upload_is_recorded_on_each_event(service, monkeypatch):
+    client = RejectingClient()
+    cache = PlanCache()
+    monkeypatch.setattr(BlobTriggerFunction, "get_purview_client", lambda: client)
+    monkeypatch.setattr(Synapse_JsonParser, "get_plan_cache", lambda: cache)
+    monkeypatch.setattr(Synapse_JsonParser, "get_known_lineage", lambda: None)
+    monkeypatch.setenv("ENTITY_BATCH_WINDOW_MS", "500")
+    events = service.get_table_client("EventMetadata")
+    blobs = []
+    for notebook in ("nb1", "nb2"):
+        events.rows[("HRSI", notebook)] = {"RowKey": notebook, "Status": "Unprocessed"}
+        blob = Blob(json.dumps(notebook_event(notebook)).encode())
+        blob.name = f"events/{notebook}.json"
+        blobs.append(blob)
+
+    # Both events are transformed within the batch window, so their entities are uploaded in one request.
+    threads = [threading.Thread(target=BlobTriggerFunction.main, args=(blob,)) for blob in blobs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    # The failed request is split to isolate the failing event, and both fail on their own.
+    assert [len(processes) for processes in client.requests] == [2, 1, 1]
+    for notebook in ("nb1", "nb2"):
+        row = events.rows[("HRSI", notebook)]
+        assert row["Status"] == "Push Failed"
+        assert "Purview rejected the request" in row["Message"]
+    assert service.get_table_client("LineageDetails").rows == {}
+    # Not cached as pushed, so the redelivered events are parsed and uploaded again.
+    assert [cache.get(plan_fingerprint(notebook_event(notebook))) for notebook in ("nb1", "nb2")] == [None, None]
@@ -0,0 +1,127 @@
+import importlib
+import os
+import sys
+import types
+from types import SimpleNamespace
+import pytest
+from BlobTriggerFunction import catalog_mirror, Synapse_JsonParser
+from BlobTriggerFunction.catalog_mirror import CatalogMirror, CatalogEntry, WATERMARK_OVERLAP_MS, RETRY_AFTER_S
+from BlobTriggerFunction.Synapse_JsonParser import PurviewTransform
+
+
+def entity(guid, name, qualified_name, entity_type="azure_datalake_gen2_path"):
+    return {"id": guid, "name": name, "entityType": entity_type, "qualifiedName": qualified_name}
+
+
+class Search:
+    """Returns the results set on it, or raises them if they are an exception, and records the filters used."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.filters = []
+
+    def __call__(self, search_filter):
+        self.filters.append(search_filter)
+        if isinstance(self.results, Exception):
+            raise self.results
+        return iter(self.results)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(catalog_mirror.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def mirror(tmp_path, clock):
+    return CatalogMirror(str(tmp_path / "catalog.sqlite"), ttl=60, full_refresh=3600, type_names=["DataSet"])
+
+
+def test_refreshes_incrementally_from_the_watermark(mirror, clock):
+    search = Search(entity("g1", "Orders", "hrsi://silver/orders"), {"id": "broken"})
+    assert mirror.refresh(search) == 1
+
+    clock[0] += 100
+    search.results = [entity("g2", "orders", "ultp://silver/orders", "DataSet")]
+    mirror.refresh(search)
+
+    assert search.filters == [
+        {"or": [{"entityType": "DataSet"}]},
+        {"and": [{"or": [{"entityType": "DataSet"}]},
+                 {"updateTime": {"operator": "gt", "timeThreshold": 1000 * 1000 - WATERMARK_OVERLAP_MS}}]},
+    ]
+    assert mirror.find(" ORDERS ") == [CatalogEntry("g1", "Orders", "azure_datalake_gen2_path", "hrsi://silver/orders"),
+                                       CatalogEntry("g2", "orders", "DataSet", "ultp://silver/orders")]
+    assert mirror.get("ultp://silver/orders").guid == "g2"
+
+
+def test_full_refresh_drops_the_deleted_entities(mirror, clock):
+    mirror.refresh(Search(entity("g1", "orders", "hrsi://orders"), entity("g2", "sales", "hrsi://sales")))
+
+    clock[0] += 3601
+    search = Search(entity("g2", "sales", "hrsi://sales"))
+    mirror.refresh(search)
+
+    assert search.filters == [{"or": [{"entityType": "DataSet"}]}]
+    assert mirror.get("hrsi://orders") is None
+    assert mirror.find("sales")[0].guid == "g2"
+
+
+def test_failed_refreshes_are_retried_later(mirror, clock):
+    search = Search()
+    search.results = ConnectionError("Purview unavailable")
+
+    mirror.ensure_fresh(search)
+    clock[0] += RETRY_AFTER_S - 1
+    mirror.ensure_fresh(search)
+    assert len(search.filters) == 1 and mirror.is_stale()
+
+    clock[0] += 1
+    search.results = [entity("g1", "orders", "hrsi://orders")]
+    mirror.ensure_fresh(search)
+    mirror.ensure_fresh(search)
+    assert len(search.filters) == 2 and not mirror.is_stale()
+
+    clock[0] += 61
+    mirror.ensure_fresh(search)
+    assert len(search.filters) == 3
+
+
+def test_entities_resolve_within_the_cluster(mirror, monkeypatch):
+    monkeypatch.setattr(Synapse_JsonParser, "get_catalog_mirror", lambda: mirror)
+    search = Search(entity("g1", "orders", "ultp://silver/orders"), entity("g2", "orders", "hrsi://silver/orders"),
+                    entity("g3", "orders", "hrsi://silver/orders_process", "Process"))
+    transform = PurviewTransform(SimpleNamespace(discovery=SimpleNamespace(
+        search_entities=lambda query, limit, search_filter: search(search_filter))), {})
+    transform.cluster_name = "hrsi"
+
+    assert transform.search_purview_entity("Orders") == ("hrsi://silver/orders", "orders", "g2", "azure_datalake_gen2_path")
+    assert transform.search_purview_entity("sales") == ("", "", "", "")
+    assert len(search.filters) == 1
+
+
+def test_mirrors_datasets_by_default(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog_mirror, "_catalog_mirror", None)
+    monkeypatch.setenv("CATALOG_MIRROR_PATH", str(tmp_path / "catalog.sqlite"))
+    monkeypatch.delenv("CATALOG_MIRROR_TYPES", raising=False)
+
+    assert catalog_mirror.get_catalog_mirror().type_names == ["azure_datalake_gen2_path", "DataSet"]
+
+
+def test_timer_refreshes_the_mirror_with_the_purview_client(mirror, monkeypatch):
+    # The function folders import each other relatively, as members of the app package.
+    package = types.ModuleType("BlobTriggerFuncApp")
+    package.__path__ = [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+    monkeypatch.setitem(sys.modules, "BlobTriggerFuncApp", package)
+    timer = importlib.import_module("BlobTriggerFuncApp.CatalogMirrorFunction")
+    search = Search(entity("g1", "orders", "hrsi://silver/orders"))
+    monkeypatch.setattr(timer, "get_catalog_mirror", lambda: mirror)
+    monkeypatch.setattr(timer, "get_purview_client", lambda: SimpleNamespace(discovery=SimpleNamespace(
+        search_entities=lambda query, limit, search_filter: search(search_filter))))
+
+    timer.main(None)
+
+    assert search.filters == [{"or": [{"entityType": "DataSet"}]}]
+    assert mirror.get("hrsi://silver/orders").guid == "g1"
@@ -0,0 +1,128 @@
+import random
+import sys
+import pytest
+from BlobTriggerFunction import column_parser, render_cache
+from BlobTriggerFunction.catalyst import (UNRESOLVED_ATTRIBUTE, UNRESOLVED_FUNCTION, UNRESOLVED_ALIAS, UNRESOLVED_STAR,
+                                          ALIAS, ATTRIBUTE_REFERENCE, LITERAL, CAST, CASE_WHEN, WINDOW_EXPRESSION,
+                                          WINDOW_SPEC_DEFINITION, SORT_ORDER, UNSPECIFIED_FRAME_OBJECT,
+                                          DESCENDING_OBJECT)
+import legacy_column_parser
+
+EXPRESSIONS = "org.apache.spark.sql.catalyst.expressions."
+
+
+class ProjectLists:
+    """Random projectLists in the preorder form of the spark.logicalPlan facet."""
+
+    def __init__(self, seed):
+        self.random = random.Random(seed)
+
+    def leaf(self):
+        r = self.random.random()
+        if r < 0.7:
+            qualifier = self.random.choice(["a, ", "b, ", ""])
+            return [{"class": UNRESOLVED_ATTRIBUTE, "num-children": 0, "nameParts": f"[{qualifier}c{self.random.randint(0, 20)}]"}]
+        if r < 0.85:
+            data_type = self.random.choice(["string", "int", "null"])
+            return [{"class": LITERAL, "num-children": 0, "dataType": data_type,
+                     "value": None if data_type == "null" else str(self.random.randint(0, 9))}]
+        if r < 0.9:
+            return [{"class": UNRESOLVED_STAR, "num-children": 0, "target": None}]
+        return [{"class": ATTRIBUTE_REFERENCE, "num-children": 0, "name": f"c{self.random.randint(0, 9)}", "qualifier": "[a]"}]
+
+    def node(self, cls, children, **fields):
+        return [dict({"class": cls, "num-children": len(children)}, **fields)] + [part for child in children for part in child]
+
+    def expression(self, depth):
+        r = self.random.random()
+        if depth <= 0 or r < 0.3:
+            return self.leaf()
+        children = lambda count: [self.expression(depth - 1) for _ in range(count)]
+        if r < 0.5:
+            name = self.random.choice(["upper", "concat", "coalesce", "DENSE_RANK", "trim"])
+            return self.node(UNRESOLVED_FUNCTION, children(self.random.randint(0, 3)), name={"funcName": name})
+        if r < 0.6:
+            return self.node(CAST, children(1), dataType=self.random.choice(["date", "int", "string"]))
+        if r < 0.65:
+            return self.node(CASE_WHEN, children(3))
+        if r < 0.8:
+            cls = self.random.choice(["Add", "Subtract", "EqualTo", "IsNotNull", "Not"])
+            return self.node(EXPRESSIONS + cls, children(1 if cls in ("IsNotNull", "Not") else 2))
+        if r < 0.85:
+            return self.node(UNRESOLVED_ALIAS, children(1))
+        return self.window(depth)
+
+    def window(self, depth):
+        partitions = [self.expression(depth - 1) for _ in range(self.random.randint(0, 2))]
+        orders = [self.node(SORT_ORDER, [self.expression(depth - 1)],
+                            direction={"object": self.random.choice([DESCENDING_OBJECT, EXPRESSIONS + "Ascending$"])})
+                  for _ in range(self.random.randint(0, 2))]
+        frame = [[{"class": UNSPECIFIED_FRAME_OBJECT, "num-children": 0}]] if self.random.random() < 0.8 else []
+        spec = self.node(WINDOW_SPEC_DEFINITION, partitions + orders + frame,
+                         partitionSpec=[[0]] * len(partitions), orderSpec=[[0]] * len(orders))
+        function = [[{"class": UNRESOLVED_FUNCTION, "num-children": 0, "name": {"funcName": "row_number"}}]] \
+            if self.random.random() < 0.9 else []
+        return self.node(WINDOW_EXPRESSION, function + [spec])
+
+    def entry(self):
+        r = self.random.random()
+        if r < 0.3:
+            return self.leaf()
+        if r < 0.85:
+            return self.node(ALIAS, [self.expression(3)], name=f"o{self.random.randint(0, 50)}")
+        return self.node(UNRESOLVED_ALIAS, [self.expression(3)])
+
+    def __call__(self):
+        return [self.entry() for _ in range(self.random.randint(1, 12))]
+
+
+def render(parser, project_list):
+    # Malformed lists fail in both renderers; they must fail the same way.
+    try:
+        return parser.get_column_transformations(project_list)
+    except Exception as e:
+        return type(e).__name__
+
+
+@pytest.mark.parametrize("cache_size", ["0", "64"])
+def test_renderings_match_the_legacy_parser(cache_size, monkeypatch):
+    monkeypatch.setenv("RENDER_CACHE_SIZE", cache_size)
+    monkeypatch.setattr(render_cache, "_render_cache", None)
+    project_lists = ProjectLists(seed=37)
+
+    for _ in range(500):
+        project_list = project_lists()
+        assert render(column_parser, project_list) == render(legacy_column_parser, project_list)
+
+
+def test_renders_aliases_casts_and_windows():
+    project_list = [
+        [{"class": ALIAS, "num-children": 1, "name": "day"},
+         {"class": CAST, "num-children": 1, "dataType": "date"},
+         {"class": UNRESOLVED_ATTRIBUTE, "num-children": 0, "nameParts": "[o, created]"}],
+        [{"class": ALIAS, "num-children": 1, "name": "rank"},
+         {"class": WINDOW_EXPRESSION, "num-children": 2},
+         {"class": UNRESOLVED_FUNCTION, "num-children": 0, "name": {"funcName": "row_number"}},
+         {"class": WINDOW_SPEC_DEFINITION, "num-children": 3, "partitionSpec": [[0]], "orderSpec": [[0]]},
+         {"class": UNRESOLVED_ATTRIBUTE, "num-children": 0, "nameParts": "[o, customer]"},
+         {"class": SORT_ORDER, "num-children": 1, "direction": {"object": DESCENDING_OBJECT}},
+         {"class": UNRESOLVED_ATTRIBUTE, "num-children": 0, "nameParts": "[o, created]"},
+         {"class": UNSPECIFIED_FRAME_OBJECT, "num-children": 0}],
+        [{"class": UNRESOLVED_ATTRIBUTE, "num-children": 0, "nameParts": "[o, id]"}],
+    ]
+
+    assert column_parser.get_column_transformations(project_list) == [
+        "CAST(o.created AS DATE) AS day",
+        "row_number() OVER (PARTITION BY o.customer ORDER BY o.created DESC) AS rank",
+    ]
+
+
+def test_renders_expressions_deeper_than_the_recursion_limit():
+    depth = sys.getrecursionlimit() * 2
+    project_list = [[{"class": ALIAS, "num-children": 1, "name": "deep"}]
+                    + [{"class": UNRESOLVED_FUNCTION, "num-children": 1, "name": {"funcName": "trim"}}] * depth
+                    + [{"class": UNRESOLVED_ATTRIBUTE, "num-children": 0, "nameParts": "[a, c0]"}]]
+
+    with pytest.raises(RecursionError):
+        legacy_column_parser.get_column_transformations(project_list)
+    assert column_parser.get_column_transformations(project_list) == ["trim(" * depth + "a.c0" + ")" * depth + " AS deep"]
@@ -0,0 +1,92 @@
+import threading
+import pytest
+from BlobTriggerFunction.entity_batcher import EntityBatcher
+
+
+def dataset(guid, name):
+    return {"typeName": "DataSet", "guid": guid, "attributes": {"qualifiedName": name, "name": name}}
+
+
+def process(guid, name, inputs, outputs):
+    def refs(datasets):
+        return [{"typeName": "DataSet", "guid": entity["guid"], "qualifiedName": entity["attributes"]["qualifiedName"]}
+                for entity in datasets]
+    return {"typeName": "Process", "guid": guid,
+            "attributes": {"qualifiedName": name, "name": name, "inputs": refs(inputs), "outputs": refs(outputs)}}
+
+
+def event(name, source="orders"):
+    # The entities of one event, with the placeholder guids GuidTracker gives them.
+    inputs, output = [dataset(-1, source)], dataset(-2, f"{name}_out")
+    return inputs + [output, process(-3, name, inputs, [output])]
+
+
+class Client:
+    """Assigns a guid named after each entity, and fails the requests carrying a poisoned one."""
+
+    def __init__(self, poisoned=()):
+        self.poisoned = set(poisoned)
+        self.requests = []
+        self.uploading = threading.Event()
+        self.gate = threading.Event()
+
+    def upload_entities(self, batch):
+        names = [entity["attributes"]["qualifiedName"] for entity in batch]
+        if "gate" in names:
+            self.uploading.set()
+            self.gate.wait(5)
+        else:
+            self.requests.append(batch)
+        if self.poisoned.intersection(names):
+            raise ValueError("Purview rejected the request")
+        return {"guidAssignments": dict((str(entity["guid"]), "guid-" + entity["attributes"]["qualifiedName"])
+                                        for entity in batch)}
+
+
+def submit_together(batcher, *events):
+    # Submitted while another upload is in progress, the events are uploaded in one batch;
+    # returns their futures once they are resolved.
+    batcher.submit([dataset(-1, "gate")])
+    batcher.client.uploading.wait(5)
+    futures = [batcher.submit(entities) for entities in events]
+    batcher.client.gate.set()
+    for future in futures:
+        future.exception(5)
+    return futures
+
+
+def test_concurrent_events_are_uploaded_once_with_unique_guids():
+    client = Client()
+    first, second = submit_together(EntityBatcher(client), event("p1"), event("p2"))
+
+    [batch] = client.requests
+    assert [entity["attributes"]["qualifiedName"] for entity in batch] == ["orders", "p1_out", "p1", "p2_out", "p2"]
+    assert [entity["guid"] for entity in batch] == [-1, -2, -3, -4, -5]
+    assert batch[4]["attributes"]["inputs"] == [{"typeName": "DataSet", "guid": -1, "qualifiedName": "orders"}]
+    assert batch[4]["attributes"]["outputs"] == [{"typeName": "DataSet", "guid": -4, "qualifiedName": "p2_out"}]
+    assert first.result(5) == {"guidAssignments": {"-1": "guid-orders", "-2": "guid-p1_out", "-3": "guid-p1"}}
+    assert second.result(5) == {"guidAssignments": {"-1": "guid-orders", "-2": "guid-p2_out", "-3": "guid-p2"}}
+
+
+def test_a_failing_event_does_not_fail_the_others():
+    client = Client(poisoned=["broken_out"])
+    good, bad = submit_together(EntityBatcher(client, max_workers=1), event("p1"), event("broken"))
+
+    assert good.result(5)["guidAssignments"]["-3"] == "guid-p1"
+    with pytest.raises(ValueError):
+        bad.result(5)
+    # The shared batch, then each event on its own.
+    assert [len(batch) for batch in client.requests] == [5, 3, 3]
+
+
+def test_large_batches_upload_datasets_before_processes():
+    client = Client()
+    futures = submit_together(EntityBatcher(client, batch_size=2, max_workers=1),
+                              event("p1", "a"), event("p2", "b"))
+
+    assert [[entity["typeName"] for entity in batch] for batch in client.requests] == \
+        [["DataSet", "DataSet"], ["DataSet", "DataSet"], ["Process", "Process"]]
+    # Processes refer to DataSets uploaded by an earlier request by qualifiedName.
+    assert client.requests[2][0]["attributes"]["inputs"] == \
+        [{"typeName": "DataSet", "uniqueAttributes": {"qualifiedName": "a"}}]
+    assert [future.result(5)["guidAssignments"]["-3"] for future in futures] == ["guid-p1", "guid-p2"]
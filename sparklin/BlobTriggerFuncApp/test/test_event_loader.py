@@ -0,0 +1,39 @@
+import io
+import json
+from BlobTriggerFunction.event_loader import load_event
+
+
+def test_keeps_only_the_members_the_parser_reads():
+    plan = [{"class": "org.apache.spark.sql.catalyst.plans.logical.Project", "num-children": 1,
+             "projectList": [[{"class": "Alias", "name": "x", "value": None, "ratio": 0.5}]]}]
+    event = {
+        "eventType": "COMPLETE",
+        "eventTime": "2026-01-01T00:00:00Z",
+        "run": {"runId": "run1", "facets": {
+            "spark_version": {"spark-version": "3.1", "openlineage-spark-version": "0.3"},
+            "spark.logicalPlan": {"plan": plan},
+            "spark_properties": {"properties": {"spark.app.name": "nb" * 1000}},
+        }, "extra": [1, 2, 3]},
+        "job": {"namespace": "ns", "name": "hrsi_nb_x_insert_1"},
+        "inputs": [{"namespace": "abfss://lake", "name": "/silver/orders", "facets": {"schema": {"fields": [{"name": "id"}]}}}],
+        "outputs": [],
+        "producer": "https://github.com/OpenLineage/OpenLineage",
+    }
+
+    loaded = load_event(io.BytesIO(json.dumps(event).encode()))
+
+    assert loaded == {
+        "run": {"runId": "run1", "facets": {"spark_version": {}, "spark.logicalPlan": {"plan": plan},
+                                            "spark_properties": {}}},
+        "job": event["job"],
+        "inputs": event["inputs"],
+        "outputs": [],
+    }
+    # The parser tells events with a plan apart by their number of facets.
+    assert len(loaded["run"]["facets"]) == len(event["run"]["facets"])
+
+
+def test_keeps_null_members_as_is():
+    loaded = load_event(io.BytesIO(b'{"run": {"runId": "run1", "facets": null}, "job": null, "inputs": []}'))
+
+    assert loaded == {"run": {"runId": "run1", "facets": None}, "job": None, "inputs": []}
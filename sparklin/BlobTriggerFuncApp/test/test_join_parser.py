@@ -0,0 +1,52 @@
+from BlobTriggerFunction.catalyst import AND, CAST, EQUAL_TO, UNRESOLVED_ATTRIBUTE, UNRESOLVED_FUNCTION, LITERAL
+from BlobTriggerFunction.join_parser import JoinRecord, JoinSide, extract_joins, get_join_conditions
+
+
+def column(alias, name):
+    return [{"class": UNRESOLVED_ATTRIBUTE, "num-children": 0, "nameParts": f"[{alias}, {name}]"}]
+
+
+def equal(left, right):
+    return [{"class": EQUAL_TO, "num-children": 2}] + left + right
+
+
+def join(condition, join_type="Inner"):
+    return {"class": "org.apache.spark.sql.catalyst.plans.logical.Join", "num-children": 2,
+            "joinType": {"object": f"org.apache.spark.sql.catalyst.plans.{join_type}$"}, "condition": condition}
+
+
+def test_extracts_a_join_between_two_aliases():
+    condition = equal([{"class": UNRESOLVED_FUNCTION, "num-children": 1, "name": {"funcName": "upper"}}] + column("S", "id"),
+                      [{"class": CAST, "num-children": 1, "dataType": "int"}] + column("t", "id"))
+
+    joins = extract_joins([join(condition, "LeftOuter")], {"s": "Sales", "t": "Stores"})
+
+    assert joins == [JoinRecord(JoinSide("Sales", "S"), JoinSide("Stores", "t"), "LOJ", "upper(S.id) = t.id Cast AS int")]
+    assert joins[0].describe() == "Sales S LOJ Stores t ON upper(S.id) = t.id Cast AS int"
+
+
+def test_unknown_aliases_are_inline_queries():
+    joins = get_join_conditions([join(equal(column("s", "id"), column("q", "id")), "LeftSemi")], {"s": "Sales"})
+
+    assert joins == ["Sales s LeftSemi InlineQuery q ON s.id = q.id"]
+
+
+def test_splits_a_multi_way_condition_per_pair_of_aliases():
+    # s.id = t.id AND t.region = r.id AND s.active = 1
+    condition = [{"class": AND, "num-children": 2}, {"class": AND, "num-children": 2}] \
+        + equal(column("s", "id"), column("t", "id")) + equal(column("t", "region"), column("r", "id")) \
+        + equal(column("s", "active"), [{"class": LITERAL, "num-children": 0, "value": "1", "dataType": "int"}])
+
+    joins = extract_joins([join(condition)], {"s": "Sales", "t": "Stores", "r": "Regions"})
+
+    # The filter on s alone goes with the comparison before it.
+    assert [join.describe() for join in joins] == [
+        "Sales s IJ Stores t ON s.id = t.id",
+        "Stores t IJ Regions r ON t.region = r.id And s.active = 1",
+    ]
+
+
+def test_skips_conditions_naming_a_single_alias():
+    condition = equal(column("s", "id"), [{"class": LITERAL, "num-children": 0, "value": "1", "dataType": "int"}])
+
+    assert extract_joins([join(condition)], {"s": "Sales"}) == []
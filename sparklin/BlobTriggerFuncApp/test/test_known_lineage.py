@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+import pytest
+from BlobTriggerFunction import known_lineage, Synapse_JsonParser
+from BlobTriggerFunction.known_lineage import KnownLineage, diff_lineage
+from BlobTriggerFunction.Synapse_JsonParser import PurviewTransform
+
+
+def test_diff_lineage_reports_added_removed_and_changed():
+    previous = {"edges": [["input", "DataSet", "a"], ["output", "DataSet", "out"]],
+                "attributes": {"columnMapping": "[]", "JoinConditions": ""}}
+    current = {"edges": [("input", "DataSet", "b"), ("output", "DataSet", "out")],
+               "attributes": {"columnMapping": "[1]", "JoinConditions": ""}}
+
+    added, removed, changed = diff_lineage(previous, current)
+
+    assert added == [("input", "DataSet", "b")]
+    assert removed == [("input", "DataSet", "a")]
+    assert changed == {"columnMapping": "[1]"}
+    assert diff_lineage(current, current) == ([], [], {})
+
+
+def test_known_lineage_expires_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(known_lineage.time, "time", lambda: now[0])
+    store = KnownLineage(capacity=2, ttl=60)
+    store.put("nb", "process", {"edges": []})
+
+    now[0] += 60
+    assert store.get("nb", "process") == {"edges": []}
+    now[0] += 1
+    assert store.get("nb", "process") is None
+
+
+def test_known_lineage_evicts_least_recently_used():
+    store = KnownLineage(capacity=2)
+    for process in ("p1", "p2", "p3"):
+        store.put("nb", process, {"edges": [process]})
+
+    assert store.get("nb", "p1") is None
+    assert store.get("nb", "p3") == {"edges": ["p3"]}
+
+
+class Transform:
+    """Just what PurviewTransform.push_lineage reads from the transform."""
+
+    def __init__(self):
+        self.nb_name = "nb"
+        self.uploads = []
+        self.client = SimpleNamespace(partial_update_entity=self.partial_update_entity)
+
+    def upload_entities(self, entities):
+        self.uploads.append([entity.qualifiedName for entity in entities])
+        return {"guidAssignments": {"-1": "guid-1"}}
+
+    def partial_update_entity(self, guid, attributes):
+        self.uploads.append((guid, list(attributes)))
+
+    def push(self, inputs, attributes=None):
+        process = SimpleNamespace(typeName="Process", qualifiedName="process", guid=-1)
+        output = SimpleNamespace(typeName="DataSet", qualifiedName="out")
+        inputs = [SimpleNamespace(typeName="DataSet", qualifiedName=name) for name in inputs]
+        PurviewTransform.push_lineage(self, process, attributes or {"columnMapping": "[]"}, output, inputs)
+        return self.uploads.pop() if self.uploads else None
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = KnownLineage(ttl=100)
+    monkeypatch.setattr(Synapse_JsonParser, "get_known_lineage", lambda: store)
+    return store
+
+
+def test_push_lineage_sends_only_what_changed(store):
+    transform = Transform()
+
+    assert transform.push(["a", "b"]) == ["process", "out", "a", "b"]
+    assert transform.push(["a", "b"]) is None
+    assert transform.push(["a", "b", "c"]) == ["process", "c"]
+    assert transform.push(["a", "c"]) == ["process"]
+    assert transform.push(["a", "c"], {"columnMapping": "[1]"}) == ("guid-1", ["columnMapping"])
+
+
+def test_unchanged_runs_do_not_postpone_the_full_push(store, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(known_lineage.time, "time", lambda: now[0])
+    transform = Transform()
+    transform.push(["a"])
+
+    # A notebook running more often than the TTL still gets its lineage pushed in full once the TTL is over.
+    for _ in range(2):
+        now[0] += 40
+        assert transform.push(["a"]) is None
+    now[0] += 40
+    assert transform.push(["a"]) == ["process", "out", "a"]
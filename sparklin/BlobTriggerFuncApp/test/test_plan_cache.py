@@ -0,0 +1,83 @@
+import copy
+import pytest
+from azure.core.exceptions import ResourceNotFoundError
+from BlobTriggerFunction import plan_cache, Synapse_JsonParser
+from BlobTriggerFunction.catalyst import ALIAS, LITERAL, PROJECT
+from BlobTriggerFunction.plan_cache import PlanCache, plan_fingerprint
+from BlobTriggerFunction.Synapse_JsonParser import PurviewTransform
+
+
+def scheduled_event(run_id="run1", expr_id=1, day="2026-10-19", threshold="100"):
+    plan = [{"class": PROJECT, "num-children": 1, "projectList": [
+        [{"class": ALIAS, "num-children": 1, "name": "day", "exprId": {"id": expr_id, "jvmId": f"jvm-{run_id}"}},
+         {"class": LITERAL, "num-children": 0, "value": day, "dataType": "date"}],
+        [{"class": ALIAS, "num-children": 1, "name": "threshold", "exprId": {"id": expr_id + 1}},
+         {"class": LITERAL, "num-children": 0, "value": threshold, "dataType": "int"}]]}]
+    return {"run": {"runId": run_id, "facets": {"spark_version": {}, "spark.logicalPlan": {"plan": plan}}},
+            "job": {"name": "hrsi_nb_daily_insert_1"},
+            "inputs": [{"namespace": "abfss://lake", "name": "/silver/orders",
+                        "facets": {"schema": {"fields": [{"name": "id"}]}}}],
+            "outputs": [{"namespace": "abfss://lake", "name": "/gold/sales", "facets": {"columnLineage": {"fields": {
+                "id": {"inputFields": [{"namespace": "abfss://lake", "name": "/silver/orders", "field": "id"}]}}}}}]}
+
+
+def test_fingerprint_ignores_run_specific_values():
+    assert plan_fingerprint(scheduled_event()) == plan_fingerprint(scheduled_event("run2", 57, "2026-10-20"))
+
+
+@pytest.mark.parametrize("change", [
+    lambda event: event["run"]["facets"]["spark.logicalPlan"]["plan"][0]["projectList"][1][1].update(value="200"),
+    lambda event: event["job"].update(name="hrsi_nb_weekly_insert_1"),
+    lambda event: event["inputs"][0]["facets"]["schema"]["fields"].append({"name": "amount"}),
+    lambda event: event["run"]["facets"].pop("spark_version"),
+])
+def test_fingerprint_changes_with_the_lineage(change):
+    event = scheduled_event()
+    changed = copy.deepcopy(event)
+    change(changed)
+
+    assert plan_fingerprint(changed) != plan_fingerprint(event)
+
+
+class FakeTable:
+    def __init__(self):
+        self.rows = {}
+
+    def get_entity(self, partition_key, row_key):
+        if (partition_key, row_key) not in self.rows:
+            raise ResourceNotFoundError("Not Found")
+        return self.rows[(partition_key, row_key)]
+
+    def upsert_entity(self, mode, entity):
+        self.rows[(entity["PartitionKey"], entity["RowKey"])] = entity
+
+
+def test_cache_expires_evicts_and_falls_back_to_the_table(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(plan_cache.time, "time", lambda: now[0])
+    table = FakeTable()
+    cache = PlanCache(table, capacity=1, ttl=60)
+    cache.put("a", {"output_table_schm": "a"})
+    cache.put("b", {"output_table_schm": "b"})
+
+    # "a" was evicted from memory but is still in the table.
+    assert cache.get("a") == {"output_table_schm": "a"}
+    assert PlanCache(table).get("b") == {"output_table_schm": "b"}
+    now[0] += 61
+    assert cache.get("a") is None and cache.get("c") is None
+
+
+def test_repeated_plans_are_neither_parsed_nor_pushed_again(monkeypatch):
+    cache = PlanCache()
+    monkeypatch.setattr(Synapse_JsonParser, "get_plan_cache", lambda: cache)
+    pushes = []
+    monkeypatch.setattr(PurviewTransform, "purview_plan_push", lambda self, name, runid: pushes.append(runid))
+
+    first = PurviewTransform(None, scheduled_event()).transform_to_purview()
+    transform = PurviewTransform(None, scheduled_event("run2", 57, "2026-10-20"))
+    second = transform.transform_to_purview()
+
+    assert pushes == ["run1"]
+    assert transform.parse_path == "planCache"
+    assert second[1] == "hrsi_nb_daily_run2"
+    assert second[:1] + second[2:] == first[:1] + first[2:]
@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+import threading
+import pytest
+from BlobTriggerFunction import purview
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    for name, setting in (("TENANT_ID", "tenant"), ("CLIENT_ID", "client"), ("CLIENT_SECRET", "secret"),
+                          ("PURVIEW_ACCOUNT_NAME", "account")):
+        monkeypatch.setenv(name, setting)
+    monkeypatch.setattr(purview, "_purview_client", None)
+
+
+def test_loading_the_function_does_not_import_pyapacheatlas():
+    app = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    loaded = subprocess.run([sys.executable, "-c", "import sys, BlobTriggerFunction; print('pyapacheatlas' in sys.modules)"],
+                            cwd=app, capture_output=True, text=True, check=True)
+
+    assert loaded.stdout.strip() == "False"
+
+
+def test_client_is_built_once_from_the_settings(settings):
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(purview.get_purview_client())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(map(id, clients))) == 1
+    assert clients[0].endpoint_url.startswith("https://account.")
+    assert clients[0].authentication.data["client_id"] == "client"
@@ -0,0 +1,68 @@
+import pytest
+from BlobTriggerFunction import column_parser, render_cache
+from BlobTriggerFunction.catalyst import ALIAS, CAST, UNRESOLVED_ATTRIBUTE, UNRESOLVED_FUNCTION
+from BlobTriggerFunction.expression_store import ExpressionStore
+from BlobTriggerFunction.render_cache import RenderCache
+
+
+def coalesce(column, data_type="date"):
+    # CAST(coalesce(trim(column), column) AS data_type): six nodes, worth caching.
+    return [{"class": CAST, "num-children": 1, "dataType": data_type},
+            {"class": UNRESOLVED_FUNCTION, "num-children": 2, "name": {"funcName": "coalesce"}},
+            {"class": UNRESOLVED_FUNCTION, "num-children": 1, "name": {"funcName": "trim"}},
+            {"class": UNRESOLVED_ATTRIBUTE, "num-children": 0, "nameParts": f"[a, {column}]"},
+            {"class": UNRESOLVED_ATTRIBUTE, "num-children": 0, "nameParts": f"[a, {column}]"}]
+
+
+def project_list(*expressions):
+    return [[{"class": ALIAS, "num-children": 1, "name": f"o{i}"}] + expression for i, expression in enumerate(expressions)]
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = RenderCache(capacity=16)
+    monkeypatch.setattr(render_cache, "_render_cache", cache)
+    return cache
+
+
+def test_repeated_sub_expressions_are_rendered_once(cache):
+    columns = project_list(*[coalesce("created")] * 10)
+
+    rendered = column_parser.get_column_transformations(columns)
+
+    assert rendered == [f"CAST(coalesce(trim(a.created), a.created) AS DATE) AS o{i}" for i in range(10)]
+    # The first column renders the CAST and the coalesce under it; the others hit the CAST.
+    assert (cache.misses, cache.hits) == (2, 9)
+
+
+def test_only_identical_sub_expressions_are_shared(cache):
+    columns = project_list(coalesce("created"), coalesce("updated"), coalesce("created", "int"))
+
+    assert column_parser.get_column_transformations(columns) == [
+        "CAST(coalesce(trim(a.created), a.created) AS DATE) AS o0",
+        "CAST(coalesce(trim(a.updated), a.updated) AS DATE) AS o1",
+        "CAST(coalesce(trim(a.created), a.created) AS INT) AS o2",
+    ]
+    # Only the coalesce of the first column is reused, under the CAST to INT.
+    assert (cache.misses, cache.hits) == (5, 1)
+
+
+def test_key_skips_small_subtrees_and_holds_the_following_node(cache):
+    row = ExpressionStore([{"class": ALIAS, "num-children": 1, "name": "o"}] + coalesce("created"))
+    function = column_parser._function
+
+    assert cache.key(row, function, 3) is None
+    key = cache.key(row, function, 1)
+    assert key[0] is function and key[2:] == (4, None)
+    assert key == cache.key(ExpressionStore(project_list(coalesce("created"))[0]), function, 1)
+
+
+def test_evicts_the_least_recently_used_rendering():
+    cache = RenderCache(capacity=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"
+    cache.put("c", "C")
+
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("A", None, "C")
+    assert cache.stats()["size"] == 2
@@ -0,0 +1,219 @@
+import pytest
+from BlobTriggerFunction import Synapse_JsonParser
+from BlobTriggerFunction.catalyst import (INSERT_INTO_STATEMENT, CREATE_VIEW_STATEMENT, CREATE_TABLE, MERGE_INTO_TABLE,
+                                        PROJECT, SUBQUERY_ALIAS, JOIN, LOGICAL_RELATION, UNRESOLVED_RELATION,
+                                        UNRESOLVED_ATTRIBUTE, ALIAS, ATTRIBUTE_REFERENCE, EQUAL_TO)
+from BlobTriggerFunction.plan_cache import PlanCache
+from BlobTriggerFunction.Synapse_JsonParser import (PurviewTransform, NothingToLineage, FieldRecord, _field_record,
+                                                 _column_record, COLUMN, ALIAS_FIELD, LITERAL_FIELD, DERIVED, EXPRESSION)
+
+
+def dataset(name, columns=None):
+    facets = {"schema": {"fields": [{"name": column} for column in columns]}} if columns is not None else {}
+    return {"namespace": "abfss://lake", "name": f"/silver/{name}", "facets": facets}
+
+
+def facet_event(column_lineage, inputs=None, outputs=1, output_columns=None):
+    inputs = inputs if inputs is not None else [dataset("orders", ["id", "amount"]), dataset("customers", ["id", "name"])]
+    output = {"namespace": "abfss://lake", "name": "/gold/sales",
+              "facets": {"columnLineage": {"fields": column_lineage}}}
+    if output_columns is not None:
+        output["facets"]["schema"] = {"fields": [{"name": column} for column in output_columns]}
+    return {"run": {"runId": "run1", "facets": {}}, "job": {"name": "hrsi_nb_sales_insert_1"},
+            "inputs": inputs, "outputs": [output] * outputs}
+
+
+def source(table, field):
+    return {"namespace": "abfss://lake", "name": f"/silver/{table}", "field": field}
+
+
+def test_facet_lineage_builds_the_columns_from_column_lineage():
+    transform = PurviewTransform(None, facet_event({
+        "order_id": {"inputFields": [source("orders", "id")], "transformationType": "IDENTITY"},
+        "total": {"inputFields": [source("orders", "amount")], "transformationDescription": "sum(amount)",
+                  "transformationType": "AGGREGATION"},
+        "customer": {"inputFields": [source("customers", "name")]},
+    }, output_columns=["order_id", "total", "customer"]))
+
+    assert transform.get_facet_lineage()
+    assert transform.input_tables == ["orders", "customers"]
+    assert transform.output_table == "sales"
+    assert transform._input_cols == ["id", "amount", "name"]
+    assert transform._output_cols == ["order_id", "total", "customer"]
+    assert transform._table_and_columns == {"id": "orders", "amount": "orders", "name": "customers"}
+    assert transform.hardcodecol == ["sum(amount) AS total"]
+
+
+@pytest.mark.parametrize("event", [
+    # A field read from a dataset that is not an input of the event
+    facet_event({"order_id": {"inputFields": [source("returns", "id")]}}),
+    # A field missing from the schema facet of its input
+    facet_event({"order_id": {"inputFields": [source("orders", "order_key")]}}),
+    # More than one output
+    facet_event({"order_id": {"inputFields": [source("orders", "id")]}}, outputs=2),
+    # No columnLineage facet at all
+    facet_event({}),
+    # Outputs without any input field
+    facet_event({"constant": {"inputFields": []}}),
+    # Output columns missing from a partial columnLineage
+    facet_event({"order_id": {"inputFields": [source("orders", "id")]}}, output_columns=["order_id", "total"]),
+    # A column name read from two inputs, which cannot be told apart by name
+    facet_event({"order_id": {"inputFields": [source("orders", "id")]},
+                 "customer_id": {"inputFields": [source("customers", "id")]}}),
+])
+def test_facet_lineage_falls_back_to_the_plan_when_incomplete(event):
+    transform = PurviewTransform(None, event)
+
+    assert not transform.get_facet_lineage()
+    assert transform.input_tables == [] and transform._input_cols == []
+
+
+def test_facet_lineage_accepts_inputs_without_schema():
+    event = facet_event({"order_id": {"inputFields": [source("orders", "order_key")]}}, inputs=[dataset("orders")])
+    transform = PurviewTransform(None, event)
+
+    assert transform.get_facet_lineage()
+    assert transform._table_and_columns == {"order_key": "orders"}
+
+
+def attribute(alias, column):
+    return {"class": UNRESOLVED_ATTRIBUTE, "num-children": 0, "nameParts": f"[{alias}, {column}]"}
+
+
+def alias(name, *children):
+    return [{"class": ALIAS, "num-children": 1, "name": name}] + list(children)
+
+
+def relation(alias_name, table):
+    return [{"class": SUBQUERY_ALIAS, "num-children": 1, "identifier": {"name": alias_name}},
+            {"class": UNRESOLVED_RELATION, "num-children": 0, "multipartIdentifier": table}]
+
+
+def join(left, right):
+    return {"class": JOIN, "num-children": 2, "joinType": {"object": "org.apache.spark.sql.catalyst.plans.Inner$"},
+            "condition": [{"class": EQUAL_TO, "num-children": 2}, attribute(left, "id"), attribute(right, "id")]}
+
+
+PROJECT_LIST = [[attribute("o", "id")], alias("customer", attribute("c", "name"))]
+
+
+def test_parse_plan_reads_an_insert_in_one_pass():
+    plan = [{"class": INSERT_INTO_STATEMENT, "num-children": 1,
+             "table": [{"class": UNRESOLVED_RELATION, "multipartIdentifier": "[gold, sales]"}]},
+            {"class": PROJECT, "num-children": 1, "projectList": PROJECT_LIST},
+            join("o", "c")] + relation("o", "[silver, orders]") + relation("c", "[silver, customers]")
+    transform = PurviewTransform(None, {})
+
+    transform.get_parse_plan(plan)
+
+    assert (transform.sqlcommand, transform.output_table, transform.output_table_schm) == ("INSERT", "sales", "gold.sales")
+    assert transform._aliases == ["o", "c"]
+    assert transform._tables == ["orders", "customers"]
+    assert transform.input_tables == ["silver.orders", "silver.customers"]
+    assert [(field.output_name, field.source_qualifier, field.source_column) for field in transform._output_fields] == \
+        [("id", "o", "id"), ("customer", "c", "name")]
+    assert transform._join_nodes == [plan[2]]
+
+
+def test_parse_plan_collects_the_joins_under_a_view():
+    child = [{"class": PROJECT, "num-children": 1, "projectList": PROJECT_LIST},
+             join("o", "c")] + relation("o", "[orders]") + relation("c", "[customers]")
+    plan = [{"class": CREATE_VIEW_STATEMENT, "num-children": 0, "viewName": "[sales_v]", "child": child}]
+    transform = PurviewTransform(None, {})
+
+    transform.get_parse_plan(plan)
+
+    assert (transform.sqlcommand, transform.output_table) == ("CREATEVIEW", "sales_v")
+    assert transform._tables == ["orders", "customers"]
+    assert transform._view_join_nodes == [child[1]]
+    assert transform._join_nodes == []
+
+
+def test_parse_plan_reads_the_project_of_a_datasource_create_table():
+    # The project was once read from an unbound variable, failing every such plan.
+    plan = [{"class": CREATE_TABLE, "num-children": 1, "tableDesc": {"identifier": {"table": "dst"}}},
+            {"class": PROJECT, "num-children": 1,
+             "projectList": [[{"class": ATTRIBUTE_REFERENCE, "num-children": 0, "name": "id", "qualifier": "[x]"}]]},
+            {"class": SUBQUERY_ALIAS, "num-children": 1, "identifier": {"name": "x"}},
+            {"class": LOGICAL_RELATION, "num-children": 0}]
+    transform = PurviewTransform(None, {})
+
+    transform.get_parse_plan(plan)
+
+    assert (transform.sqlcommand, transform.output_table) == ("DS_CREATETABLE", "dst")
+    assert [field.source_column for field in transform._output_fields] == ["id"]
+    assert (transform.tbl, transform.a, transform.ds_create_i) == (["x"], [2], 3)
+
+
+@pytest.mark.parametrize("parts, record", [
+    (["[o, id]"], FieldRecord("id", "o", "id", COLUMN)),
+    (["id"], FieldRecord("id", None, "id", COLUMN)),
+    (["customer", "[c, name]"], FieldRecord("customer", "c", "name", ALIAS_FIELD)),
+    (["source", "lit(web)"], FieldRecord("source", None, "lit(web)", LITERAL_FIELD)),
+    (["total", "[o, amount]", "[o, tax]"], FieldRecord("total", "o", "amount", DERIVED)),
+    (["rank", "Row_number()", "Partition", "Group"], FieldRecord("rank", None, None, EXPRESSION)),
+])
+def test_field_record_classifies_projected_columns(parts, record):
+    assert _field_record(parts) == record
+
+
+def test_input_and_output_columns_come_from_the_field_records():
+    transform = PurviewTransform(None, {})
+    fields = [FieldRecord("id", "o", "id", COLUMN), FieldRecord("customer", "c", "name", ALIAS_FIELD),
+              FieldRecord("source", None, "lit(web)", LITERAL_FIELD), FieldRecord("rank", None, None, EXPRESSION),
+              FieldRecord("total", None, "amount", DERIVED)]
+
+    transform.get_inp_out_fields(fields, "INSERT")
+
+    assert transform._input_cols == ["id", "name", "lit(web)", "amount"]
+    assert transform._output_cols == ["id", "customer", "source", "total"]
+    assert transform._col_alias_map == {"o": ["id"], "c": ["name"]}
+
+
+def test_merge_columns_pair_each_target_with_its_source():
+    transform = PurviewTransform(None, {})
+    transform._tables, transform.input_tables = ["target", "source"], ["gold.target", "silver.source"]
+    fields = [_column_record("[t, id]"), _column_record("[s, id]"), _column_record("[t, name]"), _column_record("[s, name ]")]
+
+    transform.get_inp_out_fields(fields, "MERGE")
+
+    assert (transform._output_cols, transform._input_cols) == (["id", "name"], ["id", "name"])
+    assert transform._col_alias_map == {"s": ["id", "name"]}
+    assert (transform.output_table, transform.output_table_schm) == ("target", "gold.target")
+    assert (transform._tables, transform.input_tables) == (["source"], ["silver.source"])
+
+
+def merge_event(matched, not_matched):
+    update = [[{"class": "org.apache.spark.sql.catalyst.plans.logical.UpdateAction", "num-children": 1}]]
+    plan = [{"class": MERGE_INTO_TABLE, "num-children": 2, "matchedActions": update if matched else [],
+             "notMatchedActions": update if not_matched else []}] + relation("t", "[gold, target]") \
+        + relation("s", "[silver, source]")
+    return {"run": {"runId": "run1", "facets": {"spark_version": {}, "spark.logicalPlan": {"plan": plan}}},
+            "job": {"name": "hrsi_nb_merge_insert_1"}, "inputs": [dataset("source")], "outputs": [dataset("target")]}
+
+
+@pytest.fixture
+def plan_cache(monkeypatch):
+    cache = PlanCache()
+    monkeypatch.setattr(Synapse_JsonParser, "get_plan_cache", lambda: cache)
+    return cache
+
+
+@pytest.mark.parametrize("event, reason", [
+    (merge_event(matched=True, not_matched=False), "MERGE without insert actions"),
+    ({"run": {"runId": "run1", "facets": {"spark_version": {}, "spark.logicalPlan": {"plan": [
+        {"class": PROJECT, "num-children": 1,
+         "projectList": [[{"class": ATTRIBUTE_REFERENCE, "num-children": 0, "name": "id", "qualifier": ""}]]}]}}},
+      "job": {"name": "hrsi_nb_df_insert_1"}, "inputs": [], "outputs": []}, "Projection without a qualified source"),
+    ({"run": {"runId": "run1", "facets": {"spark_version": {}}}, "job": {"name": "hrsi_nb_read_insert_1"},
+      "inputs": [], "outputs": []}, "No plan and no input datasets"),
+])
+def test_events_without_lineage_are_skipped_with_a_reason(event, reason, plan_cache):
+    with pytest.raises(NothingToLineage, match=reason):
+        PurviewTransform(None, event).transform_to_purview()
+
+    # The next run of the plan is skipped from the plan cache, without parsing it again.
+    transform = PurviewTransform(None, event)
+    with pytest.raises(NothingToLineage):
+        transform.transform_to_purview()
+    assert (transform.parse_path, transform.skip_reason) == ("planCache", reason)
@@ -4,8 +4,7 @@ import os
 import azure.functions as func
 import urllib.parse
 from .json_parser import main as parse_lineage
-from azure.data.tables import TableServiceClient, UpdateMode
-from azure.storage.blob import BlobServiceClient
+from .storage import get_blob_service, get_table_client, update_entity_if_unchanged
 
 def main(event: func.EventGridEvent):
     logging.info("EventGrid trigger received")
@@ -37,9 +36,8 @@ def main(event: func.EventGridEvent):
 
     # Connexion au service Blob Azure
     storage_conn_str = os.environ["LINEAGE_STORAGE_CONN_STR"]
-    table_service = TableServiceClient.from_connection_string(conn_str=storage_conn_str)
 
-    event_metadata_table = table_service.get_table_client("EventMetadata")
+    event_metadata_table = get_table_client(storage_conn_str, "EventMetadata")
     try:
         metadata_entity = event_metadata_table.get_entity(partition_key='HRSI', row_key=blob_name)
         logging.info(f"@__INIT__ - Found EventMetadata entity: {metadata_entity}")
@@ -60,8 +58,7 @@ def main(event: func.EventGridEvent):
     logging.info("@__INIT__ - Lecture du blob JSON (en bytes), décodage UTF-8")
     
     # Lecture du blob JSON (en bytes), décodage UTF-8
-    blob_service_client = BlobServiceClient.from_connection_string(storage_conn_str)
-    blob_client = blob_service_client.get_blob_client(container=container_name, blob=blob_name)
+    blob_client = get_blob_service(storage_conn_str).get_blob_client(container=container_name, blob=blob_name)
     blob_bytes = blob_client.download_blob().readall()
     blob_str = blob_bytes.decode('utf-8')
     
@@ -82,7 +79,9 @@ def main(event: func.EventGridEvent):
     # DEBUG
     logging.info(f"@__INIT__ - Updating EventMetadata entity with status: {metadata_entity['Status']} and message: {metadata_entity['Message']}")
 
-    event_metadata_table.update_entity(mode=UpdateMode.MERGE, entity=metadata_entity)
+    if not update_entity_if_unchanged(event_metadata_table, metadata_entity):
+        logging.info(f"@__INIT__ - EventMetadata for {blob_name} was updated by another delivery. Stopping.")
+        return
     
     # DEBUG # BUG
     logging.info("@__INIT__ - EventMetadata entity updated successfully.")
@@ -95,8 +94,7 @@ def main(event: func.EventGridEvent):
         # DEBUG
         logging.info("@__INIT__ - Adding lineage details to LineageDetails table")          
 
-        table_service.create_table_if_not_exists("LineageDetails")
-        lineage_details_table = table_service.get_table_client("LineageDetails")
+        lineage_details_table = get_table_client(storage_conn_str, "LineageDetails", create=True)
         lineage_details_table.create_entity({
             "PartitionKey": 'HRSI', # str
             "RowKey": blob_name, # str
@@ -0,0 +1,85 @@
+import logging
+import threading
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceModifiedError
+from azure.data.tables import TableServiceClient, UpdateMode
+from azure.storage.blob import BlobServiceClient
+
+# Service clients are cached per connection string for the lifetime of the worker,
+# so warm invocations reuse their connection pools instead of rebuilding them.
+_table_services = {}
+_blob_services = {}
+_existing_tables = set()
+_lock = threading.Lock()
+
+
+def get_table_service(conn_str: str) -> TableServiceClient:
+    """Return the cached Table service client for a connection string.
+
+    Args:
+        conn_str (str): Azure Storage connection string.
+
+    Returns:
+        TableServiceClient: A client shared by every invocation of the worker.
+    """
+    with _lock:
+        if conn_str not in _table_services:
+            _table_services[conn_str] = TableServiceClient.from_connection_string(conn_str=conn_str)
+        return _table_services[conn_str]
+
+
+def get_blob_service(conn_str: str) -> BlobServiceClient:
+    """Return the cached Blob service client for a connection string.
+
+    Args:
+        conn_str (str): Azure Storage connection string.
+
+    Returns:
+        BlobServiceClient: A client shared by every invocation of the worker.
+    """
+    with _lock:
+        if conn_str not in _blob_services:
+            _blob_services[conn_str] = BlobServiceClient.from_connection_string(conn_str)
+        return _blob_services[conn_str]
+
+
+def get_table_client(conn_str: str, table_name: str, create: bool = False):
+    """Return a client for a table, creating the table at most once per worker.
+
+    Args:
+        conn_str (str): Azure Storage connection string.
+        table_name (str): Name of the table.
+        create (bool): Whether the table should be created if it does not exist.
+
+    Returns:
+        TableClient: A client for the requested table.
+    """
+    table_service = get_table_service(conn_str)
+    if create and (conn_str, table_name) not in _existing_tables:
+        table_service.create_table_if_not_exists(table_name)
+        with _lock:
+            _existing_tables.add((conn_str, table_name))
+    return table_service.get_table_client(table_name)
+
+
+def update_entity_if_unchanged(table_client, entity, mode=UpdateMode.MERGE) -> bool:
+    """Update an entity only if nobody else modified it since it was read.
+
+    The ETag returned when the entity was read is sent with the update, so two
+    deliveries of the same event cannot silently overwrite each other.
+
+    Args:
+        table_client (TableClient): Client of the table holding the entity.
+        entity (TableEntity): The entity as read from the table, with its changes applied.
+        mode (UpdateMode): Whether to merge or replace the stored entity.
+
+    Returns:
+        bool: True if the update was applied, False if the entity changed in the meantime.
+    """
+    try:
+        table_client.update_entity(mode=mode, entity=entity, etag=entity.metadata["etag"],
+                                   match_condition=MatchConditions.IfNotModified)
+    except ResourceModifiedError:
+        logging.warning(f"[storage.py] Entity {entity['PartitionKey']}/{entity['RowKey']} was modified concurrently. Update skipped.")
+        return False
+    return True
@@ -0,0 +1,17 @@
+import logging
+import azure.functions as func
+from ..JsonParserFunction.catalog_mirror import get_catalog_mirror
+from ..JsonParserFunction.purview_client import PurviewClient
+
+def main(mytimer: func.TimerRequest):
+    """Azure Timer-triggered function that refreshes the worker's catalog mirror.
+
+    The mirror is also refreshed by the first lookup that finds it older than
+    its TTL; refreshing it on a schedule keeps that cost off event processing.
+    BlobTriggerFuncApp has the same timer, searching with its own Purview client.
+
+    Args:
+        mytimer (func.TimerRequest): The timer that triggered the function.
+    """
+    count = get_catalog_mirror().refresh(PurviewClient().search_entities)
+    logging.info(f"[__init__.py] Catalog mirror refreshed: {count} entities copied.")
@@ -0,0 +1,30 @@
+import json
+import logging
+from typing import List
+import azure.functions as func
+from ..JsonParserFunction.batch import process_batch
+
+def main(events: List[func.EventHubEvent]):
+    """Azure Event Hub-triggered function that processes many blob storage events per invocation.
+
+    Event Grid delivers the blob-created events to an Event Hub, and this function
+    receives them in batches (cardinality many). Each message holds one Event Grid
+    event or an array of them.
+
+    The Event Hub trigger checkpoints past a batch whether or not the invocation
+    failed, so a failed batch is only run again through the retry policy of
+    function.json. Once its retries are spent the events keep their failed edges
+    in EventMetadata (EdgeResults) and are not delivered again.
+
+    Args:
+        events (List[func.EventHubEvent]): The Event Hub messages of the batch.
+    """
+    logging.info(f"[__init__.py] Event Hub batch received with {len(events)} message(s).")
+
+    payloads = []
+    for event in events:
+        body = json.loads(event.get_body().decode('utf-8'))
+        payloads.extend(body if isinstance(body, list) else [body])
+
+    if process_batch(payloads):
+        raise RuntimeError("[__init__.py] Some lineage edges failed. See EdgeResults in EventMetadata.")
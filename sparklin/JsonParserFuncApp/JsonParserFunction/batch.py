@@ -0,0 +1,266 @@
+import base64
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from .json_parser import (extract_lineage, split_pending_edges, build_result, edge_id, process_key, split_known_edges,
+                          remember_lineage, resolve_end_types)
+from .purview_client import PurviewClient
+from .edge_cache import get_edge_cache
+from .catalog_mirror import get_catalog_mirror
+from .known_lineage import get_known_lineage
+from .storage import get_blob_service, get_table_client
+from .processing import blob_location, begin_event, release_event, complete_event, CLAIM_LEASE_SECONDS
+
+# Azure Table Storage accepts at most 15 comparisons in a filter; one is used by the PartitionKey.
+_ROWKEYS_PER_QUERY = 14
+
+
+def read_event_metadata(event_metadata_table, blob_names: list) -> dict:
+    """Read the EventMetadata rows of several events with a few grouped queries.
+
+    Args:
+        event_metadata_table (TableClient): Client of the EventMetadata table.
+        blob_names (list): The RowKeys of the events.
+
+    Returns:
+        dict: The EventMetadata entities found, keyed by RowKey.
+    """
+    entities = {}
+    for start in range(0, len(blob_names), _ROWKEYS_PER_QUERY):
+        chunk = blob_names[start:start + _ROWKEYS_PER_QUERY]
+        parameters = {f"rk{i}": name for i, name in enumerate(chunk)}
+        query = "PartitionKey eq 'HRSI' and (" + " or ".join(f"RowKey eq @{key}" for key in parameters) + ")"
+        for entity in event_metadata_table.query_entities(query, parameters=parameters):
+            entities[entity["RowKey"]] = entity
+    return entities
+
+
+def download_blob(storage_conn_str: str, container_name: str, blob_name: str) -> str:
+    """Download an event blob as text.
+
+    Args:
+        storage_conn_str (str): Azure Storage connection string.
+        container_name (str): Blob container name.
+        blob_name (str): Name of the blob file.
+
+    Returns:
+        str: The UTF-8 decoded blob content.
+    """
+    blob_client = get_blob_service(storage_conn_str).get_blob_client(container=container_name, blob=blob_name)
+    return blob_client.download_blob().readall().decode('utf-8')
+
+
+def process_batch(events: list) -> set:
+    """Process many blob-created events in one invocation.
+
+    The EventMetadata rows are read with grouped queries, the claimed blobs are
+    downloaded concurrently, and the lineage edges of every event are merged
+    into a single Purview submission sharing one token and connection pool.
+    Identical edges across events are only sent once, and edges pushed by the
+    last run of a job are not sent again (see known_lineage). If the batch
+    fails midway, the events it claimed and did not complete are released
+    before the error is raised.
+
+    Environment Variables Optional:
+        - BATCH_DOWNLOAD_CONCURRENCY: Maximum number of blobs downloaded in parallel (default: 16)
+
+    Args:
+        events (list): Event Grid events as dictionaries (Event Grid schema).
+
+    Returns:
+        set: The blob names of the events that should be delivered again, because
+        some of their edges failed or their blob could not be downloaded.
+    """
+    storage_conn_str = os.environ["LINEAGE_RECEIVER_STORAGE_CONN_STR"]
+    lineage_event_table_name = os.environ["EVENT_METADATA_TABLE"]
+    lineage_details_table_name = os.environ["LINEAGE_DETAILS_TABLE"]
+    download_concurrency = max(1, int(os.environ.get("BATCH_DOWNLOAD_CONCURRENCY", "16")))
+
+    locations = {}
+    for event in events:
+        subject = event.get("subject", "")
+        blob_url = (event.get("data") or {}).get("url")
+        if "/azure-webjobs-hosts/" in subject or not blob_url:
+            logging.info(f"[batch.py] Ignored event: {subject}")
+            continue
+        container_name, blob_name = blob_location(blob_url)
+        locations[blob_name] = container_name
+    logging.info(f"[batch.py] Processing a batch of {len(locations)} event(s).")
+    if not locations:
+        return set()
+
+    event_metadata_table = get_table_client(storage_conn_str, lineage_event_table_name)
+    entities = read_event_metadata(event_metadata_table, list(locations))
+    for blob_name in locations.keys() - entities.keys():
+        logging.error(f"[batch.py] EventMetadata entry not found for {blob_name}.")
+
+    claimed = {}
+    for blob_name, entity in entities.items():
+        status = entity.get("Status")
+        is_claimed, edge_results = begin_event(event_metadata_table, entity)
+        if is_claimed:
+            claimed[blob_name] = (entity, status, edge_results)
+    if not claimed:
+        return set()
+
+    # Claimed rows not completed yet; they are released if the batch fails midway.
+    outstanding = dict(claimed)
+    retry = set()
+    try:
+        with ThreadPoolExecutor(max_workers=min(download_concurrency, len(claimed))) as executor:
+            futures = {name: executor.submit(download_blob, storage_conn_str, locations[name], name) for name in claimed}
+
+        known = get_known_lineage()
+        parsed = {}
+        for blob_name, (entity, status, edge_results) in claimed.items():
+            try:
+                data = json.loads(futures[blob_name].result())
+            except json.JSONDecodeError as e:
+                logging.error(f"[batch.py] JSON decoding failed for {blob_name}: {e}")
+                complete_event(event_metadata_table, entity, {"status": 400, "message": str(e), "details": None, "edges": {}},
+                               storage_conn_str, lineage_details_table_name)
+                del outstanding[blob_name]
+                continue
+            except Exception as e:
+                logging.error(f"[batch.py] Blob download failed for {blob_name}: {e}")
+                release_event(event_metadata_table, entity, status)
+                del outstanding[blob_name]
+                retry.add(blob_name)
+                continue
+
+            edges, details = extract_lineage(data)
+            if not edges:
+                complete_event(event_metadata_table, entity,
+                               {"status": "Failed", "message": "No input or output datasets found.", "details": None, "edges": {}},
+                               storage_conn_str, lineage_details_table_name)
+                del outstanding[blob_name]
+                continue
+            results, pending = split_pending_edges(edges, edge_results)
+            key = process_key(data, edges, details)
+            known_lineage = known.get(*key) if known is not None else None
+            pending = split_known_edges(edges, known_lineage, results, pending)
+            parsed[blob_name] = (edges, details, results, pending, key, known_lineage is None)
+
+        # Merge the pending edges of every event so each distinct relationship is sent once.
+        unique_edges = {}
+        for edges, details, results, pending, key, unknown in parsed.values():
+            for edge in pending:
+                unique_edges.setdefault(PurviewClient.edge_key(edge), edge)
+        outcomes = {}
+        if unique_edges:
+            purview = PurviewClient(edge_cache=get_edge_cache())
+            # End types come from the local catalog mirror, refreshed first if it is stale.
+            mirror = get_catalog_mirror()
+            mirror.ensure_fresh(purview.search_entities)
+            resolved = resolve_end_types(list(unique_edges.values()), mirror)
+            outcomes = dict(zip(unique_edges, purview.create_lineages(resolved)))
+            logging.info(f"[batch.py] Submitted {len(unique_edges)} distinct edge(s) for {len(parsed)} event(s).")
+
+        for blob_name, (edges, details, results, pending, key, unknown) in parsed.items():
+            for edge in pending:
+                results[edge_id(edge)] = outcomes[PurviewClient.edge_key(edge)]
+            result = build_result(edges, details, results)
+            entity = claimed[blob_name][0]
+            if complete_event(event_metadata_table, entity, result, storage_conn_str, lineage_details_table_name):
+                retry.add(blob_name)
+            del outstanding[blob_name]
+            remember_lineage(known, key, edges, result, pushed=unknown or bool(pending))
+    except Exception:
+        for blob_name, (entity, status, edge_results) in outstanding.items():
+            try:
+                release_event(event_metadata_table, entity, status)
+            except Exception as e:
+                logging.error(f"[batch.py] Could not release the claim on {blob_name}: {e}")
+        raise
+    return retry
+
+
+def decode_queue_message(content: str) -> list:
+    """Decode a storage queue message written by an Event Grid subscription.
+
+    Args:
+        content (str): The message body, plain or base64-encoded JSON.
+
+    Returns:
+        list: The Event Grid events carried by the message.
+    """
+    try:
+        payload = json.loads(content)
+    except json.JSONDecodeError:
+        payload = json.loads(base64.b64decode(content).decode('utf-8'))
+    return payload if isinstance(payload, list) else [payload]
+
+
+def event_blob_names(events: list) -> set:
+    """Return the names of the blobs a list of Event Grid events reports, as process_batch reads them.
+
+    Args:
+        events (list): Event Grid events as dictionaries (Event Grid schema).
+
+    Returns:
+        set: The blob names of the events process_batch does not ignore.
+    """
+    names = set()
+    for event in events:
+        blob_url = (event.get("data") or {}).get("url")
+        if "/azure-webjobs-hosts/" not in event.get("subject", "") and blob_url:
+            names.add(blob_location(blob_url)[1])
+    return names
+
+
+def drain_queue(queue_client, max_messages: int = 256, poison_queue_client=None, max_dequeue_count: int = 5) -> int:
+    """Process the Event Grid events waiting in a storage queue as one batch.
+
+    This is the storage queue counterpart of the Event Hub batch trigger, and
+    also works against Azurite for local runs. Each message is deleted once all
+    of its events were processed; a message with events to retry is left in the
+    queue to be delivered again after its visibility timeout, which matches the
+    claim lease of the EventMetadata rows. Like the queue trigger of the
+    Functions host, a message read max_dequeue_count times without completing,
+    or that cannot be decoded, is moved to the poison queue.
+
+    Args:
+        queue_client (QueueClient): Client of the queue the events are routed to.
+        max_messages (int): Maximum number of messages processed in one batch.
+        poison_queue_client (QueueClient, optional): Client of the poison queue.
+            When omitted, poison messages are logged and deleted.
+        max_dequeue_count (int): Number of deliveries after which a message is poisoned.
+
+    Returns:
+        int: The number of messages read from the queue.
+    """
+    messages = []
+    for message in queue_client.receive_messages(messages_per_page=32, visibility_timeout=CLAIM_LEASE_SECONDS):
+        messages.append(message)
+        if len(messages) >= max_messages:
+            break
+    if not messages:
+        return 0
+
+    def poison(message, reason):
+        logging.error(f"[batch.py] Moving queue message {message.id} to the poison queue: {reason}")
+        if poison_queue_client is not None:
+            poison_queue_client.send_message(message.content)
+        queue_client.delete_message(message)
+
+    batch = []
+    for message in messages:
+        # A message past the limit was left behind by a delivery that failed before completing it.
+        if message.dequeue_count > max_dequeue_count:
+            poison(message, f"delivered {message.dequeue_count} times")
+            continue
+        try:
+            events = decode_queue_message(message.content)
+        except ValueError as e:
+            poison(message, f"undecodable message ({e})")
+            continue
+        batch.append((message, events))
+
+    retry = process_batch([event for message, events in batch for event in events]) if batch else set()
+    for message, events in batch:
+        if not event_blob_names(events) & retry:
+            queue_client.delete_message(message)
+        elif message.dequeue_count >= max_dequeue_count:
+            poison(message, f"events still failing after {message.dequeue_count} deliveries")
+    return len(messages)
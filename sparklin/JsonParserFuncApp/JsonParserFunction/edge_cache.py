@@ -0,0 +1,154 @@
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from azure.core.exceptions import ResourceNotFoundError
+from azure.data.tables import UpdateMode
+from .storage import get_table_client
+
+_edge_cache = None
+_edge_cache_lock = threading.Lock()
+
+
+class EdgeCache:
+    """A cache of lineage relationships known to exist in Purview.
+
+    Edges are identified by (source qualifiedName, target qualifiedName,
+    relationship type). Lookups hit an in-memory LRU first and fall back to an
+    optional Azure Table Storage index shared by all workers, so a relationship
+    that has been created once does not need to be posted again.
+    """
+
+    def __init__(self, table_client=None, capacity=10000):
+        """Initialize the cache.
+
+        Args:
+            table_client (TableClient, optional): Table holding the persisted index.
+                When omitted, the cache lives in memory only.
+            capacity (int): Maximum number of edges kept in memory.
+        """
+        self.table_client = table_client
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _row(key):
+        """Return the (PartitionKey, RowKey) pair used to persist an edge.
+
+        Args:
+            key (tuple): (source qualifiedName, target qualifiedName, relationship type).
+
+        Returns:
+            tuple: The partition and row keys of the index entity.
+        """
+        source, target, relationship_type = key
+        digest = hashlib.sha1(f"{source}|{target}".encode("utf-8")).hexdigest()
+        return relationship_type, digest
+
+    def _remember(self, key):
+        """Record an edge in the in-memory LRU, evicting the oldest entry if needed."""
+        with self._lock:
+            self._entries[key] = True
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def contains(self, key) -> bool:
+        """Check whether an edge is known to exist in Purview.
+
+        Args:
+            key (tuple): (source qualifiedName, target qualifiedName, relationship type).
+
+        Returns:
+            bool: True if the edge was previously created or reported as existing.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return True
+        if self.table_client is None:
+            return False
+
+        partition_key, row_key = self._row(key)
+        try:
+            self.table_client.get_entity(partition_key=partition_key, row_key=row_key)
+        except ResourceNotFoundError:
+            return False
+        except Exception as e:
+            logging.warning(f"[edge_cache.py] Edge index lookup failed: {e}")
+            return False
+        self._remember(key)
+        return True
+
+    def add(self, key) -> None:
+        """Record that an edge exists in Purview.
+
+        Args:
+            key (tuple): (source qualifiedName, target qualifiedName, relationship type).
+        """
+        self._remember(key)
+        if self.table_client is None:
+            return
+
+        partition_key, row_key = self._row(key)
+        try:
+            self.table_client.upsert_entity(mode=UpdateMode.REPLACE, entity={
+                "PartitionKey": partition_key,
+                "RowKey": row_key,
+                "source": key[0],
+                "target": key[1]
+            })
+        except Exception as e:
+            logging.warning(f"[edge_cache.py] Edge index write failed: {e}")
+
+    def invalidate_entity(self, qualified_name) -> None:
+        """Forget every cached edge that involves the given entity.
+
+        Called when Purview reports that an entity no longer exists, so edges
+        pointing to it are posted again once the entity is recreated.
+
+        Args:
+            qualified_name (str): The qualifiedName of the missing entity.
+        """
+        with self._lock:
+            stale = [key for key in self._entries if qualified_name in (key[0], key[1])]
+            for key in stale:
+                del self._entries[key]
+        if self.table_client is None:
+            return
+
+        try:
+            entities = self.table_client.query_entities(
+                "source eq @name or target eq @name",
+                parameters={"name": qualified_name},
+                select=["PartitionKey", "RowKey"]
+            )
+            for entity in entities:
+                self.table_client.delete_entity(partition_key=entity["PartitionKey"], row_key=entity["RowKey"])
+        except Exception as e:
+            logging.warning(f"[edge_cache.py] Edge index invalidation failed: {e}")
+        logging.info(f"[edge_cache.py] Invalidated cached edges for {qualified_name}.")
+
+
+def get_edge_cache() -> EdgeCache:
+    """Return the process-wide edge cache, creating it on first use.
+
+    Environment Variables Optional:
+        - EDGE_CACHE_TABLE: Table Storage table used to persist known edges.
+          When unset, the cache is kept in memory only.
+        - EDGE_CACHE_SIZE: Maximum number of edges kept in memory (default: 10000)
+
+    Returns:
+        EdgeCache: The shared cache instance.
+    """
+    global _edge_cache
+    with _edge_cache_lock:
+        if _edge_cache is None:
+            table_client = None
+            table_name = os.environ.get("EDGE_CACHE_TABLE")
+            if table_name:
+                table_client = get_table_client(os.environ["LINEAGE_RECEIVER_STORAGE_CONN_STR"], table_name, create=True)
+            _edge_cache = EdgeCache(table_client, int(os.environ.get("EDGE_CACHE_SIZE", "10000")))
+        return _edge_cache
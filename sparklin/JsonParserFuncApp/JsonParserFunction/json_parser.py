@@ -1,7 +1,12 @@
 import json
 import os
 import logging
-from .purview_client import PurviewClient
+from .purview_client import PurviewClient, LineageEdge
+from .edge_cache import get_edge_cache
+from .catalog_mirror import get_catalog_mirror
+from .known_lineage import get_known_lineage, diff_lineage
+
+SUCCESS_CODES = (200, 201, 409)
 
 def extract_dataset_guid(uri: str) -> str:
     """Extract the dataset GUID from a URI.
@@ -106,23 +111,63 @@ def extract_derived_columns(column_lineage: dict) -> dict:
         mapping[sink_col] = sources
     return mapping
 
-def main(blob_str: str) -> dict:
-    logging.info("[jsonparser.py] Event Grid Trigger activated.")
-    
-    try:
-        data = json.loads(blob_str)
-        logging.info("[jsonparser.py] Successfully parsed JSON.")
-    except json.JSONDecodeError as e:
-        logging.error(f"[jsonparser.py] JSON decoding failed: {e}")
-        return {"status": 400, "message": str(e), "details": None}
+def edge_id(edge: LineageEdge) -> str:
+    """Return a short, stable identifier for an edge within one event.
+
+    The identifier is used as the key of the per-edge outcome records kept on
+    the EventMetadata row, so a retry can tell which edges already succeeded.
+
+    Args:
+        edge (LineageEdge): The edge to identify.
+
+    Returns:
+        str: The direction followed by the dataset GUID, e.g. 'input:<guid>'.
+    """
+    ds_guid = edge.source_guid if edge.direction == "input" else edge.target_guid
+    return f"{edge.direction}:{ds_guid}"
+
+def combine_edge_results(results: list) -> tuple:
+    """Combine the per-edge Purview responses of an event into one outcome.
+
+    An event is processed only when every edge was created (200/201) or already
+    existed (409). When some edges succeeded and others failed, the event is
+    reported as partially processed; the first failing edge is reported along
+    with the number of edges that failed.
+
+    Args:
+        results (list): (status_code, response_text) tuples, one per edge.
+
+    Returns:
+        tuple: (status, response_status, message) where status is 'Processed',
+        'PartiallyProcessed' or 'Failed' and response_status is the highest
+        status code among successful edges, or the code of the first failure.
+    """
+    failed = [(code, text) for code, text in results if code not in SUCCESS_CODES]
+    if not failed:
+        return "Processed", max(code for code, _ in results), "SUCCESS"
+
+    code, text = failed[0]
+    status = "Failed" if len(failed) == len(results) else "PartiallyProcessed"
+    return status, code, f"[{code}] {text} ({len(failed)}/{len(results)} edges failed)"
 
+def extract_lineage(data: dict) -> tuple:
+    """Collect the lineage edges and LineageDetails fields of an OpenLineage event.
+
+    Args:
+        data (dict): The decoded OpenLineage event.
+
+    Returns:
+        tuple: (edges, details) where edges is the list of LineageEdge to create
+        in Purview and details the dictionary stored in LineageDetails. Besides
+        the flattened column lists, details holds the column list of every
+        dataset ('input_schemas', 'output_schemas'), in the order of the datasets.
+    """
     props = data.get("run", {}).get("facets", {}).get("spark_properties", {}).get("properties", {})
     notebook_guid = extract_notebook_guid(props)
     workspace_id = extract_workspace_id(props)
     notebook_name = extract_notebook_name(props)
 
-    purview = PurviewClient()
-    response_status = None
+    edges = []
     
     input_datasets = []
     output_datasets = []
@@ -130,6 +175,8 @@ def main(blob_str: str) -> dict:
     output_tables = []
     input_columns = []
     output_columns = []
+    input_schemas = []
+    output_schemas = []
     derived_columns = {}
     joinconditions = []
     isdelta = False
@@ -142,16 +189,14 @@ def main(blob_str: str) -> dict:
             source_type = "fabric_lakehouse" if direction == "input" else "fabric_synapse_notebook"
             target_type = "fabric_synapse_notebook" if direction == "input" else "fabric_lakehouse"
 
-            status_code, message = purview.create_lineage(
+            edges.append(LineageEdge(
                 source_guid=source_guid,
                 source_type=source_type,
                 target_guid=target_guid,
                 target_type=target_type,
                 workspace_id=workspace_id,
                 direction=direction
-            )
-            
-            response_status = status_code if response_status is None else max(response_status, status_code)
+            ))
             
             if direction == "input":
                 input_datasets.append(ds_guid)
@@ -159,21 +204,25 @@ def main(blob_str: str) -> dict:
                 input_tables.append(table_name)
                 
                 schema_facet = ds.get("facets", {}).get("schema", {})
-                input_columns.extend([f["name"] for f in schema_facet.get("fields", [])])
+                columns = [f["name"] for f in schema_facet.get("fields", [])]
+                input_columns.extend(columns)
+                input_schemas.append(columns)
             else:
                 output_datasets.append(ds_guid)
                 table_name = extract_table_name_from_path(ds.get("name", ""))
                 output_tables.append(table_name)
                 
                 schema_facet = ds.get("facets", {}).get("schema", {})
-                output_columns.extend([f["name"] for f in schema_facet.get("fields", [])])
+                columns = [f["name"] for f in schema_facet.get("fields", [])]
+                output_columns.extend(columns)
+                output_schemas.append(columns)
 
                 column_lineage_facet = ds.get("facets", {}).get("columnLineage", {})
                 derived_columns.update(extract_derived_columns(column_lineage_facet))
 
                 joinconditions = ds.get("joinColumns", [])
                 isdelta = ds.get("isDelta", False)
-        
+
     details = {
         "process_name": notebook_name, 
         "input_datasets": input_datasets,
@@ -183,14 +232,192 @@ def main(blob_str: str) -> dict:
         "output_tables": ",".join(output_tables),
         "input_columns": input_columns,
         "output_columns": output_columns,
+        "input_schemas": input_schemas,
+        "output_schemas": output_schemas,
         "derived_columns": derived_columns,
         "joinconditions": joinconditions,
         "isdelta": isdelta
     }
-    
+    return edges, details
+
+def resolve_end_types(edges: list, mirror) -> list:
+    """Give the ends of edges the type their entity has in the Purview catalog.
+
+    The ends are referenced by qualifiedName, with the type json_parser expects
+    for a lakehouse or a notebook. An end found in the catalog mirror gets the
+    type Purview actually holds it under; the others are left unchanged.
+
+    Args:
+        edges (list): The LineageEdge list to resolve.
+        mirror (CatalogMirror): The local mirror of the catalog.
+
+    Returns:
+        list: The edges, with resolved end types.
+    """
+    resolved = []
+    for edge in edges:
+        source_name, target_name, _ = PurviewClient.edge_key(edge)
+        source = mirror.get(source_name)
+        target = mirror.get(target_name)
+        resolved.append(edge._replace(source_type=source.type_name if source else edge.source_type,
+                                      target_type=target.type_name if target else edge.target_type))
+    return resolved
+
+def split_pending_edges(edges: list, edge_results: dict = None) -> tuple:
+    """Separate the edges that still have to be sent from those that already succeeded.
+
+    Args:
+        edges (list): The LineageEdge list of the event.
+        edge_results (dict, optional): Per-edge status codes recorded by a previous attempt.
+
+    Returns:
+        tuple: (results, pending) where results maps the edge_id of every edge that
+        already succeeded to its (status_code, message), and pending lists the
+        distinct edges to send.
+    """
+    previous = edge_results or {}
+    results = {edge_id(edge): (previous[edge_id(edge)], "Succeeded in a previous attempt.")
+               for edge in edges if previous.get(edge_id(edge)) in SUCCESS_CODES}
+    pending = list({edge_id(edge): edge for edge in edges if edge_id(edge) not in results}.values())
+    if results:
+        logging.info(f"[jsonparser.py] Retrying {len(pending)} failed edge(s); {len(results)} already succeeded.")
+    return results, pending
+
+def process_key(data: dict, edges: list, details: dict) -> tuple:
+    """Return the job and process the lineage of an event is known under.
+
+    Every Spark action of a notebook reports its own OpenLineage job, so the
+    lineage is known per job: the actions of a notebook, which read and write
+    different datasets, are not diffed against each other.
+
+    Args:
+        data (dict): The decoded OpenLineage event.
+        edges (list): The LineageEdge list of the event, all ending at the same notebook.
+        details (dict): The LineageDetails fields of the event, whose notebook name
+            stands for the job when the event has none.
+
+    Returns:
+        tuple: (job name, qualifiedName of the notebook).
+    """
+    source_name, target_name, _ = PurviewClient.edge_key(edges[0])
+    job = (data.get("job") or {}).get("name") or details["process_name"]
+    return job, target_name if edges[0].direction == "input" else source_name
+
+def split_known_edges(edges: list, known_lineage: dict, results: dict, pending: list) -> list:
+    """Diff the edges of an event against the lineage last pushed for its job.
+
+    Edges that were already pushed by a previous run are not sent again; like
+    edges found in the edge cache, they are reported as existing (409). Edges
+    the job no longer has are left in Purview: the relationships of a notebook
+    are shared by all of its jobs, so a removal cannot be attributed to one job.
+
+    Args:
+        edges (list): The LineageEdge list of the event.
+        known_lineage (dict): The lineage last pushed for the job (see KnownLineage), or None.
+        results (dict): (status_code, message) per edge_id, completed in place.
+        pending (list): The distinct edges still to send.
+
+    Returns:
+        list: The edges to create.
+    """
+    if known_lineage is None:
+        return pending
+    added, _, _ = diff_lineage(known_lineage, {"edges": edges})
+    added = set(added)
+    for edge in pending:
+        if edge not in added:
+            results[edge_id(edge)] = (409, "Lineage unchanged since the last run.")
+    if len(added) < len(pending):
+        logging.info(f"[jsonparser.py] Known lineage: {len(added)} edge(s) added.")
+    return [edge for edge in pending if edge in added]
+
+def remember_lineage(known, key: tuple, edges: list, result: dict, pushed: bool = True) -> None:
+    """Record the edges of a processed event as the lineage last pushed for its job.
+
+    Events with failed edges are not recorded, so their next run is diffed
+    against the lineage of the last run that was fully pushed. Neither are
+    events that sent nothing, so the known lineage still expires after its TTL
+    when a notebook runs more often than that.
+
+    Args:
+        known (KnownLineage): The known lineage store, or None when diffing is disabled.
+        key (tuple): The (job, process) the lineage is known under, see process_key.
+        edges (list): The LineageEdge list of the event.
+        result (dict): The event outcome returned by build_result.
+        pushed (bool): Whether the event was diffed against no known lineage or sent some edges.
+    """
+    if known is None or result["status"] != "Processed" or not pushed:
+        return
+    known.put(*key, {"edges": [list(edge) for edge in edges]})
+
+def build_result(edges: list, details: dict, results: dict) -> dict:
+    """Build the outcome of an event once all of its edges have a result.
+
+    Args:
+        edges (list): The LineageEdge list of the event.
+        details (dict): The LineageDetails fields of the event.
+        results (dict): (status_code, message) per edge_id.
+
+    Returns:
+        dict: The event outcome with 'status', 'message', 'details' and 'edges'.
+    """
+    status, response_status, message = combine_edge_results([results[edge_id(edge)] for edge in edges])
     return {
-        "status": "Processed" if response_status in [200, 201, 409] else "Failed",
-        "message": "SUCCESS" if response_status in [200, 201, 409] else f"[{response_status}] {message}",
-        "details": details if response_status in [200, 201] else None
+        "status": status,
+        "message": message,
+        "details": details if status == "Processed" and response_status in [200, 201] else None,
+        "edges": {key: code for key, (code, _) in results.items()}
     }
+
+def main(blob_str: str, edge_results: dict = None) -> dict:
+    """Parse an OpenLineage event and create its lineage edges in Purview.
+
+    The edges are diffed against the lineage last pushed for the same job (see
+    known_lineage), and only new edges are created.
+
+    Args:
+        blob_str (str): The raw OpenLineage event JSON.
+        edge_results (dict, optional): Per-edge status codes recorded by a previous
+            attempt, keyed by edge_id. Edges that already succeeded are not resent.
+
+    Returns:
+        dict: The event outcome with 'status', 'message', 'details' and 'edges',
+        the latter holding the status code of every edge of the event.
+    """
+    logging.info("[jsonparser.py] Event Grid Trigger activated.")
     
+    try:
+        data = json.loads(blob_str)
+        logging.info("[jsonparser.py] Successfully parsed JSON.")
+    except json.JSONDecodeError as e:
+        logging.error(f"[jsonparser.py] JSON decoding failed: {e}")
+        return {"status": 400, "message": str(e), "details": None, "edges": {}}
+
+    edges, details = extract_lineage(data)
+    if not edges:
+        logging.warning("[jsonparser.py] No input or output datasets found in event.")
+        return {"status": "Failed", "message": "No input or output datasets found.", "details": None, "edges": {}}
+
+    # Only edges that did not succeed in a previous attempt are sent again.
+    results, pending = split_pending_edges(edges, edge_results)
+
+    # Nor are the edges pushed by the last run of the job, so an unchanged run sends nothing.
+    known = get_known_lineage()
+    key = process_key(data, edges, details)
+    known_lineage = known.get(*key) if known is not None else None
+    pending = split_known_edges(edges, known_lineage, results, pending)
+
+    # Edges are collected first and submitted together so the per-event latency
+    # is bounded by the slowest request rather than the sum of all of them.
+    if pending:
+        purview = PurviewClient(edge_cache=get_edge_cache())
+        # End types come from the local catalog mirror, refreshed first if it is stale.
+        mirror = get_catalog_mirror()
+        mirror.ensure_fresh(purview.search_entities)
+        resolved = resolve_end_types(pending, mirror)
+        for edge, outcome in zip(pending, purview.create_lineages(resolved)):
+            results[edge_id(edge)] = outcome
+
+    result = build_result(edges, details, results)
+    remember_lineage(known, key, edges, result, pushed=known_lineage is None or bool(pending))
+    return result
@@ -0,0 +1,174 @@
+# Last lineage pushed to Purview, per job and process.
+#
+# Scheduled notebooks report the same lineage run after run, and every run used
+# to send all of its edges again. KnownLineage keeps the lineage last pushed for
+# each OpenLineage job of a process, so a new run is diffed against it: only the
+# edges it adds are created, and a run whose lineage did not change sends
+# nothing at all. Edges a job no longer has are not deleted, since the other
+# jobs of the notebook may still have them. Entries expire after a TTL, after
+# which the whole lineage is pushed again, in case it was edited in Purview meanwhile.
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from azure.core.exceptions import ResourceNotFoundError
+from azure.data.tables import UpdateMode
+from .storage import get_table_client
+
+# Same Table Storage property limit as the LineageDetails store; larger lineages are kept in memory only.
+INLINE_LIMIT = 30000
+
+_known_lineage = None
+_known_lineage_lock = threading.Lock()
+
+
+def diff_lineage(previous: dict, current: dict) -> tuple:
+    """Compare the lineage of a process with the lineage last pushed for it.
+
+    Args:
+        previous (dict): The lineage last pushed, as stored by KnownLineage.put.
+        current (dict): The new lineage: 'edges', a list of edges (lists or tuples),
+            and optionally 'attributes', a dict of process attributes.
+
+    Returns:
+        tuple: (added, removed, changed) where added and removed list the edges
+        found only in the new and only in the previous lineage, as tuples, and
+        changed maps the attributes whose value changed to their new value.
+    """
+    previous_edges = [tuple(edge) for edge in previous.get("edges", [])]
+    current_edges = [tuple(edge) for edge in current.get("edges", [])]
+    previous_set, current_set = set(previous_edges), set(current_edges)
+    added = [edge for edge in current_edges if edge not in previous_set]
+    removed = [edge for edge in previous_edges if edge not in current_set]
+    previous_attributes = previous.get("attributes") or {}
+    changed = {name: value for name, value in (current.get("attributes") or {}).items()
+               if previous_attributes.get(name) != value}
+    return added, removed, changed
+
+
+class KnownLineage:
+    """The lineage last pushed to Purview per job and process, in memory and optionally in a table.
+
+    Lookups hit an in-memory LRU first and fall back to an optional Azure Table
+    Storage table shared by all workers.
+    """
+
+    def __init__(self, table_client=None, capacity=1024, ttl=86400):
+        """Initialize the store.
+
+        Args:
+            table_client (TableClient, optional): Table holding the persisted lineages.
+                When omitted, the store lives in memory only.
+            capacity (int): Maximum number of processes kept in memory.
+            ttl (int): Age, in seconds, after which a lineage is ignored and pushed again in full.
+        """
+        self.table_client = table_client
+        self.capacity = capacity
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _row(job, process):
+        """Return the (PartitionKey, RowKey) pair of a process, hashed since names may hold '/'."""
+        return (hashlib.sha1(job.encode("utf-8")).hexdigest(),
+                hashlib.sha1(process.encode("utf-8")).hexdigest())
+
+    def _remember(self, key, entry):
+        """Record an entry in the in-memory LRU, evicting the oldest entry if needed."""
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def get(self, job: str, process: str) -> dict:
+        """Return the lineage last pushed for a process.
+
+        Args:
+            job (str): The OpenLineage job, one per Spark action of the notebook.
+            process (str): The qualifiedName of the process.
+
+        Returns:
+            dict: The lineage as stored by put, or None if unknown or older than the TTL.
+        """
+        key = (job, process)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None and self.table_client is not None:
+            partition_key, row_key = self._row(job, process)
+            try:
+                row = self.table_client.get_entity(partition_key=partition_key, row_key=row_key)
+                entry = (row["pushed_at"], json.loads(row["lineage"]))
+                self._remember(key, entry)
+            except ResourceNotFoundError:
+                pass
+            except Exception as e:
+                logging.warning(f"[known_lineage.py] Known lineage lookup failed: {e}")
+        if entry is None or time.time() - entry[0] > self.ttl:
+            return None
+        return entry[1]
+
+    def put(self, job: str, process: str, lineage: dict) -> None:
+        """Record the lineage just pushed for a process.
+
+        The entry expires ttl seconds after this call, so callers only record a
+        lineage they actually pushed; a run that sent nothing leaves the entry,
+        and its age, untouched.
+
+        Args:
+            job (str): The OpenLineage job, one per Spark action of the notebook.
+            process (str): The qualifiedName of the process.
+            lineage (dict): JSON-serializable lineage, see diff_lineage.
+        """
+        entry = (time.time(), lineage)
+        self._remember((job, process), entry)
+        if self.table_client is None:
+            return
+
+        serialized = json.dumps(lineage, separators=(",", ":"))
+        if len(serialized) > INLINE_LIMIT:
+            logging.info(f"[known_lineage.py] Lineage of {process} ({len(serialized)} characters) kept in memory only.")
+            return
+        partition_key, row_key = self._row(job, process)
+        try:
+            self.table_client.upsert_entity(mode=UpdateMode.REPLACE, entity={
+                "PartitionKey": partition_key,
+                "RowKey": row_key,
+                "job": job,
+                "process": process,
+                "pushed_at": entry[0],
+                "lineage": serialized
+            })
+        except Exception as e:
+            logging.warning(f"[known_lineage.py] Known lineage write failed: {e}")
+
+
+def get_known_lineage() -> KnownLineage:
+    """Return the process-wide known lineage store, creating it on first use.
+
+    Environment Variables Optional:
+        - KNOWN_LINEAGE_TABLE: Table Storage table persisting the known lineages.
+          When unset, they are kept in memory only.
+        - KNOWN_LINEAGE_SIZE: Maximum number of processes kept in memory (default: 1024, 0 disables diffing)
+        - KNOWN_LINEAGE_TTL: Age in seconds after which a lineage is pushed again in full (default: 86400)
+
+    Returns:
+        KnownLineage: The shared store, or None when disabled.
+    """
+    global _known_lineage
+    with _known_lineage_lock:
+        if _known_lineage is None:
+            capacity = int(os.environ.get("KNOWN_LINEAGE_SIZE", "1024"))
+            table_client = None
+            table_name = os.environ.get("KNOWN_LINEAGE_TABLE")
+            if capacity > 0 and table_name:
+                table_client = get_table_client(os.environ["LINEAGE_RECEIVER_STORAGE_CONN_STR"], table_name, create=True)
+            _known_lineage = KnownLineage(table_client, capacity, int(os.environ.get("KNOWN_LINEAGE_TTL", "86400"))) \
+                if capacity > 0 else False
+        return _known_lineage or None
@@ -0,0 +1,290 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+from .storage import get_table_client, get_container_client
+from .schema_store import get_schema_store
+
+# Table Storage limits a string property to 64 KiB and an entity to 1 MiB, both
+# counted in UTF-16. Serialized values are ASCII (json.dumps escapes the rest), so
+# INLINE_LIMIT characters stay under the property limit; ENTITY_BUDGET, in bytes,
+# is checked against the whole row and leaves room below the entity limit.
+INLINE_LIMIT = 30000
+ENTITY_BUDGET = 1000000
+
+ENCODING = "dict-v1"
+SCHEMA_ENCODING = "schema-v1"
+
+# Fields encoded against the column dictionary, in the order they are stored.
+ENCODED_FIELDS = ("column_dictionary", "input_columns", "output_columns", "derived_columns", "joinconditions")
+
+# Fields of rows whose column lists are references to the schema store.
+SCHEMA_ENCODED_FIELDS = ("column_dictionary", "input_schemas", "output_schemas", "derived_columns", "joinconditions")
+
+
+def property_size(name: str, value) -> int:
+    """Return the size Table Storage counts for a property of an entity.
+
+    Args:
+        name (str): The property name.
+        value: The property value.
+
+    Returns:
+        int: The size in bytes, names and strings being stored as UTF-16.
+    """
+    if isinstance(value, str):
+        value_size = 4 + len(value.encode("utf-16-le"))
+    elif isinstance(value, bool):
+        value_size = 1
+    elif isinstance(value, (bytes, bytearray)):
+        value_size = 4 + len(value)
+    else:
+        value_size = 8
+    return 8 + len(name.encode("utf-16-le")) + value_size
+
+
+def entity_size(entity: dict) -> int:
+    """Return the size Table Storage counts for an entity, to compare with its 1 MiB limit.
+
+    Args:
+        entity (dict): The entity, with its PartitionKey and RowKey.
+
+    Returns:
+        int: The size in bytes.
+    """
+    keys = entity.get("PartitionKey", "") + entity.get("RowKey", "")
+    return 4 + len(keys.encode("utf-16-le")) + sum(property_size(name, value) for name, value in entity.items()
+                                                   if name not in ("PartitionKey", "RowKey"))
+
+
+def encode_columns(details: dict, column_fields: tuple = ("input_columns", "output_columns")) -> dict:
+    """Dictionary-encode the column names of a LineageDetails record.
+
+    Every distinct column name is stored once in 'column_dictionary' and the
+    column lists refer to it by position.
+
+    Args:
+        details (dict): The lineage details returned by the JSON parser.
+        column_fields (tuple): The column lists to encode along with the derived columns.
+
+    Returns:
+        dict: The encoded column lists, derived columns and join conditions.
+    """
+    dictionary = {}
+
+    def code(name):
+        return dictionary.setdefault(name, len(dictionary))
+
+    encoded = {field: [code(name) for name in details[field]] for field in column_fields}
+    encoded["derived_columns"] = [[code(sink), [code(source) for source in sources]]
+                                  for sink, sources in details["derived_columns"].items()]
+    encoded["joinconditions"] = details["joinconditions"]
+    encoded["column_dictionary"] = list(dictionary)
+    return encoded
+
+
+def decode_columns(encoded: dict) -> dict:
+    """Reverse encode_columns.
+
+    Args:
+        encoded (dict): The encoded values of ENCODED_FIELDS.
+
+    Returns:
+        dict: The column lists, derived columns and join conditions as produced by the parser.
+    """
+    names = encoded["column_dictionary"]
+    decoded = {field: [names[i] for i in encoded[field]]
+               for field in ("input_columns", "output_columns") if field in encoded}
+    decoded["derived_columns"] = {names[sink]: [names[i] for i in sources] for sink, sources in encoded["derived_columns"]}
+    decoded["joinconditions"] = encoded["joinconditions"]
+    return decoded
+
+
+class LineageDetailsStore:
+    """Storage layer for the LineageDetails table.
+
+    Column lists are dictionary-encoded and kept inline on the table row while
+    they are small. Values too large for a table property are compressed into a
+    blob, and the row keeps the blob name and a SHA-256 of the value instead.
+    Callers read and write plain lineage details and never see where a value lives.
+
+    With a schema store, the column list of every dataset is stored once in the
+    schema store and the row only keeps the fingerprints of its input and output
+    schemas; the flattened column lists are rebuilt from them when reading.
+    """
+
+    def __init__(self, table_client, container_client, schema_store=None, inline_limit=INLINE_LIMIT,
+                 entity_budget=ENTITY_BUDGET):
+        """Initialize the store.
+
+        Args:
+            table_client (TableClient): Client of the LineageDetails table.
+            container_client (ContainerClient): Container receiving spilled values.
+            schema_store (SchemaStore, optional): Store the dataset schemas are referenced from.
+                When omitted, the column lists are kept on the row.
+            inline_limit (int): Largest serialized value, in characters, kept on the row.
+            entity_budget (int): Largest size of the row, in bytes as counted by entity_size.
+        """
+        self.table_client = table_client
+        self.container_client = container_client
+        self.schema_store = schema_store
+        self.inline_limit = inline_limit
+        self.entity_budget = entity_budget
+
+    @staticmethod
+    def _pointer_size(row_key, field) -> int:
+        """Return the size of the row properties _spill writes in place of a value."""
+        return property_size(f"{field}_blob", f"{row_key}/{field}.json.gz") + property_size(f"{field}_sha256", "0" * 64)
+
+    def _spill(self, row_key, field, value) -> dict:
+        """Write a serialized value to a compressed blob.
+
+        Returns:
+            dict: The row properties pointing to the blob.
+        """
+        blob_name = f"{row_key}/{field}.json.gz"
+        data = value.encode("utf-8")
+        self.container_client.upload_blob(blob_name, gzip.compress(data), overwrite=True)
+        logging.info(f"[lineage_store.py] Spilled {field} of {row_key} to blob ({len(data)} bytes).")
+        return {f"{field}_blob": blob_name, f"{field}_sha256": hashlib.sha256(data).hexdigest()}
+
+    def to_entity(self, partition_key: str, row_key: str, details: dict) -> dict:
+        """Build the LineageDetails row for a record, spilling large values to blobs.
+
+        Args:
+            partition_key (str): PartitionKey of the row.
+            row_key (str): RowKey of the row.
+            details (dict): The lineage details returned by the JSON parser.
+
+        Returns:
+            dict: The entity to insert.
+        """
+        entity = {
+            "PartitionKey": partition_key, # str
+            "RowKey": row_key, # str
+            "process_name": details["process_name"], # str
+            "input_datasets": json.dumps(details["input_datasets"]), # list
+            "output_datasets": json.dumps(details["output_datasets"]), # list
+            "intermediate_process": details["intermediate_process"], # str
+            "input_tables": details["input_tables"], # str (join)
+            "output_tables": details["output_tables"], # str (join)
+            "isdelta": details["isdelta"], # bool
+        }
+
+        if self.schema_store is not None and "input_schemas" in details:
+            entity["encoding"], fields = SCHEMA_ENCODING, SCHEMA_ENCODED_FIELDS
+            encoded = encode_columns(details, column_fields=())
+            for field in ("input_schemas", "output_schemas"):
+                encoded[field] = [self.schema_store.put(columns) for columns in details[field]]
+        else:
+            entity["encoding"], fields = ENCODING, ENCODED_FIELDS
+            encoded = encode_columns(details)
+
+        values = {field: json.dumps(encoded[field], separators=(",", ":")) for field in fields}
+        inline = {field: value for field, value in values.items() if len(value) <= self.inline_limit}
+        # Spill the largest remaining values until the whole row fits in one entity.
+        size = entity_size(entity) + sum(property_size(field, values[field]) if field in inline
+                                         else self._pointer_size(row_key, field) for field in fields)
+        while inline and size > self.entity_budget:
+            largest = max(inline, key=lambda field: len(inline[field]))
+            size += self._pointer_size(row_key, largest) - property_size(largest, inline.pop(largest))
+
+        for field in fields:
+            if field in inline:
+                entity[field] = inline[field]
+            else:
+                entity.update(self._spill(row_key, field, values[field]))
+        return entity
+
+    def save(self, partition_key: str, row_key: str, details: dict) -> None:
+        """Insert the LineageDetails row of an event.
+
+        Args:
+            partition_key (str): PartitionKey of the row.
+            row_key (str): RowKey of the row.
+            details (dict): The lineage details returned by the JSON parser.
+        """
+        self.table_client.create_entity(self.to_entity(partition_key, row_key, details))
+
+    def _read_value(self, entity, field):
+        """Return the serialized value of a field, from the row or from its blob."""
+        blob_name = entity.get(f"{field}_blob")
+        if not blob_name:
+            return entity[field]
+
+        data = gzip.decompress(self.container_client.download_blob(blob_name).readall())
+        if hashlib.sha256(data).hexdigest() != entity.get(f"{field}_sha256"):
+            raise ValueError(f"[lineage_store.py] Checksum mismatch for {field} of {entity['RowKey']}.")
+        return data.decode("utf-8")
+
+    def from_entity(self, entity) -> dict:
+        """Rebuild the lineage details of a LineageDetails row.
+
+        Rows written before the store existed hold plain JSON lists and are read as is.
+
+        Args:
+            entity (TableEntity): The stored row.
+
+        Returns:
+            dict: The lineage details in the shape returned by the JSON parser.
+        """
+        details = {
+            "process_name": entity.get("process_name"),
+            "input_datasets": json.loads(entity.get("input_datasets") or "[]"),
+            "output_datasets": json.loads(entity.get("output_datasets") or "[]"),
+            "intermediate_process": entity.get("intermediate_process"),
+            "input_tables": entity.get("input_tables"),
+            "output_tables": entity.get("output_tables"),
+            "isdelta": entity.get("isdelta")
+        }
+        if entity.get("encoding") == SCHEMA_ENCODING:
+            if self.schema_store is None:
+                raise ValueError(f"[lineage_store.py] {entity['RowKey']} references dataset schemas but no schema store is configured.")
+            encoded = {field: json.loads(self._read_value(entity, field)) for field in SCHEMA_ENCODED_FIELDS}
+            for field in ("input_schemas", "output_schemas"):
+                details[field] = [self.schema_store.get(fingerprint) for fingerprint in encoded[field]]
+            details["input_columns"] = [name for columns in details["input_schemas"] for name in columns]
+            details["output_columns"] = [name for columns in details["output_schemas"] for name in columns]
+            details.update(decode_columns(encoded))
+        elif entity.get("encoding") == ENCODING:
+            details.update(decode_columns({field: json.loads(self._read_value(entity, field)) for field in ENCODED_FIELDS}))
+        else:
+            for field in ("input_columns", "output_columns", "derived_columns", "joinconditions"):
+                details[field] = json.loads(entity.get(field) or "null")
+        return details
+
+    def load(self, partition_key: str, row_key: str) -> dict:
+        """Read the lineage details of an event.
+
+        Args:
+            partition_key (str): PartitionKey of the row.
+            row_key (str): RowKey of the row.
+
+        Returns:
+            dict: The lineage details in the shape returned by the JSON parser.
+        """
+        return self.from_entity(self.table_client.get_entity(partition_key=partition_key, row_key=row_key))
+
+
+def get_lineage_details_store(storage_conn_str: str, lineage_details_table_name: str) -> LineageDetailsStore:
+    """Return a LineageDetails store using the worker's cached storage clients.
+
+    Dataset schemas are referenced from the worker's schema store (see get_schema_store).
+
+    Environment Variables Optional:
+        - LINEAGE_DETAILS_CONTAINER: Blob container receiving spilled values (default: lineagedetails)
+
+    Args:
+        storage_conn_str (str): Azure Storage connection string.
+        lineage_details_table_name (str): Name of the LineageDetails table.
+
+    Returns:
+        LineageDetailsStore: The store.
+    """
+    container_name = os.environ.get("LINEAGE_DETAILS_CONTAINER", "lineagedetails")
+    return LineageDetailsStore(
+        get_table_client(storage_conn_str, lineage_details_table_name, create=True),
+        get_container_client(storage_conn_str, container_name, create=True),
+        get_schema_store(storage_conn_str)
+    )
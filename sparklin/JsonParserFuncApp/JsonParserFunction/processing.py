@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+import urllib.parse
+from .storage import update_entity_if_unchanged, claim_entity
+from .lineage_store import get_lineage_details_store
+
+# Statuses that may be picked up again by a redelivered event, resending only the failed edges.
+RETRYABLE_STATUSES = ("PartiallyProcessed", "Failed")
+
+# How long a worker owns an EventMetadata row once it moved it to 'Processing'.
+CLAIM_LEASE_SECONDS = int(os.environ.get("EVENT_CLAIM_LEASE_SECONDS", "600"))
+
+
+def blob_location(blob_url: str) -> tuple:
+    """Split a blob URL into its container and blob names.
+
+    Args:
+        blob_url (str): The URL of the blob reported by the storage event.
+
+    Returns:
+        tuple: (container_name, blob_name).
+    """
+    parsed = urllib.parse.urlparse(blob_url)
+    path_parts = parsed.path.lstrip("/").split("/", 1)
+    return path_parts[0], path_parts[1]
+
+
+def begin_event(event_metadata_table, metadata_entity) -> tuple:
+    """Decide whether an event should be processed and claim it if so.
+
+    New events ('Unprocessed') are always processed. Events whose edges partly or
+    fully failed are processed again while RetryCount allows it, resending only
+    the failed edges.
+
+    Args:
+        event_metadata_table (TableClient): Client of the EventMetadata table.
+        metadata_entity (TableEntity): The EventMetadata row of the event.
+
+    Returns:
+        tuple: (claimed, edge_results) where claimed tells whether this worker owns
+        the event and edge_results holds the per-edge outcomes of a previous attempt.
+    """
+    status = metadata_entity.get("Status")
+    retries_left = int(metadata_entity.get("RetryCount") or 0)
+    if status in RETRYABLE_STATUSES and (retries_left <= 0 or not metadata_entity.get("EdgeResults")):
+        logging.info(f"[processing.py] Skipping {metadata_entity['RowKey']}. Status is '{status}' and no retry is pending.")
+        return False, None
+
+    if not claim_entity(event_metadata_table, metadata_entity, ("Unprocessed",) + RETRYABLE_STATUSES, CLAIM_LEASE_SECONDS):
+        logging.info(f"[processing.py] Skipping {metadata_entity['RowKey']}. Status is '{status}'.")
+        return False, None
+
+    edge_results = json.loads(metadata_entity["EdgeResults"]) if metadata_entity.get("EdgeResults") else None
+    if edge_results:
+        logging.info(f"[processing.py] Retrying {metadata_entity['RowKey']} with status '{status}' ({retries_left} retries left).")
+    return True, edge_results
+
+
+def release_event(event_metadata_table, metadata_entity, previous_status) -> None:
+    """Give back a claimed event after an unexpected error.
+
+    Args:
+        event_metadata_table (TableClient): Client of the EventMetadata table.
+        metadata_entity (TableEntity): The claimed EventMetadata row.
+        previous_status (str): The status of the row before it was claimed.
+    """
+    # Release the claim so a redelivery does not have to wait for the lease to expire.
+    metadata_entity["Status"] = "Unprocessed" if previous_status == "Processing" else previous_status
+    update_entity_if_unchanged(event_metadata_table, metadata_entity)
+
+
+def complete_event(event_metadata_table, metadata_entity, result, storage_conn_str, lineage_details_table_name) -> bool:
+    """Record the outcome of a claimed event.
+
+    The status, message and per-edge outcomes are written to the EventMetadata
+    row and, when the event was processed, its lineage details are added to the
+    LineageDetails table through the LineageDetails store.
+
+    Args:
+        event_metadata_table (TableClient): Client of the EventMetadata table.
+        metadata_entity (TableEntity): The claimed EventMetadata row.
+        result (dict): The outcome returned by the JSON parser.
+        storage_conn_str (str): Azure Storage connection string.
+        lineage_details_table_name (str): Name of the LineageDetails table.
+
+    Returns:
+        bool: True if some edges failed and the event should be delivered again.
+    """
+    blob_name = metadata_entity["RowKey"]
+    retries_left = int(metadata_entity.get("RetryCount") or 0)
+
+    metadata_entity["Status"] = result["status"]
+    metadata_entity["Message"] = result["message"]
+    metadata_entity["EdgeResults"] = json.dumps(result["edges"])
+
+    retry = result["status"] in RETRYABLE_STATUSES and bool(result["edges"]) and retries_left > 0
+    if retry:
+        metadata_entity["RetryCount"] = retries_left - 1
+
+    if not update_entity_if_unchanged(event_metadata_table, metadata_entity):
+        logging.info(f"[processing.py] EventMetadata for {blob_name} was updated by another delivery. Stopping.")
+        return False
+
+    if metadata_entity["Status"] == "Processed" and result["details"]:
+        store = get_lineage_details_store(storage_conn_str, lineage_details_table_name)
+        store.save('HRSI', blob_name, result["details"])
+
+    return retry
@@ -1,6 +1,32 @@
 import os
 import requests
 import logging
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+# Version of the search API, the first to page with continuation tokens.
+SEARCH_API_VERSION = "2023-09-01"
+
+
+class LineageEdge(NamedTuple):
+    """A single lineage relationship between a dataset and a notebook.
+
+    Attributes:
+        source_guid (str): The GUID of the source dataset or process.
+        source_type (str): The entity type of the source (e.g., fabric_lakehouse).
+        target_guid (str): The GUID of the target dataset or process.
+        target_type (str): The entity type of the target (e.g., fabric_synapse_notebook).
+        workspace_id (str): Azure workspace ID for constructing qualified names.
+        direction (str): Either 'input' or 'output' indicating lineage direction.
+    """
+    source_guid: str
+    source_type: str
+    target_guid: str
+    target_type: str
+    workspace_id: str
+    direction: str
+
 
 class PurviewClient:
     """A client to interact with Azure Purview API for lineage creation.
@@ -8,25 +34,42 @@ class PurviewClient:
     This class authenticates via client credentials and issues HTTP requests
     to the Purview API to create lineage relationships between datasets and notebooks.
     """
-    
-    def __init__(self):
+
+    def __init__(self, edge_cache=None):
         """Initialize the Purview client with credentials from environment variables.
 
         This constructor retrieves necessary Azure credentials and Purview API configuration
         from environment variables, then obtains an access token using these credentials.
 
+        Args:
+            edge_cache (EdgeCache, optional): Cache of relationships known to exist
+                in Purview. Cached edges are not posted again.
+
         Environment Variables Required:
             - TENANT_ID: Azure Active Directory tenant ID
             - CLIENT_ID: Azure app client ID
             - CLIENT_SECRET: Azure app client secret
             - PURVIEW_RESOURCE: Azure resource ID for Purview
             - PURVIEW_API_URL: Base URL for the Purview API
+
+        Environment Variables Optional:
+            - PURVIEW_MAX_CONCURRENCY: Maximum number of relationship requests
+              sent in parallel for one event (default: 8)
+            - AAD_AUTHORITY_HOST: Base URL of the token endpoint
+              (default: https://login.microsoftonline.com)
         """
         self.tenant_id = os.environ["TENANT_ID"]
         self.client_id = os.environ["CLIENT_ID"]
         self.client_secret = os.environ["CLIENT_SECRET"]
         self.resource = os.environ["PURVIEW_RESOURCE"]
         self.api_url = os.environ["PURVIEW_API_URL"]
+        self.authority_host = os.environ.get("AAD_AUTHORITY_HOST", "https://login.microsoftonline.com")
+        self.edge_cache = edge_cache
+        self.max_concurrency = max(1, int(os.environ.get("PURVIEW_MAX_CONCURRENCY", "8")))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         self.token = self.get_access_token()
 
     def get_access_token(self):
@@ -38,69 +81,220 @@ class PurviewClient:
         Returns:
             str: A valid OAuth2 access token.
         """
-        url = f"https://login.microsoftonline.com/{self.tenant_id}/oauth2/token"
+        url = f"{self.authority_host}/{self.tenant_id}/oauth2/token"
         payload = {
             "grant_type": "client_credentials",
             "client_id": self.client_id,
             "client_secret": self.client_secret,
             "resource": self.resource
         }
-        response = requests.post(url, data=payload)
+        response = self.session.post(url, data=payload)
         response.raise_for_status()
         return response.json()["access_token"]
-    
-    def create_lineage(self, source_guid, source_type, target_guid, target_type, workspace_id, direction):
-        """Create a lineage relationship in Azure Purview between a source and target entity.
+
+    @staticmethod
+    def build_relationship_payload(edge: LineageEdge) -> dict:
+        """Build the Atlas relationship payload for a lineage edge.
 
         Args:
-            source_guid (str): The GUID of the source dataset or process.
-            source_type (str): The entity type of the source (e.g., fabric_lakehouse).
-            target_guid (str): The GUID of the target dataset or process.
-            target_type (str): The entity type of the target (e.g., fabric_synapse_notebook).
-            workspace_id (str): Azure workspace ID for constructing qualified names.
-            direction (str): Either 'input' or 'output' indicating lineage direction.
+            edge (LineageEdge): The edge to serialize.
 
         Returns:
-            tuple: A tuple containing (status_code, response_text) from the API call.
+            dict: The request body for the Atlas relationship endpoint.
         """
-        logging.info("[purviewclient.py] Lineage creation request initiated.")
-        
-        headers = {
-            "Authorization": f"Bearer {self.token}",
-            "Content-Type": "application/json"
-        }
-
-        payload = {
+        direction = edge.direction
+        return {
             "guid": "-1",
             "typeName": f"dataset_process_inputs" if direction == "input" else f"process_dataset_outputs",
             "end1": {
-                "typeName": source_type,
+                "typeName": edge.source_type,
                 "uniqueAttributes": {
-                    "qualifiedName": f"https://app.fabric.microsoft.com/groups/{workspace_id}/" + 
+                    "qualifiedName": f"https://app.fabric.microsoft.com/groups/{edge.workspace_id}/" +
                                     (f"lakehouses" if direction == "input" else f"synapsenotebooks") +
-                                    f"/{source_guid}"
+                                    f"/{edge.source_guid}"
                 }
             },
             "end2": {
-                "typeName": target_type,
+                "typeName": edge.target_type,
                 "uniqueAttributes": {
-                    "qualifiedName": f"https://app.fabric.microsoft.com/groups/{workspace_id}/" +
+                    "qualifiedName": f"https://app.fabric.microsoft.com/groups/{edge.workspace_id}/" +
                                     (f"synapsenotebooks" if direction == "input" else f"lakehouses") +
-                                    f"/{target_guid}"
+                                    f"/{edge.target_guid}"
                 }
             }
         }
-        
+
+    @classmethod
+    def edge_key(cls, edge: LineageEdge) -> tuple:
+        """Return the identity of an edge as stored in the edge cache.
+
+        Args:
+            edge (LineageEdge): The edge to identify.
+
+        Returns:
+            tuple: (source qualifiedName, target qualifiedName, relationship type).
+        """
+        payload = cls.build_relationship_payload(edge)
+        return (payload["end1"]["uniqueAttributes"]["qualifiedName"],
+                payload["end2"]["uniqueAttributes"]["qualifiedName"],
+                payload["typeName"])
+
+    def _is_cached(self, edge: LineageEdge) -> bool:
+        """Check the edge cache before posting a relationship.
+
+        Args:
+            edge (LineageEdge): The edge about to be created.
+
+        Returns:
+            bool: True if the edge is known to exist and can be skipped.
+        """
+        if self.edge_cache is None or not self.edge_cache.contains(self.edge_key(edge)):
+            return False
+        logging.info(f"[purviewclient.py] Lineage {edge.direction.upper()} found in edge cache. No request sent.")
+        return True
+
+    def _record_outcome(self, edge: LineageEdge, status_code: int) -> None:
+        """Update the edge cache from the response to a relationship request.
+
+        Successful and "already exists" responses mark the edge as known. A 404
+        means one of the ends is missing, so every cached edge involving either
+        end is invalidated.
+
+        Args:
+            edge (LineageEdge): The edge that was posted.
+            status_code (int): The HTTP status code returned by Purview.
+        """
+        if self.edge_cache is None:
+            return
+        key = self.edge_key(edge)
+        if status_code in (200, 201, 409):
+            self.edge_cache.add(key)
+        elif status_code == 404:
+            self.edge_cache.invalidate_entity(key[0])
+            self.edge_cache.invalidate_entity(key[1])
+
+    def _post_relationship(self, edge: LineageEdge):
+        """Send a single relationship creation request and log its outcome.
+
+        Args:
+            edge (LineageEdge): The edge to create.
+
+        Returns:
+            requests.Response: The raw API response.
+        """
+        headers = {
+            "Authorization": f"Bearer {self.token}",
+            "Content-Type": "application/json"
+        }
+        payload = self.build_relationship_payload(edge)
+        direction = edge.direction
+
         logging.info("[purviewclient.py] Try sending lineage creation request.")
-        response = requests.post(f"{self.api_url}/datamap/api/atlas/v2/relationship", headers=headers, json=payload)
-        
+        response = self.session.post(f"{self.api_url}/datamap/api/atlas/v2/relationship", headers=headers, json=payload)
+
         if response.status_code in (200, 201):
             logging.info(f"[purviewclient.py] Lineage {direction.upper()} created successfully.")
         elif response.status_code == 409:
             logging.info(f"[purviewclient.py] Lineage {direction.upper()} already exists. No action taken.")
         else:
             logging.error(f"[purviewclient.py] [ERROR] {direction.upper()} lineage failed: {response.status_code} - {response.text}")
+        return response
+
+    def create_lineage(self, source_guid, source_type, target_guid, target_type, workspace_id, direction):
+        """Create a lineage relationship in Azure Purview between a source and target entity.
+
+        Args:
+            source_guid (str): The GUID of the source dataset or process.
+            source_type (str): The entity type of the source (e.g., fabric_lakehouse).
+            target_guid (str): The GUID of the target dataset or process.
+            target_type (str): The entity type of the target (e.g., fabric_synapse_notebook).
+            workspace_id (str): Azure workspace ID for constructing qualified names.
+            direction (str): Either 'input' or 'output' indicating lineage direction.
+
+        Returns:
+            tuple: A tuple containing (status_code, response_text) from the API call.
+        """
+        logging.info("[purviewclient.py] Lineage creation request initiated.")
+
+        edge = LineageEdge(source_guid, source_type, target_guid, target_type, workspace_id, direction)
+        if self._is_cached(edge):
+            return 409, "Lineage already exists (cached)."
+
+        response = self._post_relationship(edge)
+        self._record_outcome(edge, response.status_code)
+        if response.status_code not in (200, 201, 409):
             response.raise_for_status()
-        
+
         return response.status_code, response.text
 
+    def search_entities(self, search_filter: dict = None, limit: int = 1000):
+        """Yield every entity matching a search filter, page by page.
+
+        Args:
+            search_filter (dict, optional): A Purview search filter; every entity when omitted.
+            limit (int): Number of results requested per page (at most 1000).
+
+        Yields:
+            dict: One search result per entity, holding its id, name, entityType and qualifiedName.
+        """
+        headers = {
+            "Authorization": f"Bearer {self.token}",
+            "Content-Type": "application/json"
+        }
+        body = {"keywords": None, "limit": limit}
+        if search_filter:
+            body["filter"] = search_filter
+        while True:
+            response = self.session.post(f"{self.api_url}/datamap/api/search/query",
+                                         params={"api-version": SEARCH_API_VERSION}, headers=headers, json=body)
+            response.raise_for_status()
+            page = response.json()
+            results = page.get("value", [])
+            yield from results
+            if not results or not page.get("continuationToken"):
+                return
+            body["continuationToken"] = page["continuationToken"]
+
+    def _submit_edge(self, edge: LineageEdge):
+        """Create one edge without raising, for use from a worker thread.
+
+        Args:
+            edge (LineageEdge): The edge to create.
+
+        Returns:
+            tuple: A tuple containing (status_code, response_text). Transport
+            errors are reported with a status code of 0, and edges found in the
+            edge cache with a status code of 409.
+        """
+        if self._is_cached(edge):
+            return 409, "Lineage already exists (cached)."
+        try:
+            response = self._post_relationship(edge)
+        except requests.RequestException as e:
+            logging.error(f"[purviewclient.py] [ERROR] {edge.direction.upper()} lineage request failed: {e}")
+            return 0, str(e)
+        self._record_outcome(edge, response.status_code)
+        return response.status_code, response.text
+
+    def create_lineages(self, edges):
+        """Create several lineage relationships concurrently.
+
+        The Atlas API has no bulk endpoint for relationships, so edges are
+        submitted in parallel over a shared connection pool, bounded by
+        ``PURVIEW_MAX_CONCURRENCY``. Failures are reported per edge instead
+        of being raised.
+
+        Args:
+            edges (list[LineageEdge]): The edges to create.
+
+        Returns:
+            list[tuple]: One (status_code, response_text) tuple per edge, in input order.
+        """
+        logging.info(f"[purviewclient.py] Lineage creation request initiated for {len(edges)} edge(s).")
+        if not edges:
+            return []
+        if len(edges) == 1 or self.max_concurrency == 1:
+            return [self._submit_edge(edge) for edge in edges]
+
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(edges))) as executor:
+            return list(executor.map(self._submit_edge, edges))
@@ -0,0 +1,166 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from azure.core.exceptions import ResourceExistsError
+from .storage import get_table_client, get_container_client
+
+# Same Table Storage property limit as the LineageDetails store; wider schemas go to a blob.
+INLINE_LIMIT = 30000
+
+_schema_stores = {}
+_schema_stores_lock = threading.Lock()
+
+
+def schema_fingerprint(columns: list) -> tuple:
+    """Compute the content address of a dataset schema.
+
+    Args:
+        columns (list): The column names of the dataset, in schema order.
+
+    Returns:
+        tuple: (fingerprint, serialized) where fingerprint is the SHA-256 of the
+        serialized column list.
+    """
+    serialized = json.dumps(columns, separators=(",", ":"))
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest(), serialized
+
+
+class SchemaStore:
+    """Content-addressed store of the dataset schemas seen in lineage events.
+
+    Each distinct column list is written once to the DatasetSchemas table under
+    its fingerprint, and LineageDetails rows refer to it by that fingerprint. A
+    scheduled pipeline that writes the same tables with the same schemas run
+    after run therefore adds a few short references per run instead of the
+    full column lists.
+
+    Two in-memory LRUs spare the work for schemas already seen by the worker:
+    one maps a column list to its fingerprint so it is not serialized and
+    hashed again, the other maps fingerprints to their column lists so they are
+    neither written again nor read back from the table.
+    """
+
+    def __init__(self, table_client, container_client, capacity=1024, inline_limit=INLINE_LIMIT):
+        """Initialize the store.
+
+        Args:
+            table_client (TableClient): Client of the DatasetSchemas table.
+            container_client (ContainerClient): Container receiving schemas too wide for a table property.
+            capacity (int): Maximum number of schemas kept in memory.
+            inline_limit (int): Largest serialized schema, in characters, kept on the row.
+        """
+        self.table_client = table_client
+        self.container_client = container_client
+        self.capacity = capacity
+        self.inline_limit = inline_limit
+        self._fingerprints = OrderedDict()
+        self._schemas = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _row(fingerprint):
+        """Return the (PartitionKey, RowKey) pair of a schema, spreading rows over 256 partitions."""
+        return fingerprint[:2], fingerprint
+
+    def _remember(self, cache, key, value):
+        """Record an entry in one of the LRUs, evicting the oldest entry if needed."""
+        with self._lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > self.capacity:
+                cache.popitem(last=False)
+
+    def _lookup(self, cache, key):
+        """Return an entry of one of the LRUs, or None."""
+        with self._lock:
+            if key in cache:
+                cache.move_to_end(key)
+                return cache[key]
+        return None
+
+    def put(self, columns: list) -> str:
+        """Store a dataset schema unless it is already stored.
+
+        Args:
+            columns (list): The column names of the dataset, in schema order.
+
+        Returns:
+            str: The fingerprint referencing the schema.
+        """
+        key = tuple(columns)
+        fingerprint = self._lookup(self._fingerprints, key)
+        if fingerprint is not None and self._lookup(self._schemas, fingerprint) is not None:
+            return fingerprint
+
+        fingerprint, serialized = schema_fingerprint(list(columns))
+        self._remember(self._fingerprints, key, fingerprint)
+        partition_key, row_key = self._row(fingerprint)
+        entity = {"PartitionKey": partition_key, "RowKey": row_key, "column_count": len(columns)}
+        if len(serialized) <= self.inline_limit:
+            entity["columns"] = serialized
+        else:
+            entity["columns_blob"] = f"schemas/{fingerprint}.json.gz"
+            self.container_client.upload_blob(entity["columns_blob"], gzip.compress(serialized.encode("utf-8")),
+                                              overwrite=True)
+        try:
+            self.table_client.create_entity(entity)
+            logging.info(f"[schema_store.py] Stored new schema {fingerprint} ({len(columns)} columns).")
+        except ResourceExistsError:
+            # Stored by an earlier event or another worker; the content is the same by construction.
+            pass
+        self._remember(self._schemas, fingerprint, list(columns))
+        return fingerprint
+
+    def get(self, fingerprint: str) -> list:
+        """Read a dataset schema by fingerprint.
+
+        Args:
+            fingerprint (str): The fingerprint returned by put.
+
+        Returns:
+            list: The column names of the dataset, in schema order.
+        """
+        columns = self._lookup(self._schemas, fingerprint)
+        if columns is not None:
+            return list(columns)
+
+        partition_key, row_key = self._row(fingerprint)
+        entity = self.table_client.get_entity(partition_key=partition_key, row_key=row_key)
+        if entity.get("columns_blob"):
+            serialized = gzip.decompress(self.container_client.download_blob(entity["columns_blob"]).readall()).decode("utf-8")
+        else:
+            serialized = entity["columns"]
+        if hashlib.sha256(serialized.encode("utf-8")).hexdigest() != fingerprint:
+            raise ValueError(f"[schema_store.py] Checksum mismatch for schema {fingerprint}.")
+
+        columns = json.loads(serialized)
+        self._remember(self._schemas, fingerprint, columns)
+        return list(columns)
+
+
+def get_schema_store(storage_conn_str: str) -> SchemaStore:
+    """Return the worker's schema store for a storage account, creating it on first use.
+
+    Environment Variables Optional:
+        - SCHEMA_TABLE: Table holding the dataset schemas (default: DatasetSchemas)
+        - SCHEMA_CACHE_SIZE: Maximum number of schemas kept in memory (default: 1024)
+        - LINEAGE_DETAILS_CONTAINER: Blob container receiving wide schemas (default: lineagedetails)
+
+    Args:
+        storage_conn_str (str): Azure Storage connection string.
+
+    Returns:
+        SchemaStore: The shared store instance.
+    """
+    with _schema_stores_lock:
+        if storage_conn_str not in _schema_stores:
+            _schema_stores[storage_conn_str] = SchemaStore(
+                get_table_client(storage_conn_str, os.environ.get("SCHEMA_TABLE", "DatasetSchemas"), create=True),
+                get_container_client(storage_conn_str, os.environ.get("LINEAGE_DETAILS_CONTAINER", "lineagedetails"), create=True),
+                int(os.environ.get("SCHEMA_CACHE_SIZE", "1024"))
+            )
+        return _schema_stores[storage_conn_str]
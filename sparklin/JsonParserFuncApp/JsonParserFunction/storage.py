@@ -0,0 +1,143 @@
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError
+from azure.data.tables import TableServiceClient, UpdateMode
+from azure.storage.blob import BlobServiceClient
+
+# Service clients are cached per connection string for the lifetime of the worker,
+# so warm invocations reuse their connection pools instead of rebuilding them.
+_table_services = {}
+_blob_services = {}
+_provisioned = set()  # tables and containers known to exist
+_lock = threading.Lock()
+
+
+def get_table_service(conn_str: str) -> TableServiceClient:
+    """Return the cached Table service client for a connection string.
+
+    Args:
+        conn_str (str): Azure Storage connection string.
+
+    Returns:
+        TableServiceClient: A client shared by every invocation of the worker.
+    """
+    with _lock:
+        if conn_str not in _table_services:
+            _table_services[conn_str] = TableServiceClient.from_connection_string(conn_str=conn_str)
+        return _table_services[conn_str]
+
+
+def get_blob_service(conn_str: str) -> BlobServiceClient:
+    """Return the cached Blob service client for a connection string.
+
+    Args:
+        conn_str (str): Azure Storage connection string.
+
+    Returns:
+        BlobServiceClient: A client shared by every invocation of the worker.
+    """
+    with _lock:
+        if conn_str not in _blob_services:
+            _blob_services[conn_str] = BlobServiceClient.from_connection_string(conn_str)
+        return _blob_services[conn_str]
+
+
+def get_table_client(conn_str: str, table_name: str, create: bool = False):
+    """Return a client for a table, creating the table at most once per worker.
+
+    Args:
+        conn_str (str): Azure Storage connection string.
+        table_name (str): Name of the table.
+        create (bool): Whether the table should be created if it does not exist.
+
+    Returns:
+        TableClient: A client for the requested table.
+    """
+    table_service = get_table_service(conn_str)
+    if create and (conn_str, table_name) not in _provisioned:
+        table_service.create_table_if_not_exists(table_name)
+        with _lock:
+            _provisioned.add((conn_str, table_name))
+    return table_service.get_table_client(table_name)
+
+
+def get_container_client(conn_str: str, container_name: str, create: bool = False):
+    """Return a client for a blob container, creating it at most once per worker.
+
+    Args:
+        conn_str (str): Azure Storage connection string.
+        container_name (str): Name of the container.
+        create (bool): Whether the container should be created if it does not exist.
+
+    Returns:
+        ContainerClient: A client for the requested container.
+    """
+    container_client = get_blob_service(conn_str).get_container_client(container_name)
+    if create and (conn_str, "container", container_name) not in _provisioned:
+        try:
+            container_client.create_container()
+        except ResourceExistsError:
+            pass
+        with _lock:
+            _provisioned.add((conn_str, "container", container_name))
+    return container_client
+
+
+def update_entity_if_unchanged(table_client, entity, mode=UpdateMode.MERGE) -> bool:
+    """Update an entity only if nobody else modified it since it was read.
+
+    The ETag returned when the entity was read is sent with the update, so two
+    deliveries of the same event cannot silently overwrite each other.
+
+    Args:
+        table_client (TableClient): Client of the table holding the entity.
+        entity (TableEntity): The entity as read from the table, with its changes applied.
+        mode (UpdateMode): Whether to merge or replace the stored entity.
+
+    Returns:
+        bool: True if the update was applied, False if the entity changed in the meantime.
+    """
+    try:
+        metadata = table_client.update_entity(mode=mode, entity=entity, etag=entity.metadata["etag"],
+                                              match_condition=MatchConditions.IfNotModified)
+    except ResourceModifiedError:
+        logging.warning(f"[storage.py] Entity {entity['PartitionKey']}/{entity['RowKey']} was modified concurrently. Update skipped.")
+        return False
+    # Keep the new ETag so the same entity can be updated again by this worker.
+    entity.metadata["etag"] = metadata.get("etag")
+    return True
+
+
+def claim_entity(table_client, entity, claimable_statuses, lease_seconds) -> bool:
+    """Claim an event row for processing before doing any work on it.
+
+    The row is moved to 'Processing' with an ETag-conditional merge, so when two
+    deliveries of the same event race only one of them wins. A row left in
+    'Processing' for longer than the lease (e.g. by a worker that crashed) is
+    considered stale and can be claimed again.
+
+    Args:
+        table_client (TableClient): Client of the table holding the entity.
+        entity (TableEntity): The entity as read from the table.
+        claimable_statuses (tuple): Statuses from which the row may be claimed.
+        lease_seconds (int): How long a claim stays valid.
+
+    Returns:
+        bool: True if this worker now owns the row, False if it should stop.
+    """
+    status = entity.get("Status")
+    now = datetime.now(timezone.utc)
+    if status == "Processing":
+        claimed_at = entity.get("ClaimedAt")
+        if claimed_at and now - claimed_at < timedelta(seconds=lease_seconds):
+            logging.info(f"[storage.py] Entity {entity['RowKey']} is already being processed since {claimed_at}.")
+            return False
+        logging.warning(f"[storage.py] Recovering stale claim on {entity['RowKey']} (claimed at {claimed_at}).")
+    elif status not in claimable_statuses:
+        return False
+
+    entity["Status"] = "Processing"
+    entity["ClaimedAt"] = now
+    return update_entity_if_unchanged(table_client, entity)
@@ -0,0 +1,35 @@
+import logging
+import os
+import azure.functions as func
+from azure.core.exceptions import ResourceExistsError
+from azure.storage.queue import QueueClient
+from ..JsonParserFunction.batch import drain_queue
+
+def main(mytimer: func.TimerRequest):
+    """Azure Timer-triggered function that processes queued blob storage events in batches.
+
+    Event Grid delivers the blob-created events to a storage queue, which this
+    function drains on a schedule. It is the storage queue alternative to the
+    Event Hub batch function and can run locally against an Azurite queue.
+    Messages that keep failing are moved to the '<queue>-poison' queue.
+
+    Environment Variables Optional:
+        - LINEAGE_EVENT_QUEUE_BATCH_SIZE: Maximum number of messages processed per run (default: 256)
+        - LINEAGE_EVENT_QUEUE_MAX_DEQUEUE_COUNT: Deliveries after which a message is poisoned (default: 5)
+
+    Args:
+        mytimer (func.TimerRequest): The timer that triggered the function.
+    """
+    storage_conn_str = os.environ["LINEAGE_RECEIVER_STORAGE_CONN_STR"]
+    queue_name = os.environ["LINEAGE_EVENT_QUEUE"]
+    max_messages = int(os.environ.get("LINEAGE_EVENT_QUEUE_BATCH_SIZE", "256"))
+    max_dequeue_count = int(os.environ.get("LINEAGE_EVENT_QUEUE_MAX_DEQUEUE_COUNT", "5"))
+
+    queue_client = QueueClient.from_connection_string(storage_conn_str, queue_name)
+    poison_queue_client = QueueClient.from_connection_string(storage_conn_str, f"{queue_name}-poison")
+    try:
+        poison_queue_client.create_queue()
+    except ResourceExistsError:
+        pass
+    count = drain_queue(queue_client, max_messages, poison_queue_client, max_dequeue_count)
+    logging.info(f"[__init__.py] Processed {count} queued message(s).")
@@ -0,0 +1,144 @@
+import os
+import sys
+import threading
+import time
+import pytest
+import requests
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+from azure.data.tables import TableEntity
+
+# The function folders are imported as top-level packages, as the Functions host does.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from JsonParserFunction import purview_client  # noqa: E402
+
+
+class FakeTable:
+    """In-memory stand-in for a TableClient, with ETag checks on conditional updates."""
+
+    def __init__(self):
+        self.rows = {}
+
+    def add(self, **properties):
+        entity = TableEntity(properties)
+        entity._metadata = {"etag": "0"}
+        self.rows[(entity["PartitionKey"], entity["RowKey"])] = entity
+        return entity
+
+    def get_entity(self, partition_key, row_key):
+        if (partition_key, row_key) not in self.rows:
+            raise ResourceNotFoundError("not found")
+        return self.rows[(partition_key, row_key)]
+
+    def query_entities(self, query, parameters):
+        for row_key in parameters.values():
+            if ("HRSI", row_key) in self.rows:
+                yield self.rows[("HRSI", row_key)]
+
+    def update_entity(self, mode, entity, etag, match_condition):
+        key = (entity["PartitionKey"], entity["RowKey"])
+        if self.rows[key].metadata["etag"] != etag:
+            raise ResourceModifiedError("modified")
+        stored = TableEntity(entity)
+        stored._metadata = {"etag": str(int(etag) + 1)}
+        self.rows[key] = stored
+        return {"etag": stored.metadata["etag"]}
+
+    def create_entity(self, entity):
+        if (entity["PartitionKey"], entity["RowKey"]) in self.rows:
+            raise ResourceExistsError("exists")
+        self.add(**entity)
+
+    def upsert_entity(self, entity, mode=None):
+        self.add(**entity)
+
+    def delete_entity(self, partition_key, row_key):
+        self.rows.pop((partition_key, row_key), None)
+
+
+class FakeContainer:
+    """In-memory stand-in for a ContainerClient."""
+
+    def __init__(self):
+        self.blobs = {}
+
+    def upload_blob(self, name, data, overwrite=False):
+        self.blobs[name] = data
+
+    def download_blob(self, name):
+        data = self.blobs[name]
+        return type("Downloader", (), {"readall": lambda downloader: data})()
+
+
+@pytest.fixture
+def table():
+    return FakeTable()
+
+
+@pytest.fixture
+def container():
+    return FakeContainer()
+
+
+@pytest.fixture
+def environment(monkeypatch):
+    for name, value in {"LINEAGE_RECEIVER_STORAGE_CONN_STR": "UseDevelopmentStorage=true",
+                        "EVENT_METADATA_TABLE": "EventMetadata",
+                        "LINEAGE_DETAILS_TABLE": "LineageDetails",
+                        "KNOWN_LINEAGE_SIZE": "0"}.items():
+        monkeypatch.setenv(name, value)
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.body = body or {}
+        self.text = str(self.body)
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(str(self.status_code))
+
+
+class FakeSession:
+    """Answers relationship requests with the status code set for their dataset."""
+
+    def __init__(self):
+        self.statuses = {}
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def post(self, url, data=None, headers=None, json=None, params=None):
+        if url.endswith("/oauth2/token"):
+            self.requests.append("token")
+            return FakeResponse(200, {"access_token": "token"})
+        dataset = json["end1" if json["typeName"] == "dataset_process_inputs" else "end2"]["uniqueAttributes"]["qualifiedName"]
+        with self._lock:
+            self.requests.append(dataset.rsplit("/", 1)[-1])
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.01)
+        with self._lock:
+            self.in_flight -= 1
+        status = self.statuses.get(dataset.rsplit("/", 1)[-1], 201)
+        if status == 0:
+            raise requests.ConnectionError("connection reset")
+        return FakeResponse(status)
+
+
+@pytest.fixture
+def session(monkeypatch):
+    for name, value in {"TENANT_ID": "tenant", "CLIENT_ID": "client", "CLIENT_SECRET": "secret",
+                        "PURVIEW_RESOURCE": "https://purview.azure.net", "PURVIEW_API_URL": "https://purview"}.items():
+        monkeypatch.setenv(name, value)
+    session = FakeSession()
+    monkeypatch.setattr(purview_client.requests, "Session", lambda: session)
+    return session
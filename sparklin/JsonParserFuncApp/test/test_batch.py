@@ -0,0 +1,193 @@
+import json
+import pytest
+from JsonParserFunction import batch
+from JsonParserFunction.catalog_mirror import CatalogEntry
+from JsonParserFunction.known_lineage import KnownLineage
+from JsonParserFunction.purview_client import PurviewClient
+
+
+def lineage_event(notebook: str) -> dict:
+    properties = {"trident.artifact.id": notebook, "trident.artifact.workspace.id": "ws"}
+    return {"run": {"facets": {"spark_properties": {"properties": properties}}},
+            "inputs": [{"name": f"/in{i}/Tables/t{i}"} for i in range(3)],
+            "outputs": [{"name": "/out/Tables/out"}]}
+
+
+def grid_event(blob_name: str) -> dict:
+    return {"subject": f"/blobServices/default/containers/events/blobs/{blob_name}",
+            "data": {"url": f"https://account.blob.core.windows.net/events/{blob_name}"}}
+
+
+class RecordingPurview:
+    edge_key = staticmethod(PurviewClient.edge_key)
+    submitted = []
+    sent = []
+
+    def __init__(self, **kwargs):
+        pass
+
+    def create_lineages(self, edges):
+        self.submitted.append(len(edges))
+        self.sent.extend(edges)
+        return [(201, "Created.")] * len(edges)
+
+    def search_entities(self, filter=None, limit=1000):
+        return iter([])
+
+
+class StaticMirror:
+    """A catalog mirror holding the given entries, keyed by qualifiedName."""
+
+    def __init__(self, entries=()):
+        self.entries = {entry.qualified_name: entry for entry in entries}
+        self.refreshed = 0
+
+    def ensure_fresh(self, search):
+        self.refreshed += 1
+
+    def get(self, qualified_name):
+        return self.entries.get(qualified_name)
+
+
+class FailingPurview(RecordingPurview):
+    def create_lineages(self, edges):
+        raise RuntimeError("Purview unavailable")
+
+
+@pytest.fixture
+def claimed_batch(table, environment, monkeypatch):
+    for i in range(3):
+        table.add(PartitionKey="HRSI", RowKey=f"event{i}.json", Status="Unprocessed", RetryCount=3)
+    table.add(PartitionKey="HRSI", RowKey="broken.json", Status="Unprocessed", RetryCount=3)
+    # event0 and event1 are two runs of the same notebook.
+    blobs = {f"event{i}.json": json.dumps(lineage_event(f"nb{i // 2}")) for i in range(3)}
+    blobs["broken.json"] = "{"
+    monkeypatch.setattr(batch, "get_table_client", lambda *args, **kwargs: table)
+    monkeypatch.setattr(batch, "download_blob", lambda conn_str, container, name: blobs[name])
+    monkeypatch.setattr(batch, "get_edge_cache", lambda: None)
+    monkeypatch.setattr(batch, "get_catalog_mirror", StaticMirror)
+    return [grid_event(name) for name in blobs]
+
+
+def test_process_batch_sends_shared_edges_once(table, claimed_batch, monkeypatch):
+    monkeypatch.setattr(batch, "PurviewClient", RecordingPurview)
+    completed = {}
+    monkeypatch.setattr(batch, "complete_event", lambda table_client, entity, result, *args:
+                        completed.update({entity["RowKey"]: result["status"]}))
+    RecordingPurview.submitted = []
+
+    retry = batch.process_batch(claimed_batch + [grid_event("event0.json"), grid_event("missing.json")])
+
+    # The two runs of nb0 have the same 4 edges, which are sent once along with the 4 edges of nb1.
+    assert RecordingPurview.submitted == [8]
+    assert completed == {"event0.json": "Processed", "event1.json": "Processed", "event2.json": "Processed",
+                         "broken.json": 400}
+    assert retry == set()
+
+
+def test_process_batch_resolves_end_types_through_the_mirror(claimed_batch, monkeypatch):
+    # in0 is held as a warehouse in the catalog, not as the lakehouse the event implies.
+    warehouse = CatalogEntry("guid-in0", "in0", "fabric_warehouse",
+                             "https://app.fabric.microsoft.com/groups/ws/lakehouses/in0")
+    mirror = StaticMirror([warehouse])
+    monkeypatch.setattr(batch, "get_catalog_mirror", lambda: mirror)
+    monkeypatch.setattr(batch, "PurviewClient", RecordingPurview)
+    monkeypatch.setattr(batch, "complete_event", lambda *args: False)
+    RecordingPurview.submitted, RecordingPurview.sent = [], []
+
+    batch.process_batch(claimed_batch)
+
+    assert mirror.refreshed == 1
+    sent = {(edge.source_guid, edge.target_guid): (edge.source_type, edge.target_type) for edge in RecordingPurview.sent}
+    assert sent[("in0", "nb0")] == ("fabric_warehouse", "fabric_synapse_notebook")
+    assert sent[("in1", "nb0")] == ("fabric_lakehouse", "fabric_synapse_notebook")
+    assert sent[("nb0", "out")] == ("fabric_synapse_notebook", "fabric_lakehouse")
+
+
+def test_process_batch_diffs_each_job_of_a_notebook(table, environment, monkeypatch):
+    # Two Spark actions of nb0, each reported as its own job, read and write different datasets.
+    blobs = {}
+    for name in ("a", "b"):
+        event = lineage_event("nb0")
+        event["job"] = {"namespace": "spark", "name": f"nb0.execute_insert_into_{name}"}
+        event["inputs"], event["outputs"] = [{"name": f"/{name}/Tables/{name}"}], [{"name": f"/{name}2/Tables/{name}2"}]
+        blobs[f"{name}.json"] = json.dumps(event)
+    store = KnownLineage()
+    monkeypatch.setattr(batch, "get_known_lineage", lambda: store)
+    monkeypatch.setattr(batch, "get_table_client", lambda *args, **kwargs: table)
+    monkeypatch.setattr(batch, "download_blob", lambda conn_str, container, name: blobs[name])
+    monkeypatch.setattr(batch, "get_edge_cache", lambda: None)
+    monkeypatch.setattr(batch, "get_catalog_mirror", StaticMirror)
+    monkeypatch.setattr(batch, "complete_event", lambda *args: False)
+    monkeypatch.setattr(batch, "PurviewClient", RecordingPurview)
+    RecordingPurview.submitted = []
+
+    for _ in range(2):
+        for name in blobs:
+            table.add(PartitionKey="HRSI", RowKey=name, Status="Unprocessed", RetryCount=3)
+        assert batch.process_batch([grid_event(name) for name in blobs]) == set()
+
+    # Each job is diffed against its own last run, so the second batch sends nothing.
+    assert RecordingPurview.submitted == [4]
+
+
+def test_process_batch_releases_claims_when_submission_fails(table, claimed_batch, monkeypatch):
+    monkeypatch.setattr(batch, "PurviewClient", FailingPurview)
+
+    with pytest.raises(RuntimeError, match="Purview unavailable"):
+        batch.process_batch(claimed_batch)
+
+    statuses = {key[1]: row["Status"] for key, row in table.rows.items()}
+    assert statuses == {"event0.json": "Unprocessed", "event1.json": "Unprocessed", "event2.json": "Unprocessed",
+                        "broken.json": 400}
+
+
+class FakeQueue:
+    def __init__(self, *messages):
+        self.messages = list(messages)
+        self.sent = []
+
+    def receive_messages(self, messages_per_page, visibility_timeout):
+        return iter(list(self.messages))
+
+    def delete_message(self, message):
+        self.messages.remove(message)
+
+    def send_message(self, content):
+        self.sent.append(content)
+
+
+class QueueMessage:
+    def __init__(self, id, events, dequeue_count=1):
+        self.id = id
+        self.content = events if isinstance(events, str) else json.dumps(events)
+        self.dequeue_count = dequeue_count
+
+
+def test_drain_queue_deletes_only_completed_messages(monkeypatch):
+    done = QueueMessage("done", [grid_event("a.json"), grid_event("b.json")])
+    failing = QueueMessage("failing", grid_event("c.json"))
+    batches = []
+    monkeypatch.setattr(batch, "process_batch", lambda events: batches.append(events) or {"c.json"})
+    queue, poison = FakeQueue(done, failing), FakeQueue()
+
+    assert batch.drain_queue(queue, poison_queue_client=poison) == 2
+
+    assert len(batches) == 1 and len(batches[0]) == 3
+    assert queue.messages == [failing]
+    assert poison.sent == []
+
+
+def test_drain_queue_poisons_messages_past_the_dequeue_limit(monkeypatch):
+    exhausted = QueueMessage("exhausted", [grid_event("a.json")], dequeue_count=5)
+    abandoned = QueueMessage("abandoned", [grid_event("b.json")], dequeue_count=6)
+    garbage = QueueMessage("garbage", "not json")
+    batches = []
+    monkeypatch.setattr(batch, "process_batch", lambda events: batches.append(events) or {"a.json"})
+    queue, poison = FakeQueue(exhausted, abandoned, garbage), FakeQueue()
+
+    batch.drain_queue(queue, poison_queue_client=poison, max_dequeue_count=5)
+
+    assert batches == [[grid_event("a.json")]]
+    assert queue.messages == []
+    assert sorted(poison.sent) == sorted([exhausted.content, abandoned.content, garbage.content])
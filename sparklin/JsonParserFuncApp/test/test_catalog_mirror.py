@@ -0,0 +1,108 @@
+import importlib
+import os
+import sys
+import types
+import pytest
+from JsonParserFunction import catalog_mirror
+from JsonParserFunction.catalog_mirror import CatalogMirror, CatalogEntry, RETRY_AFTER_S
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CANONICAL = os.path.join(os.path.dirname(APP_DIR), "BlobTriggerFuncApp", "BlobTriggerFunction", "catalog_mirror.py")
+
+
+def entity(guid: str, qualified_name: str, entity_type: str = "fabric_lakehouse") -> dict:
+    return {"id": guid, "name": qualified_name.rsplit("/", 1)[-1], "entityType": entity_type,
+            "qualifiedName": qualified_name}
+
+
+class Search:
+    """Returns the results set on it, or raises them if they are an exception, and records the filters used."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.filters = []
+
+    def __call__(self, search_filter=None, limit=1000):
+        self.filters.append(search_filter)
+        if isinstance(self.results, Exception):
+            raise self.results
+        return iter(self.results)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(catalog_mirror.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def mirror(tmp_path, clock):
+    return CatalogMirror(str(tmp_path / "catalog.sqlite"), ttl=60, full_refresh=3600)
+
+
+def test_copy_matches_the_blob_trigger_module():
+    with open(CANONICAL) as canonical, open(catalog_mirror.__file__) as copy:
+        canonical_lines, copy_lines = canonical.read().splitlines(), copy.read().splitlines()
+
+    assert [(line, other) for line, other in zip(canonical_lines, copy_lines) if line != other] == [
+        ('DEFAULT_TYPE_NAMES = "azure_datalake_gen2_path,DataSet"', 'DEFAULT_TYPE_NAMES = ""')]
+    assert len(canonical_lines) == len(copy_lines)
+
+
+def test_mirrors_every_type_by_default(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog_mirror, "_catalog_mirror", None)
+    monkeypatch.setenv("CATALOG_MIRROR_PATH", str(tmp_path / "catalog.sqlite"))
+    monkeypatch.delenv("CATALOG_MIRROR_TYPES", raising=False)
+
+    assert catalog_mirror.get_catalog_mirror().search_filter() is None
+
+
+def test_refreshes_incrementally_and_rebuilds_in_full(mirror, clock):
+    search = Search(entity("g1", "ws/lakehouses/orders"), entity("g2", "ws/warehouses/sales", "fabric_warehouse"))
+    assert mirror.refresh(search) == 2
+
+    clock[0] += 100
+    search.results = [entity("g2", "ws/warehouses/sales", "fabric_warehouse")]
+    mirror.refresh(search)
+    assert mirror.get("ws/lakehouses/orders") is not None
+
+    clock[0] += 3600
+    mirror.refresh(search)
+
+    assert search.filters[0] is None and search.filters[2] is None
+    assert search.filters[1]["updateTime"]["operator"] == "gt"
+    assert mirror.get("ws/lakehouses/orders") is None
+    assert mirror.get("ws/warehouses/sales") == CatalogEntry("g2", "sales", "fabric_warehouse", "ws/warehouses/sales")
+
+
+def test_failed_refreshes_are_retried_later(mirror, clock):
+    search = Search()
+    search.results = ConnectionError("Purview unavailable")
+
+    mirror.ensure_fresh(search)
+    clock[0] += RETRY_AFTER_S - 1
+    mirror.ensure_fresh(search)
+    assert len(search.filters) == 1 and mirror.is_stale()
+
+    clock[0] += 1
+    search.results = [entity("g1", "ws/lakehouses/orders")]
+    mirror.ensure_fresh(search)
+    mirror.ensure_fresh(search)
+    assert len(search.filters) == 2 and not mirror.is_stale()
+
+
+def test_timer_refreshes_the_mirror_with_the_purview_client(mirror, monkeypatch):
+    # The function folders import each other relatively, as members of the app package.
+    package = types.ModuleType("JsonParserFuncApp")
+    package.__path__ = [APP_DIR]
+    monkeypatch.setitem(sys.modules, "JsonParserFuncApp", package)
+    timer = importlib.import_module("JsonParserFuncApp.CatalogMirrorFunction")
+    search = Search(entity("g1", "ws/lakehouses/orders"))
+    monkeypatch.setattr(timer, "get_catalog_mirror", lambda: mirror)
+    monkeypatch.setattr(timer, "PurviewClient", lambda: types.SimpleNamespace(search_entities=search))
+
+    timer.main(None)
+
+    assert search.filters == [None]
+    assert mirror.get("ws/lakehouses/orders").guid == "g1"
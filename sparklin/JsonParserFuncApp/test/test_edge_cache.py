@@ -0,0 +1,50 @@
+from JsonParserFunction.edge_cache import EdgeCache
+from JsonParserFunction.purview_client import LineageEdge, PurviewClient
+
+
+def input_edge(dataset: str) -> LineageEdge:
+    return LineageEdge(dataset, "fabric_lakehouse", "nb", "fabric_synapse_notebook", "ws", "input")
+
+
+def test_edge_cache_evicts_least_recently_used():
+    cache = EdgeCache(capacity=2)
+    cache.add(("a", "nb", "t"))
+    cache.add(("b", "nb", "t"))
+    assert cache.contains(("a", "nb", "t"))
+    cache.add(("c", "nb", "t"))
+
+    assert not cache.contains(("b", "nb", "t"))
+    assert cache.contains(("a", "nb", "t")) and cache.contains(("c", "nb", "t"))
+
+
+def test_edge_cache_falls_back_to_the_shared_table(table):
+    EdgeCache(table).add(("a", "nb", "t"))
+
+    other_worker = EdgeCache(table)
+    assert other_worker.contains(("a", "nb", "t"))
+    assert not other_worker.contains(("b", "nb", "t"))
+
+
+def test_cached_edges_are_not_posted_again(session):
+    cache = EdgeCache()
+    edges = [input_edge("d1"), input_edge("d2")]
+    PurviewClient(edge_cache=cache).create_lineages(edges)
+    session.requests.clear()
+
+    results = PurviewClient(edge_cache=cache).create_lineages(edges + [input_edge("d3")])
+
+    assert [code for code, _ in results] == [409, 409, 201]
+    assert session.requests == ["token", "d3"]
+
+
+def test_missing_entity_invalidates_its_cached_edges(session):
+    cache = EdgeCache()
+    client = PurviewClient(edge_cache=cache)
+    client.create_lineages([input_edge("d1"), input_edge("d2")])
+    session.statuses = {"d3": 404}
+
+    assert client.create_lineages([input_edge("d3")]) == [(404, "{}")]
+
+    # The notebook end of the edges may be gone, so none of its edges is trusted any more.
+    assert not cache.contains(PurviewClient.edge_key(input_edge("d1")))
+    assert not cache.contains(PurviewClient.edge_key(input_edge("d2")))
@@ -0,0 +1,142 @@
+import json
+import pytest
+from JsonParserFunction import json_parser, known_lineage
+from JsonParserFunction.json_parser import (edge_id, extract_lineage, combine_edge_results, split_pending_edges,
+                                            split_known_edges)
+from JsonParserFunction.known_lineage import KnownLineage
+from JsonParserFunction.purview_client import PurviewClient
+
+
+def lineage_event(inputs: list, notebook: str = "nb1", job: str = None, output: str = "out") -> dict:
+    properties = {"trident.artifact.id": notebook, "trident.artifact.workspace.id": "ws",
+                  "spark.synapse.context.notebookname": notebook}
+    event = {"run": {"facets": {"spark_properties": {"properties": properties}}},
+             "inputs": [{"name": f"/{name}/Tables/{name}"} for name in inputs],
+             "outputs": [{"name": f"/{output}/Tables/{output}"}]}
+    if job is not None:
+        event["job"] = {"namespace": "spark", "name": job}
+    return event
+
+
+class RecordingPurview(PurviewClient):
+    calls = []
+    failing = set()
+
+    def __init__(self, edge_cache=None):
+        self.edge_cache = edge_cache
+
+    def create_lineages(self, edges):
+        self.calls.append(("create", sorted(edge_id(edge) for edge in edges)))
+        return [(500, "Internal error.") if edge_id(edge) in self.failing else (201, "Created.") for edge in edges]
+
+    def search_entities(self, filter=None, limit=1000):
+        return iter([])
+
+
+class StaticMirror:
+    def ensure_fresh(self, search):
+        pass
+
+    def get(self, qualified_name):
+        return None
+
+
+@pytest.fixture
+def purview(monkeypatch):
+    RecordingPurview.calls = []
+    RecordingPurview.failing = set()
+    monkeypatch.setattr(json_parser, "PurviewClient", RecordingPurview)
+    monkeypatch.setattr(json_parser, "get_edge_cache", lambda: None)
+    monkeypatch.setattr(json_parser, "get_catalog_mirror", StaticMirror)
+    return RecordingPurview.calls
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(known_lineage.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = KnownLineage(ttl=100)
+    monkeypatch.setattr(json_parser, "get_known_lineage", lambda: store)
+    return store
+
+
+def test_combine_edge_results():
+    assert combine_edge_results([(201, "a"), (409, "b")]) == ("Processed", 409, "SUCCESS")
+    assert combine_edge_results([(201, "a"), (500, "b"), (0, "c")]) == \
+        ("PartiallyProcessed", 500, "[500] b (2/3 edges failed)")
+    assert combine_edge_results([(404, "a")]) == ("Failed", 404, "[404] a (1/1 edges failed)")
+
+
+def test_split_pending_edges_skips_edges_that_already_succeeded():
+    edges, _ = extract_lineage(lineage_event(["a", "b", "a"]))
+
+    results, pending = split_pending_edges(edges, {"input:a": 201, "input:b": 500})
+
+    assert results == {"input:a": (201, "Succeeded in a previous attempt.")}
+    assert [edge_id(edge) for edge in pending] == ["input:b", "output:out"]
+    assert len(split_pending_edges(edges)[1]) == 3
+
+
+def test_retry_resends_only_the_failed_edges(purview, monkeypatch):
+    monkeypatch.setattr(json_parser, "get_known_lineage", lambda: None)
+    event = json.dumps(lineage_event(["a", "b"]))
+    RecordingPurview.failing = {"input:b"}
+
+    first = json_parser.main(event)
+    RecordingPurview.failing = set()
+    retry = json_parser.main(event, first["edges"])
+
+    assert (first["status"], first["edges"]) == ("PartiallyProcessed", {"input:a": 201, "input:b": 500, "output:out": 201})
+    assert purview[-1] == ("create", ["input:b"])
+    assert (retry["status"], retry["edges"]) == ("Processed", {"input:a": 201, "input:b": 201, "output:out": 201})
+
+
+def test_split_known_edges_skips_edges_of_the_last_run():
+    edges, _ = extract_lineage(lineage_event(["a", "b"]))
+    known = {"edges": [list(edge) for edge in extract_lineage(lineage_event(["a", "c"]))[0]]}
+    results = {}
+
+    pending = split_known_edges(edges, known, results, list(edges))
+
+    assert [edge_id(edge) for edge in pending] == [edge_id(edges[1])]
+    assert results == {edge_id(edges[0]): (409, "Lineage unchanged since the last run."),
+                       edge_id(edges[2]): (409, "Lineage unchanged since the last run.")}
+    assert split_known_edges(edges, None, {}, list(edges)) == list(edges)
+
+
+def test_main_sends_only_the_changes_since_the_last_run(purview, store):
+    assert json_parser.main(json.dumps(lineage_event(["a", "b"])))["status"] == "Processed"
+    assert json_parser.main(json.dumps(lineage_event(["a", "b"])))["status"] == "Processed"
+    json_parser.main(json.dumps(lineage_event(["a", "c"])))
+
+    # input:b is left in Purview; only the edges a run adds are sent.
+    assert purview == [("create", ["input:a", "input:b", "output:out"]), ("create", ["input:c"])]
+
+
+def test_jobs_of_a_notebook_are_diffed_separately(purview, store):
+    # Two Spark actions of nb1, each reported as its own job, read and write different datasets.
+    first = json.dumps(lineage_event(["a"], job="nb1.execute_insert_into_a", output="x"))
+    second = json.dumps(lineage_event(["b"], job="nb1.execute_insert_into_b", output="y"))
+    for _ in range(2):
+        assert json_parser.main(first)["status"] == "Processed"
+        assert json_parser.main(second)["status"] == "Processed"
+
+    assert purview == [("create", ["input:a", "output:x"]), ("create", ["input:b", "output:y"])]
+
+
+def test_unchanged_runs_do_not_postpone_the_full_push(purview, store, clock):
+    event = json.dumps(lineage_event(["a"]))
+    json_parser.main(event)
+    for _ in range(2):
+        clock[0] += 40
+        json_parser.main(event)
+    assert len(purview) == 1
+
+    clock[0] += 40
+    json_parser.main(event)
+    assert purview == [("create", ["input:a", "output:out"])] * 2
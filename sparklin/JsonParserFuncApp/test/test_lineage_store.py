@@ -0,0 +1,47 @@
+import json
+from JsonParserFunction.lineage_store import LineageDetailsStore, entity_size, property_size
+
+
+def lineage_details(columns: int, process_name: str = "notebook") -> dict:
+    names = [f"column_name_{i:05d}" for i in range(columns)]
+    return {"process_name": process_name, "input_datasets": ["in"], "output_datasets": ["out"],
+            "intermediate_process": "nb", "input_tables": "t", "output_tables": "o",
+            "input_columns": names, "output_columns": names[:columns // 2],
+            "derived_columns": {name: [name] for name in names[:columns // 2]}, "joinconditions": [], "isdelta": False}
+
+
+def test_entity_size_counts_utf16():
+    assert property_size("ab", "é") == 8 + 4 + 4 + 2
+    assert property_size("ab", "\U0001F600") == 8 + 4 + 4 + 4
+    assert property_size("flag", True) == 8 + 8 + 1
+    assert entity_size({"PartitionKey": "P", "RowKey": "R", "ab": "é"}) == 4 + 4 + property_size("ab", "é")
+
+
+def test_round_trip_with_spilled_values(table, container):
+    store = LineageDetailsStore(table, container)
+    details = lineage_details(5000)
+
+    entity = store.to_entity("HRSI", "event.json", details)
+
+    assert entity["encoding"] == "dict-v1"
+    assert "column_dictionary_blob" in entity and "column_dictionary" not in entity
+    assert store.from_entity(entity) == details
+
+
+def test_row_is_budgeted_in_utf16_bytes_over_all_properties(table, container):
+    details = lineage_details(400, process_name="é" * 2000)
+    unbounded = LineageDetailsStore(table, container).to_entity("HRSI", "event.json", details)
+    budget = entity_size(unbounded) - 1
+
+    entity = LineageDetailsStore(table, container, entity_budget=budget).to_entity("HRSI", "event.json", details)
+
+    assert entity_size(entity) <= budget
+    assert [name for name in entity if name.endswith("_blob")] == ["column_dictionary_blob"]
+    assert LineageDetailsStore(table, container).from_entity(entity) == details
+
+
+def test_legacy_rows_are_read_as_is(table, container):
+    details = lineage_details(4)
+    entity = {name: json.dumps(value) if isinstance(value, (list, dict)) else value for name, value in details.items()}
+
+    assert LineageDetailsStore(table, container).from_entity(dict(entity, RowKey="event.json")) == details
@@ -0,0 +1,55 @@
+import json
+from JsonParserFunction import processing
+from JsonParserFunction.processing import begin_event, complete_event, blob_location
+
+
+def result(status, edges, details=None):
+    return {"status": status, "message": "message", "details": details, "edges": edges}
+
+
+def test_blob_location():
+    assert blob_location("https://account.blob.core.windows.net/events/2024/01/event.json") == \
+        ("events", "2024/01/event.json")
+
+
+def test_begin_event_claims_new_events(table):
+    row = table.add(PartitionKey="HRSI", RowKey="event.json", Status="Unprocessed", RetryCount=3)
+
+    assert begin_event(table, row) == (True, None)
+    assert table.get_entity("HRSI", "event.json")["Status"] == "Processing"
+
+
+def test_begin_event_retries_failed_edges_while_retries_remain(table):
+    edges = {"input:a": 201, "input:b": 500}
+    row = table.add(PartitionKey="HRSI", RowKey="event.json", Status="PartiallyProcessed", RetryCount=1,
+                    EdgeResults=json.dumps(edges))
+    assert begin_event(table, row) == (True, edges)
+
+    exhausted = table.add(PartitionKey="HRSI", RowKey="event.json", Status="PartiallyProcessed", RetryCount=0,
+                          EdgeResults=json.dumps(edges))
+    assert begin_event(table, exhausted) == (False, None)
+
+
+def test_complete_event_counts_down_retries(table, monkeypatch):
+    saved = []
+    monkeypatch.setattr(processing, "get_lineage_details_store",
+                        lambda *args: type("Store", (), {"save": lambda store, *row: saved.append(row)})())
+    row = table.add(PartitionKey="HRSI", RowKey="event.json", Status="Processing", RetryCount=1)
+
+    assert complete_event(table, row, result("PartiallyProcessed", {"input:a": 500}), "conn", "LineageDetails")
+    assert table.get_entity("HRSI", "event.json")["RetryCount"] == 0
+    assert not complete_event(table, row, result("PartiallyProcessed", {"input:a": 500}), "conn", "LineageDetails")
+
+    assert not complete_event(table, row, result("Processed", {"input:a": 201}, {"process_name": "nb"}),
+                              "conn", "LineageDetails")
+    assert table.get_entity("HRSI", "event.json")["Status"] == "Processed"
+    assert saved == [("HRSI", "event.json", {"process_name": "nb"})]
+
+
+def test_complete_event_stops_when_another_delivery_updated_the_row(table):
+    row = table.add(PartitionKey="HRSI", RowKey="event.json", Status="Processing", RetryCount=3)
+    table.add(PartitionKey="HRSI", RowKey="event.json", Status="Processed", RetryCount=3)
+    table.rows[("HRSI", "event.json")]._metadata = {"etag": "5"}
+
+    assert not complete_event(table, row, result("Failed", {"input:a": 500}), "conn", "LineageDetails")
+    assert table.get_entity("HRSI", "event.json")["Status"] == "Processed"
@@ -0,0 +1,31 @@
+from JsonParserFunction.purview_client import LineageEdge, PurviewClient
+
+
+def input_edge(dataset: str) -> LineageEdge:
+    return LineageEdge(dataset, "fabric_lakehouse", "nb", "fabric_synapse_notebook", "ws", "input")
+
+
+def test_create_lineages_reports_every_edge_in_order(session):
+    session.statuses = {"d1": 409, "d2": 500, "d3": 0}
+    edges = [input_edge(f"d{i}") for i in range(5)]
+
+    results = PurviewClient().create_lineages(edges)
+
+    assert [code for code, _ in results] == [201, 409, 500, 0, 201]
+    assert session.requests.count("token") == 1
+
+
+def test_create_lineages_sends_edges_concurrently(session, monkeypatch):
+    monkeypatch.setenv("PURVIEW_MAX_CONCURRENCY", "4")
+
+    PurviewClient().create_lineages([input_edge(f"d{i}") for i in range(8)])
+
+    assert 1 < session.max_in_flight <= 4
+
+
+def test_create_lineages_sends_one_at_a_time_without_concurrency(session, monkeypatch):
+    monkeypatch.setenv("PURVIEW_MAX_CONCURRENCY", "1")
+
+    PurviewClient().create_lineages([input_edge(f"d{i}") for i in range(3)])
+
+    assert session.max_in_flight == 1
@@ -0,0 +1,54 @@
+import json
+import pytest
+from JsonParserFunction.lineage_store import LineageDetailsStore
+from JsonParserFunction.schema_store import SchemaStore, schema_fingerprint
+from test_lineage_store import lineage_details
+
+
+def test_schema_fingerprint_depends_on_the_column_order():
+    assert schema_fingerprint(["a", "b"])[0] == schema_fingerprint(["a", "b"])[0]
+    assert schema_fingerprint(["a", "b"])[0] != schema_fingerprint(["b", "a"])[0]
+
+
+def test_schemas_are_stored_once_and_shared(table, container):
+    store = SchemaStore(table, container)
+    fingerprint = store.put(["a", "b"])
+    table.rows.clear()
+    assert store.put(["a", "b"]) == fingerprint
+    assert not table.rows
+
+    other_worker = SchemaStore(table, container)
+    assert other_worker.put(["c"]) == SchemaStore(table, container).put(["c"])
+    assert len(table.rows) == 1
+    assert SchemaStore(table, container).get(other_worker.put(["c"])) == ["c"]
+
+
+def test_wide_schemas_go_to_a_blob(table, container):
+    columns = [f"column_{i}" for i in range(100)]
+    fingerprint = SchemaStore(table, container, inline_limit=100).put(columns)
+
+    row = table.get_entity(fingerprint[:2], fingerprint)
+    assert "columns" not in row and row["columns_blob"] in container.blobs
+    assert SchemaStore(table, container).get(fingerprint) == columns
+
+
+def test_tampered_schemas_are_rejected(table, container):
+    fingerprint = SchemaStore(table, container).put(["a"])
+    table.get_entity(fingerprint[:2], fingerprint)["columns"] = '["b"]'
+
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        SchemaStore(table, container).get(fingerprint)
+
+
+def test_lineage_details_reference_schemas_by_fingerprint(table, container):
+    schemas = SchemaStore(table, container)
+    details = lineage_details(6)
+    details["input_schemas"] = [details["input_columns"][:4], details["input_columns"][4:]]
+    details["output_schemas"] = [details["output_columns"]]
+
+    entity = LineageDetailsStore(table, container, schemas).to_entity("HRSI", "event.json", details)
+
+    assert entity["encoding"] == "schema-v1"
+    assert "input_columns" not in entity
+    assert json.loads(entity["input_schemas"]) == [schemas.put(columns) for columns in details["input_schemas"]]
+    assert LineageDetailsStore(table, container, SchemaStore(table, container)).from_entity(entity) == details
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from JsonParserFunction import storage
+
+
+class FakeTableService:
+    created = []
+
+    def __init__(self, conn_str):
+        self.conn_str = conn_str
+        self.created_tables = []
+
+    @classmethod
+    def from_connection_string(cls, conn_str):
+        service = cls(conn_str)
+        cls.created.append(service)
+        return service
+
+    def create_table_if_not_exists(self, table_name):
+        self.created_tables.append(table_name)
+
+    def get_table_client(self, table_name):
+        return (self.conn_str, table_name)
+
+
+@pytest.fixture
+def services(monkeypatch):
+    FakeTableService.created = []
+    monkeypatch.setattr(storage, "TableServiceClient", FakeTableService)
+    monkeypatch.setattr(storage, "_table_services", {})
+    monkeypatch.setattr(storage, "_provisioned", set())
+    return FakeTableService.created
+
+
+def test_table_service_is_built_once_per_connection_string(services):
+    assert storage.get_table_service("conn1") is storage.get_table_service("conn1")
+    assert storage.get_table_service("conn2") is not storage.get_table_service("conn1")
+    assert [service.conn_str for service in services] == ["conn1", "conn2"]
+
+
+def test_table_is_created_once_per_worker(services):
+    for _ in range(3):
+        assert storage.get_table_client("conn", "LineageDetails", create=True) == ("conn", "LineageDetails")
+    storage.get_table_client("conn", "EventMetadata")
+
+    assert services[0].created_tables == ["LineageDetails"]
+
+
+def event_row(table, **properties):
+    return table.add(PartitionKey="HRSI", RowKey="event.json", **properties)
+
+
+def test_only_one_delivery_claims_an_event(table):
+    row = event_row(table, Status="Unprocessed")
+    # Two deliveries read the same row before either claims it.
+    first, second = type(row)(row), type(row)(row)
+    first._metadata, second._metadata = dict(row.metadata), dict(row.metadata)
+
+    assert storage.claim_entity(table, first, ("Unprocessed",), 600)
+    assert not storage.claim_entity(table, second, ("Unprocessed",), 600)
+    assert table.get_entity("HRSI", "event.json")["Status"] == "Processing"
+
+
+def test_claim_respects_the_lease(table):
+    now = datetime.now(timezone.utc)
+
+    assert not storage.claim_entity(table, event_row(table, Status="Processing", ClaimedAt=now - timedelta(seconds=60)),
+                                    ("Unprocessed",), 600)
+    assert storage.claim_entity(table, event_row(table, Status="Processing", ClaimedAt=now - timedelta(seconds=601)),
+                                ("Unprocessed",), 600)
+    assert table.get_entity("HRSI", "event.json")["ClaimedAt"] > now
+
+
+def test_processed_events_are_not_claimed(table):
+    assert not storage.claim_entity(table, event_row(table, Status="Processed"), ("Unprocessed", "Failed"), 600)
@@ -0,0 +1,361 @@
+"""Offline backfill of the lineage of stored OpenLineage events.
+
+Reprocessing history through the function apps means firing their trigger
+again for every blob. This tool reads the stored events from a local directory
+or a container prefix and parses them in parallel worker processes, with the
+parsers of the function apps:
+
+    synapse   BlobTriggerFunction/Synapse_JsonParser.PurviewTransform
+    fabric    JsonParserFunction/json_parser.extract_lineage
+
+Parsing never calls Purview. The entities PurviewTransform would upload, and
+the relationships json_parser would create, are captured and written to a sink
+as one record per event:
+
+    ndjson           One JSON record per line, appended to --output (default)
+    purview          Pushed to Purview with the credentials the function apps use
+    module:factory   A custom sink: factory(output) returns an object with write(record) and close()
+
+Synapse plans are resolved against a catalog mirror (see catalog_mirror). It is
+empty unless --catalog-mirror names a mirror file, which --refresh-catalog
+fills from Purview first.
+
+With --checkpoint, the events written to the sink are listed in a file and
+skipped when the tool is run again, so an interrupted backfill resumes where it
+stopped. Events that fail to parse are written to the sink but not listed, so
+they are tried again.
+
+Usage:
+    python backfill.py --parser synapse --source ./events --output lineage.ndjson --checkpoint lineage.done
+    python backfill.py --parser fabric --container lineage --prefix 2024/ --sink purview --rate 20
+    python backfill.py --parser synapse --source ./events --dry-run --limit 100
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import traceback
+import types
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+SPARKLIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FUNCTION_DIRS = {"synapse": os.path.join(SPARKLIN_DIR, "BlobTriggerFuncApp", "BlobTriggerFunction"),
+                 "fabric": os.path.join(SPARKLIN_DIR, "JsonParserFuncApp", "JsonParserFunction")}
+# Events submitted to the pool ahead of the results, per worker process.
+IN_FLIGHT_PER_WORKER = 4
+
+# State of a worker process, set up by init_worker.
+_worker = {}
+
+
+def load_package(directory: str, name: str) -> types.ModuleType:
+    """Register a function folder as a package without running its trigger entry point.
+
+    Args:
+        directory (str): Path of the function folder.
+        name (str): Package name under which its modules are imported.
+
+    Returns:
+        ModuleType: The package; its modules are imported with importlib.import_module(name + ".module").
+    """
+    package = types.ModuleType(name)
+    package.__path__ = [directory]
+    sys.modules[name] = package
+    return package
+
+
+def parser_module(parser: str, module: str) -> types.ModuleType:
+    """Import a module of the function folder of a parser, loading the folder on first use."""
+    name = f"backfill_{parser}"
+    if name not in sys.modules:
+        load_package(FUNCTION_DIRS[parser], name)
+    return importlib.import_module(f"{name}.{module}")
+
+
+class RecordingClient:
+    """Stands in for the Purview client of PurviewTransform and keeps the entities it is given to upload."""
+
+    def __init__(self):
+        self.entities = []
+        # PurviewTransform searches through client.discovery.
+        self.discovery = self
+
+    def search_entities(self, *args, **kwargs):
+        # Table names are only resolved against the catalog mirror.
+        return []
+
+    def upload_entities(self, batch):
+        self.entities.extend(batch)
+        return {"guidAssignments": {}}
+
+
+def init_worker(parser: str, catalog_mirror: str, connection_string: str, container: str) -> None:
+    """Set up a worker process: load the parser and open the event source."""
+    logging.getLogger().setLevel(logging.WARNING)
+    _worker["parser"] = parser
+    if container:
+        storage = parser_module("fabric", "storage")
+        _worker["container"] = storage.get_blob_service(connection_string).get_container_client(container)
+    if parser == "synapse":
+        # Every event is parsed and captured in full: runs of the same plan are
+        # not served from the plan cache, nor diffed against the previous run.
+        os.environ.update(PLAN_CACHE_SIZE="0", KNOWN_LINEAGE_SIZE="0")
+        mirror = parser_module(parser, "catalog_mirror")
+        # The mirror is read only; RecordingClient could not refresh it anyway.
+        mirror._catalog_mirror = mirror.CatalogMirror(catalog_mirror, ttl=float("inf"), full_refresh=float("inf"))
+        _worker["client"] = RecordingClient()
+
+
+def read_event(name: str) -> bytes:
+    """Read an event from the worker's source: its container, or else the local file system."""
+    if "container" in _worker:
+        return _worker["container"].download_blob(name).readall()
+    with open(name, "rb") as f:
+        return f.read()
+
+
+def parse_synapse(data: bytes) -> dict:
+    """Parse a Synapse event with PurviewTransform and return its record fields."""
+    synapse_parser = parser_module("synapse", "Synapse_JsonParser")
+    event = parser_module("synapse", "event_loader").load_event(io.BytesIO(data))
+    client = _worker["client"]
+    client.entities = []
+    transform = synapse_parser.PurviewTransform(client, event)
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            (cluster_name, row_key, input_tables, output_table, input_columns, output_columns, deltatable,
+             intermediate_tbl_views, globaltempviews, hardcodecol, join_list) = transform.transform_to_purview()
+    except synapse_parser.NothingToLineage as e:
+        return {"status": "Skipped", "message": str(e)}
+
+    # Same fields as the LineageDetails row written by the blob trigger, as JSON values.
+    lineage = {"PartitionKey": cluster_name, "RowKey": row_key, "input_tables": input_tables,
+               "output_table": output_table, "input_columns": input_columns, "output_columns": output_columns,
+               "isdelta": deltatable, "isintermediate": intermediate_tbl_views, "isglobal": globaltempviews,
+               "derived_columns": hardcodecol, "joinconditions": join_list}
+    return {"status": "Processed", "message": "SUCCESS", "parse_path": transform.parse_path,
+            "lineage": lineage if input_tables and output_table else None, "entities": client.entities}
+
+
+def parse_fabric(data: bytes) -> dict:
+    """Extract the lineage of a Fabric event with json_parser and return its record fields."""
+    json_parser = parser_module("fabric", "json_parser")
+    try:
+        event = json.loads(data)
+    except json.JSONDecodeError as e:
+        return {"status": "Failed", "message": str(e)}
+    edges, details = json_parser.extract_lineage(event)
+    if not edges:
+        return {"status": "Failed", "message": "No input or output datasets found."}
+    return {"status": "Processed", "message": "SUCCESS", "details": details,
+            "edges": [edge._asdict() for edge in edges],
+            "relationships": [json_parser.PurviewClient.build_relationship_payload(edge) for edge in edges]}
+
+
+PARSERS = {"synapse": parse_synapse, "fabric": parse_fabric}
+
+
+def process_event(name: str) -> dict:
+    """Read and parse one event in a worker process.
+
+    Returns:
+        dict: The record of the event: its name, the parser, a status as
+        recorded by the function apps ('Processed', 'Skipped', 'Failed' or
+        'Parsing Failed'), a message and the lineage captured.
+    """
+    record = {"event": name, "parser": _worker["parser"]}
+    try:
+        record.update(PARSERS[_worker["parser"]](read_event(name)))
+    except Exception:
+        exc_type, exc_value, exc_traceback = sys.exc_info()
+        record.update(status="Parsing Failed",
+                      message="".join(traceback.format_exception(exc_type, exc_value, exc_traceback)[-2:]))
+    return record
+
+
+class NdjsonSink:
+    """Appends the records to a file, one JSON document per line."""
+
+    def __init__(self, output: str):
+        self.file = open(output or "lineage.ndjson", "a", encoding="utf-8")
+
+    def write(self, record: dict) -> None:
+        self.file.write(json.dumps(record, default=str) + "\n")
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class PurviewSink:
+    """Pushes the lineage of the processed records to Purview, as the function apps would."""
+
+    def __init__(self, output: str = None):
+        self._synapse_client = None
+        self._fabric_client = None
+
+    def write(self, record: dict) -> None:
+        if record["status"] != "Processed":
+            return
+        if record.get("entities"):
+            if self._synapse_client is None:
+                self._synapse_client = parser_module("synapse", "purview").get_purview_client()
+            self._synapse_client.upload_entities(batch=record["entities"])
+        if record.get("edges"):
+            purview_client = parser_module("fabric", "purview_client")
+            json_parser = parser_module("fabric", "json_parser")
+            if self._fabric_client is None:
+                edge_cache = parser_module("fabric", "edge_cache").get_edge_cache()
+                self._fabric_client = purview_client.PurviewClient(edge_cache=edge_cache)
+            # End types are resolved like json_parser.main does.
+            mirror = parser_module("fabric", "catalog_mirror").get_catalog_mirror()
+            mirror.ensure_fresh(self._fabric_client.search_entities)
+            edges = json_parser.resolve_end_types([purview_client.LineageEdge(**edge) for edge in record["edges"]], mirror)
+            results = self._fabric_client.create_lineages(edges)
+            failed = [code for code, _ in results if code not in json_parser.SUCCESS_CODES]
+            if failed:
+                raise RuntimeError(f"{len(failed)}/{len(results)} edges of {record['event']} failed: {failed[0]}")
+
+    def close(self) -> None:
+        pass
+
+
+SINKS = {"ndjson": NdjsonSink, "purview": PurviewSink}
+
+
+def make_sink(sink: str, output: str):
+    """Return the sink named by --sink: a built-in one or a module:factory reference."""
+    if sink in SINKS:
+        return SINKS[sink](output)
+    module, _, factory = sink.partition(":")
+    if not factory:
+        raise ValueError(f"Unknown sink {sink!r}: expected one of {', '.join(SINKS)} or module:factory.")
+    sys.path.insert(0, os.getcwd())
+    return getattr(importlib.import_module(module), factory)(output)
+
+
+def list_events(args) -> list:
+    """Return the names of the stored events, in order: file paths, or blob names of the container."""
+    if args.container:
+        storage = parser_module("fabric", "storage")
+        container = storage.get_blob_service(args.connection_string).get_container_client(args.container)
+        return sorted(blob.name for blob in container.list_blobs(name_starts_with=args.prefix)
+                      if blob.name.endswith(".json"))
+    return sorted(os.path.join(directory, name) for directory, _, names in os.walk(args.source)
+                  for name in names if name.endswith(".json"))
+
+
+def refresh_catalog(path: str) -> int:
+    """Fill a catalog mirror file from Purview, with the credentials of the blob trigger function."""
+    mirror = parser_module("synapse", "catalog_mirror")
+    client = parser_module("synapse", "purview").get_purview_client()
+    type_names = os.environ.get("CATALOG_MIRROR_TYPES", mirror.DEFAULT_TYPE_NAMES)
+    return mirror.CatalogMirror(path, type_names=[name.strip() for name in type_names.split(",") if name.strip()]) \
+        .refresh(lambda search_filter: client.discovery.search_entities("*", limit=1000, search_filter=search_filter),
+                 full=True)
+
+
+def backfill(args) -> Counter:
+    """Parse the selected events in parallel and write their records to the sink.
+
+    Returns:
+        Counter: Number of events per status, plus 'Sink Failed' for records the sink rejected.
+    """
+    names = list_events(args)
+    done = set()
+    if args.checkpoint and os.path.exists(args.checkpoint):
+        with open(args.checkpoint, encoding="utf-8") as f:
+            done = set(line.rstrip("\n") for line in f)
+    names = [name for name in names if name not in done]
+    if args.limit:
+        names = names[:args.limit]
+    print(f"{len(names)} event(s) to process, {len(done)} already done.", file=sys.stderr)
+
+    sink = None if args.dry_run else make_sink(args.sink, args.output)
+    checkpoint = open(args.checkpoint, "a", encoding="utf-8") if args.checkpoint and not args.dry_run else None
+    counts = Counter()
+
+    def handle(record):
+        counts[record["status"]] += 1
+        if sink is None:
+            return
+        try:
+            sink.write(record)
+        except Exception as e:
+            logging.error(f"Sink failed for {record['event']}: {e}")
+            counts["Sink Failed"] += 1
+            return
+        # Failed events are left out of the checkpoint, so a resumed run parses them again.
+        if checkpoint is not None and record["status"] in ("Processed", "Skipped"):
+            checkpoint.write(record["event"] + "\n")
+            checkpoint.flush()
+
+    interval = 1 / args.rate if args.rate else 0
+    next_slot = time.monotonic()
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                                 initargs=(args.parser, args.catalog_mirror, args.connection_string,
+                                           args.container)) as executor:
+            pending = set()
+            for name in names:
+                if interval:
+                    time.sleep(max(0.0, next_slot - time.monotonic()))
+                    next_slot = max(next_slot, time.monotonic()) + interval
+                pending.add(executor.submit(process_event, name))
+                if len(pending) >= args.workers * IN_FLIGHT_PER_WORKER:
+                    completed, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in completed:
+                        handle(future.result())
+            for future in wait(pending).done:
+                handle(future.result())
+    finally:
+        if sink is not None:
+            sink.close()
+        if checkpoint is not None:
+            checkpoint.close()
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill the lineage of stored OpenLineage events.")
+    parser.add_argument("--parser", choices=sorted(PARSERS), required=True, help="Function app parser to run.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--source", help="Local directory holding the events (*.json, recursively).")
+    source.add_argument("--container", help="Blob container holding the events.")
+    parser.add_argument("--prefix", default=None, help="Blob name prefix of the events in the container.")
+    parser.add_argument("--connection-string", default=os.environ.get("AZURE_STORAGE_CONNECTION_STRING"),
+                        help="Storage connection string (default: $AZURE_STORAGE_CONNECTION_STRING).")
+    parser.add_argument("--sink", default="ndjson", help="ndjson, purview or module:factory.")
+    parser.add_argument("--output", help="Output of the sink (ndjson: file appended to, default lineage.ndjson).")
+    parser.add_argument("--checkpoint", help="File listing the events done; they are skipped when resuming.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes.")
+    parser.add_argument("--rate", type=float, default=0, help="Maximum events started per second (0: no limit).")
+    parser.add_argument("--limit", type=int, default=0, help="Process at most this many events.")
+    parser.add_argument("--catalog-mirror", help="Catalog mirror file resolving the Synapse tables (default: an empty one).")
+    parser.add_argument("--refresh-catalog", action="store_true",
+                        help="Fill the catalog mirror from Purview before parsing.")
+    parser.add_argument("--dry-run", action="store_true", help="Parse and count, without writing to the sink or checkpoint.")
+    args = parser.parse_args()
+    if args.container and not args.connection_string:
+        parser.error("--container needs --connection-string or $AZURE_STORAGE_CONNECTION_STRING.")
+
+    if not args.catalog_mirror:
+        args.catalog_mirror = os.path.join(tempfile.mkdtemp(prefix="backfill_"), "catalog.sqlite")
+    if args.refresh_catalog:
+        print(f"Catalog mirror refreshed: {refresh_catalog(args.catalog_mirror)} entities.", file=sys.stderr)
+    start = time.perf_counter()
+    counts = backfill(args)
+    elapsed = time.perf_counter() - start
+    total = sum(count for status, count in counts.items() if status != "Sink Failed")
+    print(f"{total} event(s) in {elapsed:.1f} s ({total / elapsed if elapsed else 0:.1f} events/s)"
+          + ("; dry run, nothing written" if args.dry_run else ""))
+    for status, count in sorted(counts.items()):
+        print(f"  {status:16} {count:>8}")
+    sys.exit(1 if counts["Parsing Failed"] or counts["Failed"] or counts["Sink Failed"] else 0)
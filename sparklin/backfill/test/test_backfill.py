@@ -0,0 +1,102 @@
+import json
+from argparse import Namespace
+import pytest
+import backfill
+
+
+def fabric_event(output):
+    properties = {"trident.artifact.id": "nb1", "trident.artifact.workspace.id": "ws",
+                  "spark.synapse.context.notebookname": "nb1"}
+    return {"run": {"facets": {"spark_properties": {"properties": properties}}},
+            "inputs": [{"name": "/orders/Tables/orders"}], "outputs": [{"name": f"/{output}/Tables/{output}"}]}
+
+
+def synapse_event(run_id, with_lineage=True):
+    inputs = [{"namespace": "abfss://lake", "name": "/silver/orders", "facets": {"schema": {"fields": [{"name": "id"}]}}}]
+    outputs = [{"namespace": "abfss://lake", "name": "/gold/sales", "facets": {"columnLineage": {"fields": {
+        "id": {"inputFields": [{"namespace": "abfss://lake", "name": "/silver/orders", "field": "id"}]}}}}}]
+    return {"run": {"runId": run_id, "facets": {"spark_version": {}}}, "job": {"name": "hrsi_nb_sales_insert_1"},
+            "inputs": inputs if with_lineage else [], "outputs": outputs if with_lineage else []}
+
+
+@pytest.fixture
+def events(tmp_path):
+    source = tmp_path / "events"
+    (source / "2026").mkdir(parents=True)
+
+    def write(name, event):
+        (source / name).write_text(event if isinstance(event, str) else json.dumps(event))
+    write.source = str(source)
+    return write
+
+
+def arguments(tmp_path, source, parser, **overrides):
+    args = Namespace(parser=parser, source=source, container=None, prefix=None, connection_string=None, sink="ndjson",
+                     output=str(tmp_path / "lineage.ndjson"), checkpoint=str(tmp_path / "lineage.done"), workers=2,
+                     rate=0, limit=0, catalog_mirror=str(tmp_path / "catalog.sqlite"), dry_run=False)
+    for name, value in overrides.items():
+        setattr(args, name, value)
+    return args
+
+
+def records(args):
+    # Records are written as the workers complete them, in no particular order.
+    with open(args.output, encoding="utf-8") as f:
+        return sorted((json.loads(line) for line in f), key=lambda record: record["event"])
+
+
+def test_resumes_from_the_checkpoint_and_retries_failures(tmp_path, events):
+    events("2026/a.json", fabric_event("sales"))
+    events("2026/b.json", "{not json")
+    events("c.json", fabric_event("returns"))
+    args = arguments(tmp_path, events.source, "fabric", limit=2)
+
+    assert backfill.backfill(args) == {"Processed": 1, "Failed": 1}
+    args.limit = 0
+    assert backfill.backfill(args) == {"Processed": 1, "Failed": 1}
+
+    written = records(args)
+    assert [(record["event"][len(events.source) + 1:], record["status"]) for record in written] == \
+        [("2026/a.json", "Processed"), ("2026/b.json", "Failed"), ("2026/b.json", "Failed"), ("c.json", "Processed")]
+    assert [(edge["direction"], edge["source_guid"], edge["target_guid"]) for edge in written[0]["edges"]] == \
+        [("input", "orders", "nb1"), ("output", "nb1", "sales")]
+    with open(args.checkpoint, encoding="utf-8") as f:
+        assert sorted(line[len(events.source) + 1:] for line in f.read().splitlines()) == ["2026/a.json", "c.json"]
+
+
+def test_parses_synapse_events_without_calling_purview(tmp_path, events):
+    events("a.json", synapse_event("run1"))
+    events("b.json", synapse_event("run2", with_lineage=False))
+    args = arguments(tmp_path, events.source, "synapse")
+
+    assert backfill.backfill(args) == {"Processed": 1, "Skipped": 1}
+
+    processed, skipped = records(args)
+    assert processed["parse_path"] == "columnLineage"
+    assert processed["lineage"]["input_columns"] == ["id"] and processed["lineage"]["output_table"] == "sales"
+    assert sorted(entity["attributes"]["qualifiedName"] for entity in processed["entities"]
+                  if entity["typeName"] == "DataSet") == ["hrservicesinsights://orders", "hrservicesinsights://sales"]
+    assert skipped["message"] == "No plan and no input datasets"
+
+
+class RejectingSink:
+    def __init__(self, output):
+        pass
+
+    def write(self, record):
+        if record["event"].endswith("b.json"):
+            raise IOError("sink unavailable")
+
+    def close(self):
+        pass
+
+
+def test_records_the_sink_rejects_are_not_checkpointed(tmp_path, events, monkeypatch):
+    events("a.json", fabric_event("sales"))
+    events("b.json", fabric_event("returns"))
+    monkeypatch.setitem(backfill.SINKS, "rejecting", RejectingSink)
+    args = arguments(tmp_path, events.source, "fabric", sink="rejecting")
+
+    assert backfill.backfill(args) == {"Processed": 2, "Sink Failed": 1}
+    with open(args.checkpoint, encoding="utf-8") as f:
+        assert f.read().splitlines() == [events.source + "/a.json"]
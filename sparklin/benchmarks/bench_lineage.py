@@ -0,0 +1,353 @@
+"""Throughput benchmark of the lineage parsers against the local Purview stub.
+
+Two code paths are measured with synthetic OpenLineage events of growing size:
+
+    json_parser                JsonParserFunction/json_parser.main (Fabric, Event Grid path)
+    purview_transform          BlobTriggerFunction/Synapse_JsonParser.PurviewTransform (Synapse path)
+    purview_transform_facets   The same events carrying columnLineage and schema facets
+    purview_transform_burst    The purview_transform events, 8 at a time
+    purview_transform_scheduled  The purview_transform events with the plan cache, as runs of one notebook
+
+For every scenario the benchmark reports events/s, HTTP calls per event and
+the p50/p95 latency of one event, and compares them with the committed
+baseline.json. Timings depend on the machine, so compare runs made with the
+same stub settings on the same host.
+
+Usage:
+    python bench_lineage.py                       # run and compare with baseline.json
+    python bench_lineage.py --check 0.25          # exit 1 on a regression above 25%
+    python bench_lineage.py --write-baseline      # record a new baseline
+    python bench_lineage.py --only purview_transform_scheduled --write-baseline   # re-record one benchmark
+    python bench_lineage.py --latency-ms 40 --throttle-rate 0.05 --only json_parser
+"""
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import sys
+import tempfile
+import time
+import types
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from purview_stub import start_stub
+
+SPARKLIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# (datasets, columns per dataset) of each scenario.
+SCENARIOS = [(1, 10), (4, 50), (16, 200)]
+
+CATALYST = "org.apache.spark.sql.catalyst"
+
+
+def load_package(directory: str, name: str) -> types.ModuleType:
+    """Register a function folder as a package without running its trigger entry point.
+
+    Args:
+        directory (str): Path of the function folder.
+        name (str): Package name under which its modules are imported.
+
+    Returns:
+        ModuleType: The package; its modules are imported with importlib.import_module(name + ".module").
+    """
+    package = types.ModuleType(name)
+    package.__path__ = [directory]
+    sys.modules[name] = package
+    return package
+
+
+def percentile(values: list, share: float) -> float:
+    """Return the nearest-rank percentile of a list of numbers."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(share * (len(ordered) - 1))))]
+
+
+def fabric_event(datasets: int, columns: int) -> str:
+    """Build a Fabric OpenLineage event with one output and several inputs.
+
+    Every event gets its own notebook and lakehouse GUIDs so its edges are new to Purview.
+    """
+    notebook = str(uuid.uuid4())
+    fields = [{"name": f"col_{i}", "type": "string"} for i in range(columns)]
+
+    def dataset(table):
+        return {"namespace": "abfss://workspace@onelake.dfs.fabric.microsoft.com",
+                "name": f"/{uuid.uuid4()}/Tables/{table}",
+                "facets": {"schema": {"fields": fields}}}
+
+    output = dataset("target")
+    output["facets"]["columnLineage"] = {"fields": {
+        f"col_{i}": {"inputFields": [{"namespace": "onelake", "name": "source_0", "field": f"col_{i}"}]}
+        for i in range(columns)}}
+    return json.dumps({
+        "eventType": "COMPLETE",
+        "run": {"runId": str(uuid.uuid4()), "facets": {"spark_properties": {"properties": {
+            "trident.artifact.id": notebook,
+            "trident.artifact.workspace.id": str(uuid.uuid4()),
+            "spark.synapse.context.notebookname": "bench_notebook"}}}},
+        "job": {"namespace": "bench", "name": "bench_notebook.execute_insert_into_command"},
+        "inputs": [dataset(f"source_{d}") for d in range(datasets)],
+        "outputs": [output]
+    })
+
+
+def synapse_event(datasets: int, columns: int, with_facets: bool = False) -> dict:
+    """Build a Synapse OpenLineage event holding an INSERT ... SELECT over joined tables.
+
+    The projection mixes plain, renamed, cast and literal columns so that the
+    field, column transformation and join parsers all have work to do. With
+    with_facets, the datasets also carry the schema and columnLineage facets
+    describing the same projection.
+    """
+    def attribute(alias, column):
+        return {"class": f"{CATALYST}.analysis.UnresolvedAttribute", "num-children": 0,
+                "nameParts": f"[{alias}, {column}]"}
+
+    def lineage(d, column, description=None):
+        fields = {"inputFields": [{"namespace": "abfss://silver", "name": f"/silver/bench_source_{d}", "field": column}]
+                  if column else []}
+        if description:
+            fields.update(transformationDescription=description, transformationType="MASKED")
+        return fields
+
+    project_list = []
+    column_lineage = {}
+    for d in range(datasets):
+        for c in range(columns):
+            column = f"t{d}_col_{c}"
+            if c % 4 == 0:
+                column_lineage[column] = lineage(d, column)
+                project_list.append([attribute(f"a{d}", column)])
+            elif c % 4 == 1:
+                column_lineage[f"{column}_renamed"] = lineage(d, column)
+                project_list.append([{"class": f"{CATALYST}.expressions.Alias", "num-children": 1, "name": f"{column}_renamed"},
+                                     attribute(f"a{d}", column)])
+            elif c % 4 == 2:
+                column_lineage[f"{column}_date"] = lineage(d, column, f"CAST(a{d}.{column} AS DATE)")
+                project_list.append([{"class": f"{CATALYST}.expressions.Alias", "num-children": 1, "name": f"{column}_date"},
+                                     {"class": f"{CATALYST}.expressions.Cast", "num-children": 1, "dataType": "date"},
+                                     attribute(f"a{d}", column)])
+            else:
+                column_lineage[f"{column}_flag"] = lineage(d, None, "'Y'")
+                project_list.append([{"class": f"{CATALYST}.expressions.Alias", "num-children": 1, "name": f"{column}_flag"},
+                                     {"class": f"{CATALYST}.expressions.Literal", "num-children": 0, "value": "Y",
+                                      "dataType": "string"}])
+
+    plan = [
+        {"class": f"{CATALYST}.plans.logical.InsertIntoStatement", "num-children": 1,
+         "table": [{"class": f"{CATALYST}.analysis.UnresolvedRelation", "num-children": 0,
+                    "multipartIdentifier": "[gold, bench_target]"}]},
+        {"class": f"{CATALYST}.plans.logical.Project", "num-children": 1, "projectList": project_list},
+    ]
+    # Left-deep join tree: each join adds one table, joined to the first on its key.
+    for d in range(datasets - 1, 0, -1):
+        plan.append({"class": f"{CATALYST}.plans.logical.Join", "num-children": 2,
+                     "joinType": {"object": f"{CATALYST}.plans.Inner$"},
+                     "condition": [{"class": f"{CATALYST}.expressions.EqualTo", "num-children": 2},
+                                   attribute("a0", "id"), attribute(f"a{d}", "id")]})
+    for d in range(datasets):
+        plan.append({"class": f"{CATALYST}.plans.logical.SubqueryAlias", "num-children": 1,
+                     "identifier": {"name": f"a{d}"}})
+        plan.append({"class": f"{CATALYST}.analysis.UnresolvedRelation", "num-children": 0,
+                     "multipartIdentifier": f"[silver, bench_source_{d}]"})
+
+    inputs = [{"namespace": "abfss://silver", "name": f"/silver/bench_source_{d}"} for d in range(datasets)]
+    outputs = [{"namespace": "abfss://gold", "name": "/gold/bench_target"}]
+    if with_facets:
+        for d, inp in enumerate(inputs):
+            inp["facets"] = {"schema": {"fields": [{"name": f"t{d}_col_{c}", "type": "string"}
+                                                   for c in range(columns)]}}
+        outputs[0]["facets"] = {"columnLineage": {"fields": column_lineage}}
+    return {
+        "eventType": "COMPLETE",
+        "run": {"runId": str(uuid.uuid4()), "facets": {
+            "spark.logicalPlan": {"plan": plan},
+            "spark_version": {"spark-version": "3.1.2"}}},
+        "job": {"namespace": "bench", "name": "hrsi_bench_notebook.execute_insert_into_statement"},
+        "inputs": inputs,
+        "outputs": outputs
+    }
+
+
+def use_fresh_catalog_mirror(catalog_mirror: types.ModuleType) -> None:
+    """Point a parser at an empty catalog mirror, so every scenario starts with the same refreshes."""
+    os.environ["CATALOG_MIRROR_PATH"] = os.path.join(tempfile.mkdtemp(prefix="bench_catalog_"), "catalog.sqlite")
+    catalog_mirror._catalog_mirror = None
+
+
+def run_json_parser(stub, events: int, datasets: int, columns: int) -> list:
+    """Drive json_parser.main with synthetic Fabric events and return the per-event latencies."""
+    os.environ.update({"TENANT_ID": "bench-tenant", "CLIENT_ID": "bench-client", "CLIENT_SECRET": "bench-secret",
+                       "PURVIEW_RESOURCE": "https://purview.azure.net", "PURVIEW_API_URL": stub.url,
+                       "AAD_AUTHORITY_HOST": stub.url})
+    os.environ.pop("EDGE_CACHE_TABLE", None)
+    os.environ.pop("KNOWN_LINEAGE_TABLE", None)
+    load_package(os.path.join(SPARKLIN_DIR, "JsonParserFuncApp", "JsonParserFunction"), "bench_jsonparser")
+    json_parser = importlib.import_module("bench_jsonparser.json_parser")
+    edge_cache = importlib.import_module("bench_jsonparser.edge_cache")
+    edge_cache._edge_cache = None
+    importlib.import_module("bench_jsonparser.known_lineage")._known_lineage = None
+    use_fresh_catalog_mirror(importlib.import_module("bench_jsonparser.catalog_mirror"))
+
+    blobs = [fabric_event(datasets, columns) for _ in range(events)]
+    latencies = []
+    for blob_str in blobs:
+        start = time.perf_counter()
+        json_parser.main(blob_str)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run_purview_transform(stub, events: int, datasets: int, columns: int, with_facets: bool = False,
+                          concurrency: int = 1, repeated_runs: bool = False) -> list:
+    """Drive PurviewTransform with synthetic Synapse events and return the per-event latencies.
+
+    The events all hold the same plan, so the plan cache and the known lineage
+    are disabled unless repeated_runs is set, for every event to be parsed and pushed.
+    """
+    from pyapacheatlas.auth.basic import BasicAuthentication
+    from pyapacheatlas.core.client import AtlasClient
+    from pyapacheatlas.core.discovery.purview import PurviewDiscoveryClient
+
+    load_package(os.path.join(SPARKLIN_DIR, "BlobTriggerFuncApp", "BlobTriggerFunction"), "bench_blobtrigger")
+    synapse_parser = importlib.import_module("bench_blobtrigger.Synapse_JsonParser")
+    use_fresh_catalog_mirror(importlib.import_module("bench_blobtrigger.catalog_mirror"))
+    for name in ("PLAN_CACHE", "KNOWN_LINEAGE"):
+        os.environ[f"{name}_SIZE"] = "1024" if repeated_runs else "0"
+        os.environ.pop(f"{name}_TABLE", None)
+    importlib.import_module("bench_blobtrigger.plan_cache")._plan_cache = None
+    importlib.import_module("bench_blobtrigger.known_lineage")._known_lineage = None
+    authentication = BasicAuthentication("bench", "bench")
+    client = AtlasClient(f"{stub.url}/api/atlas/v2", authentication)
+    # The catalog mirror refreshes through the search API of a PurviewClient.
+    client.discovery = PurviewDiscoveryClient(f"{stub.url}/catalog/api", authentication)
+
+    payloads = [synapse_event(datasets, columns, with_facets) for _ in range(events)]
+
+    def transform(payload):
+        start = time.perf_counter()
+        synapse_parser.PurviewTransform(client, payload).transform_to_purview()
+        return time.perf_counter() - start
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        if concurrency == 1:
+            return [transform(payload) for payload in payloads]
+        # Invocations run side by side, as on a worker processing a burst of blobs.
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(transform, payloads))
+
+
+def run_purview_transform_facets(stub, events: int, datasets: int, columns: int) -> list:
+    """Drive PurviewTransform with events carrying columnLineage facets and return the per-event latencies."""
+    return run_purview_transform(stub, events, datasets, columns, with_facets=True)
+
+
+def run_purview_transform_burst(stub, events: int, datasets: int, columns: int) -> list:
+    """Drive PurviewTransform with 8 events at a time and return the per-event latencies."""
+    return run_purview_transform(stub, events, datasets, columns, concurrency=8)
+
+
+def run_purview_transform_scheduled(stub, events: int, datasets: int, columns: int) -> list:
+    """Drive PurviewTransform with runs of the same plan, served by the plan cache, and return the per-event latencies."""
+    return run_purview_transform(stub, events, datasets, columns, repeated_runs=True)
+
+
+BENCHMARKS = {"json_parser": run_json_parser, "purview_transform": run_purview_transform,
+              "purview_transform_facets": run_purview_transform_facets,
+              "purview_transform_burst": run_purview_transform_burst,
+              "purview_transform_scheduled": run_purview_transform_scheduled}
+
+
+def run(args) -> dict:
+    """Run every selected benchmark and scenario against a fresh stub."""
+    settings = {"events": args.events, "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+                "conflict_rate": args.conflict_rate, "throttle_rate": args.throttle_rate}
+    stub = start_stub(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, conflict_rate=args.conflict_rate,
+                      throttle_rate=args.throttle_rate, seed=args.seed)
+    results = {}
+    try:
+        for name in args.only or BENCHMARKS:
+            for datasets, columns in SCENARIOS:
+                stub.reset()
+                latencies = BENCHMARKS[name](stub, args.events, datasets, columns)
+                stats = stub.stats()
+                results[f"{name}/d{datasets}_c{columns}"] = {
+                    "events_per_s": round(len(latencies) / sum(latencies), 2),
+                    "calls_per_event": round(stats["total"] / len(latencies), 2),
+                    "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+                    "p95_ms": round(percentile(latencies, 0.95) * 1000, 2)
+                }
+    finally:
+        stub.shutdown()
+    return {"settings": settings, "results": results}
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> bool:
+    """Print the results next to the baseline.
+
+    Returns:
+        bool: True if no metric regressed by more than the tolerance.
+    """
+    if baseline and baseline.get("settings") != current["settings"]:
+        print(f"Warning: baseline was recorded with {baseline.get('settings')}, "
+              f"this run used {current['settings']}.")
+
+    # Direction in which each metric gets worse.
+    higher_is_worse = {"events_per_s": False, "calls_per_event": True, "p50_ms": True, "p95_ms": True}
+    ok = True
+    print(f"{'scenario':38} {'metric':16} {'baseline':>10} {'current':>10} {'change':>8}")
+    for scenario, metrics in current["results"].items():
+        reference = (baseline or {}).get("results", {}).get(scenario, {})
+        for metric, value in metrics.items():
+            base = reference.get(metric)
+            change = ""
+            if base:
+                delta = (value - base) / base
+                change = f"{delta:+.0%}"
+                worse = delta if higher_is_worse[metric] else -delta
+                if worse > tolerance:
+                    change += " !"
+                    ok = False
+            print(f"{scenario:38} {metric:16} {base if base is not None else '-':>10} {value:>10} {change:>8}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the lineage parsers against the Purview stub.")
+    parser.add_argument("--events", type=int, default=50, help="Events per scenario.")
+    parser.add_argument("--latency-ms", type=int, default=20)
+    parser.add_argument("--jitter-ms", type=int, default=10)
+    parser.add_argument("--conflict-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS))
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--write-baseline", action="store_true", help="Store this run as the new baseline.")
+    parser.add_argument("--check", type=float, metavar="TOLERANCE",
+                        help="Exit with status 1 when a metric is worse than the baseline by more than this share.")
+    args = parser.parse_args()
+
+    current = run(args)
+    if args.write_baseline:
+        recorded = current
+        if args.only and os.path.exists(args.baseline):
+            # Only the selected benchmarks are re-recorded; the others are kept when recorded with the same settings.
+            with open(args.baseline) as f:
+                previous = json.load(f)
+            if previous.get("settings") == current["settings"]:
+                recorded = {"settings": current["settings"], "results": dict(previous["results"], **current["results"])}
+        with open(args.baseline, "w") as f:
+            json.dump(recorded, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    ok = compare(current, baseline, args.check if args.check is not None else float("inf"))
+    if args.check is not None and not ok:
+        sys.exit(1)
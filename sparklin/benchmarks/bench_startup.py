@@ -0,0 +1,86 @@
+"""Cold start benchmark of the Synapse blob trigger function.
+
+Every run starts a fresh interpreter, as a new worker on the consumption plan
+does, and times two steps separately:
+
+    load           Importing BlobTriggerFunction, which the Functions host does before the first event
+    first_client   The first get_purview_client() call, which imports pyapacheatlas and builds the client
+
+It also reports whether pyapacheatlas was already imported by the load, since
+the function is meant to defer it to the first event that needs Purview. No
+token is requested, so the benchmark needs no network access; the credentials
+are placeholders.
+
+Usage:
+    python bench_startup.py                 # 10 runs
+    python bench_startup.py --runs 30 --importtime
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from bench_lineage import percentile
+
+SPARKLIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(SPARKLIN_DIR, "BlobTriggerFuncApp")
+
+# Runs in the fresh interpreter, with the function app folder as working directory
+# like under the Functions host, and prints its timings as JSON.
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import BlobTriggerFunction
+loaded = time.perf_counter()
+eager = "pyapacheatlas" in sys.modules
+from BlobTriggerFunction.purview import get_purview_client
+get_purview_client()
+built = time.perf_counter()
+print(json.dumps({"load_ms": (loaded - start) * 1000, "first_client_ms": (built - loaded) * 1000,
+                  "pyapacheatlas_at_load": eager}))
+"""
+
+
+def probe(importtime: bool = False) -> dict:
+    """Run the probe in a fresh interpreter and return its timings."""
+    env = dict(os.environ, TENANT_ID="bench-tenant", CLIENT_ID="bench-client", CLIENT_SECRET="bench-secret",
+               PURVIEW_ACCOUNT_NAME="bench-account")
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", PROBE]
+    completed = subprocess.run(command, cwd=APP_DIR, env=env, capture_output=True, text=True, check=True)
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    if importtime:
+        result["imports"] = completed.stderr
+    return result
+
+
+def slowest_imports(report: str, count: int = 15) -> list:
+    """Return the top-level imports of a -X importtime report with the highest cumulative time."""
+    imports = []
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit() and not name.startswith("  "):
+            imports.append((int(cumulative) / 1000, name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the cold start of the Synapse blob trigger function.")
+    parser.add_argument("--runs", type=int, default=10, help="Fresh interpreters started.")
+    parser.add_argument("--importtime", action="store_true",
+                        help="Also list the slowest top-level imports of the last run.")
+    args = parser.parse_args()
+
+    runs = [probe() for _ in range(args.runs)]
+    print(f"{'step':16} {'p50_ms':>10} {'p95_ms':>10}")
+    for step in ("load_ms", "first_client_ms"):
+        values = [run[step] for run in runs]
+        print(f"{step[:-3]:16} {percentile(values, 0.50):>10.1f} {percentile(values, 0.95):>10.1f}")
+    print(f"pyapacheatlas imported at load: {any(run['pyapacheatlas_at_load'] for run in runs)}")
+
+    if args.importtime:
+        print(f"\n{'cumulative_ms':>14}  top-level import")
+        for cumulative, name in slowest_imports(probe(importtime=True)["imports"]):
+            print(f"{cumulative:>14.1f}  {name}")
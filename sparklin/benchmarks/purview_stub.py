@@ -0,0 +1,230 @@
+"""Local stand-in for the AAD token endpoint and the Purview Atlas API.
+
+The stub answers the calls made by the lineage parsers so they can be load
+tested without a tenant or a live Purview account:
+
+    POST /{tenant}/oauth2/token                    AAD client credentials token
+    POST .../atlas/v2/relationship                 create a relationship
+    DELETE .../atlas/v2/relationship/guid/{guid}   delete a relationship
+    POST .../atlas/v2/entity/bulk                  upload entities
+    POST .../search/query                          search (always empty)
+    GET  /stats                                    request counters
+    POST /reset                                    forget relationships and counters
+
+Latency, conflicts and throttling can be injected to mimic a busy account.
+
+Usage:
+    python purview_stub.py --port 8089 --latency-ms 40 --jitter-ms 20 --throttle-rate 0.05
+
+The parsers are pointed at the stub through their usual settings:
+    AAD_AUTHORITY_HOST=http://127.0.0.1:8089
+    PURVIEW_API_URL=http://127.0.0.1:8089
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class PurviewStubServer(ThreadingHTTPServer):
+    """HTTP server holding the state shared by the stub request handlers."""
+
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms=0, jitter_ms=0, conflict_rate=0.0, throttle_rate=0.0,
+                 retry_after=1, seed=None):
+        """Initialize the stub.
+
+        Args:
+            address (tuple): (host, port) to listen on. Port 0 picks a free port.
+            latency_ms (int): Delay added to every Atlas call.
+            jitter_ms (int): Random extra delay, up to this value, added to every Atlas call.
+            conflict_rate (float): Share of new relationships answered with 409.
+            throttle_rate (float): Share of Atlas calls answered with 429.
+            retry_after (int): Retry-After header, in seconds, sent with a 429.
+            seed (int, optional): Seed of the random generator, for repeatable runs.
+        """
+        super().__init__(address, PurviewStubHandler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.conflict_rate = conflict_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset()
+
+    @property
+    def url(self) -> str:
+        """Base URL of the stub."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset(self) -> None:
+        """Forget the relationships created and reset the counters."""
+        with self.lock:
+            self.relationships = {}
+            self.counts = {}
+
+    def count(self, name: str) -> None:
+        """Increment a request counter."""
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def stats(self) -> dict:
+        """Return a copy of the request counters."""
+        with self.lock:
+            counts = dict(self.counts)
+        counts["total"] = sum(counts.values())
+        counts["relationships"] = len(self.relationships)
+        return counts
+
+    def draw(self, rate: float) -> bool:
+        """Return True with the given probability."""
+        with self.lock:
+            return self.random.random() < rate
+
+    def delay(self) -> None:
+        """Sleep for the configured latency and jitter."""
+        with self.lock:
+            jitter = self.random.uniform(0, self.jitter_ms) if self.jitter_ms else 0
+        if self.latency_ms or jitter:
+            time.sleep((self.latency_ms + jitter) / 1000)
+
+
+class PurviewStubHandler(BaseHTTPRequestHandler):
+    """Request handler answering like AAD and the Atlas API would."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Keep benchmark output readable; the counters are available on /stats.
+        pass
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        if self.headers.get("Content-Type", "").startswith("application/json") and body:
+            return json.loads(body)
+        return body
+
+    def _send(self, status, payload=None, headers=None):
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _throttled(self) -> bool:
+        """Answer with a 429 when throttling is drawn for this call."""
+        if self.server.draw(self.server.throttle_rate):
+            self.server.count("throttled")
+            self._send(429, {"errorCode": "TooManyRequests", "errorMessage": "Rate limit exceeded."},
+                       {"Retry-After": str(self.server.retry_after)})
+            return True
+        return False
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send(200, self.server.stats())
+        else:
+            self._send(404, {"errorMessage": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        body = self._read_body()
+        path = self.path.split("?")[0]
+
+        if path == "/reset":
+            self.server.reset()
+            self._send(204)
+        elif path.endswith("/oauth2/token") or path.endswith("/oauth2/v2.0/token"):
+            self.server.count("token")
+            expires_in = 3600
+            self._send(200, {"token_type": "Bearer", "expires_in": str(expires_in),
+                             "expires_on": str(int(time.time()) + expires_in),
+                             "access_token": "stub-" + uuid.uuid4().hex})
+        elif path.endswith("/atlas/v2/relationship"):
+            self.server.count("relationship")
+            self.server.delay()
+            if not self._throttled():
+                self._create_relationship(body)
+        elif path.endswith("/entity/bulk"):
+            self.server.count("entity_bulk")
+            self.server.delay()
+            if not self._throttled():
+                entities = body.get("entities", []) if isinstance(body, dict) else []
+                assignments = {str(entity.get("guid")): str(uuid.uuid4()) for entity in entities}
+                self._send(200, {"mutatedEntities": {"CREATE": [{"guid": guid} for guid in assignments.values()]},
+                                 "guidAssignments": assignments})
+        elif path.endswith("/search/query"):
+            self.server.count("search")
+            self.server.delay()
+            if not self._throttled():
+                self._send(200, {"@search.count": 0, "value": []})
+        else:
+            self._send(404, {"errorMessage": f"Unknown path {self.path}"})
+
+    def do_DELETE(self):
+        path = self.path.split("?")[0]
+        if "/atlas/v2/relationship/guid/" in path:
+            self.server.count("relationship_delete")
+            self.server.delay()
+            if not self._throttled():
+                with self.server.lock:
+                    self.server.relationships = {key: guid for key, guid in self.server.relationships.items()
+                                                 if guid != path.rsplit("/", 1)[-1]}
+                self._send(204)
+        else:
+            self._send(404, {"errorMessage": f"Unknown path {self.path}"})
+
+    def _create_relationship(self, payload):
+        key = (json.dumps(payload.get("end1"), sort_keys=True), json.dumps(payload.get("end2"), sort_keys=True),
+               payload.get("typeName"))
+        with self.server.lock:
+            exists = key in self.server.relationships
+        if exists or self.server.draw(self.server.conflict_rate):
+            self.server.count("conflict")
+            self._send(409, {"errorCode": "ATLAS-409-00-001", "errorMessage": "relationship already exists"})
+            return
+        guid = str(uuid.uuid4())
+        with self.server.lock:
+            self.server.relationships[key] = guid
+        self._send(200, dict(payload, guid=guid, status="ACTIVE"))
+
+
+def start_stub(**kwargs) -> PurviewStubServer:
+    """Start the stub on a background thread.
+
+    Args:
+        **kwargs: Options of PurviewStubServer. 'address' defaults to a free local port.
+
+    Returns:
+        PurviewStubServer: The running server; call shutdown() to stop it.
+    """
+    server = PurviewStubServer(kwargs.pop("address", ("127.0.0.1", 0)), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Purview and AAD stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=int, default=0)
+    parser.add_argument("--jitter-ms", type=int, default=0)
+    parser.add_argument("--conflict-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    server = PurviewStubServer((args.host, args.port), args.latency_ms, args.jitter_ms, args.conflict_rate,
+                               args.throttle_rate, args.retry_after, args.seed)
+    print(f"Purview stub listening on {server.url}")
+    server.serve_forever()
@@ -0,0 +1,15 @@
+import os
+import sys
+import pytest
+
+# The benchmark scripts are imported as top-level modules, as when run from this folder.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from purview_stub import start_stub  # noqa: E402
+
+
+@pytest.fixture
+def stub(request):
+    server = start_stub(seed=7, **getattr(request, "param", {}))
+    yield server
+    server.shutdown()
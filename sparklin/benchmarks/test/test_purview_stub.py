@@ -0,0 +1,40 @@
+import importlib
+import os
+import pytest
+from bench_lineage import SPARKLIN_DIR, load_package, percentile
+
+
+@pytest.fixture
+def purview_client(stub, monkeypatch):
+    for name, value in {"TENANT_ID": "tenant", "CLIENT_ID": "client", "CLIENT_SECRET": "secret",
+                        "PURVIEW_RESOURCE": "https://purview.azure.net", "PURVIEW_API_URL": stub.url,
+                        "AAD_AUTHORITY_HOST": stub.url}.items():
+        monkeypatch.setenv(name, value)
+    load_package(os.path.join(SPARKLIN_DIR, "JsonParserFuncApp", "JsonParserFunction"), "test_jsonparser")
+    return importlib.import_module("test_jsonparser.purview_client")
+
+
+def edges(purview_client, count):
+    return [purview_client.LineageEdge(f"d{i}", "fabric_lakehouse", "nb", "fabric_synapse_notebook", "ws", "input")
+            for i in range(count)]
+
+
+def test_stub_creates_each_relationship_once(stub, purview_client):
+    client = purview_client.PurviewClient()
+
+    assert [code for code, _ in client.create_lineages(edges(purview_client, 3))] == [200, 200, 200]
+    assert [code for code, _ in client.create_lineages(edges(purview_client, 4))] == [409, 409, 409, 200]
+    assert stub.stats() == {"token": 1, "relationship": 7, "conflict": 3, "total": 11, "relationships": 4}
+
+
+@pytest.mark.parametrize("stub, expected", [({"conflict_rate": 1.0}, 409), ({"throttle_rate": 1.0}, 429)],
+                         indirect=["stub"])
+def test_stub_injects_conflicts_and_throttling(stub, purview_client, expected):
+    results = purview_client.PurviewClient().create_lineages(edges(purview_client, 2))
+
+    assert [code for code, _ in results] == [expected] * 2
+
+
+def test_percentile():
+    assert percentile([3.0, 1.0, 2.0, 4.0], 0.5) == 3.0
+    assert percentile([5.0], 0.95) == 5.0